@@ -5,8 +5,8 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('manips_types\\manips_type.sqlite', 'manips_types'), ('data_base_GES1point5\\data_base_GES1point5.hdf5', 'data_base_GES1point5'), ('data_masse_eCO2\\data_eCO2_masse_consommable.hdf5', 'data_masse_eCO2'), ('styles\\styles.qss', 'styles'), ('images\\icon.icns', 'images'), ('data_masse_eCO2\\data_eCO2_masse_consommable.hdf5', 'data_masse_eCO2'), ('data_masse_eCO2\\empreinte_carbone_materiaux.h5', 'data_masse_eCO2'), ('images\\Logo.png', 'images')],
-    hiddenimports=[],
+    datas=[('manips_types\\manips_type.sqlite', 'manips_types'), ('data_masse_eCO2\\reference_data.sqlite', 'data_masse_eCO2'), ('data_masse_eCO2\\data_eCO2_masse_consommable.sqlite', 'data_masse_eCO2'), ('styles\\styles.qss', 'styles'), ('images\\icon.icns', 'images'), ('images\\Logo.png', 'images')],
+    hiddenimports=['windows.graphiques.graph_1_pie_chart', 'windows.graphiques.graph_2_bar_chart', 'windows.graphiques.graph_3_proportional_bar_chart', 'windows.graphiques.graph_4_stacked_bar_consumables', 'windows.graphiques.graph_5_nacres_bar_chart', 'windows.graphiques.graph_6_proportional_bar_chart_mass'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,155 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# benchmarks/fixtures.py
+
+"""
+Contexte partagé des benchmarks : données de l'application, fenêtre principale hors
+écran et historiques de test, créés à la première demande puis réutilisés.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+SEED = 20240601
+
+
+def prepare_environment():
+    """
+    À appeler avant d'importer l'application : Qt sans affichage, pas de préchargement des graphiques, et données utilisateur
+    (manips type, consommables) dans un dossier temporaire pour ne jamais modifier
+    celles du dépôt.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("LABECO2_CHART_PREWARM", "0")
+    if not os.environ.get("LABECO2_DATA_DIR"):
+        os.environ["LABECO2_DATA_DIR"] = tempfile.mkdtemp(prefix="labeco2_bench_data_")
+
+
+class Context:
+    """Objets coûteux à créer, partagés par les benchmarks (créés à la demande)."""
+
+    def __init__(self, seed=SEED):
+        self.seed = seed
+        self.tmpdir = tempfile.mkdtemp(prefix="labeco2_bench_")
+        self._data_manager = None
+        self._calculator = None
+        self._app = None
+        self._main_window = None
+        self._histories = {}
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        if self._main_window is not None:
+            self._main_window.close()
+            self._main_window = None
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def rng(self, offset=0):
+        """Générateur aléatoire reproductible (un par usage, pour des tirages indépendants)."""
+        return np.random.default_rng(self.seed + offset)
+
+    # ------------------------------------------------------------------
+    # Données et calculateur
+    # ------------------------------------------------------------------
+    @property
+    def data_manager(self):
+        if self._data_manager is None:
+            from utils.paths import resource_path
+            from windows.data_manager import DataManager
+            self._data_manager = DataManager(resource_path(""))
+        return self._data_manager
+
+    @property
+    def calculator(self):
+        if self._calculator is None:
+            from windows.carbon_calculator import CarbonCalculator
+            self._calculator = CarbonCalculator(self.data_manager)
+        return self._calculator
+
+    def factor_rows(self, count, offset=0, categories=None):
+        """Lignes (dictionnaires) tirées au hasard dans la table des facteurs du millésime courant."""
+        data = self.data_manager.get_main_data()
+        data = data[data["category"] != "Électricité"]
+        if categories is not None:
+            data = data[data["category"].isin(categories)]
+        positions = self.rng(offset).integers(0, len(data), count)
+        return data.iloc[positions].to_dict("records")
+
+    def consumable_rows(self, count, offset=0):
+        """Consommables (Code NACRES, Consommable) tirés au hasard dans la base des masses."""
+        masse = self.data_manager.get_data_masse()
+        positions = self.rng(offset).integers(0, len(masse), count)
+        return masse.iloc[positions][["Code NACRES", "Consommable"]].astype(str).to_records(index=False).tolist()
+
+    def electricity_types(self):
+        data = self.data_manager.get_main_data()
+        return sorted(data.loc[data["category"] == "Électricité", "name"].dropna().unique())
+
+    # ------------------------------------------------------------------
+    # Historiques de test
+    # ------------------------------------------------------------------
+    def history(self, size):
+        """
+        Historique synthétique de `size` lignes au format de l'export (émissions calculées),
+        voir benchmarks/synthetic_ledger.py.
+        """
+        if size not in self._histories:
+            from benchmarks.synthetic_ledger import generate_history
+            self._histories[size] = generate_history(size, self.seed + size, calculator=self.calculator)
+        return self._histories[size]
+
+    def history_file(self, fmt, size):
+        """Fichier d'historique (csv, xlsx ou h5) de `size` lignes, écrit une seule fois."""
+        key = (fmt, size)
+        if key not in self._files:
+            from utils.history_io import write_history
+            path = os.path.join(self.tmpdir, f"history_{size}.{fmt}")
+            write_history(self.history(size), path)
+            self._files[key] = path
+        return self._files[key]
+
+    # ------------------------------------------------------------------
+    # Interface (Qt hors écran)
+    # ------------------------------------------------------------------
+    @property
+    def app(self):
+        if self._app is None:
+            from PySide6.QtWidgets import QApplication, QInputDialog, QMessageBox
+            self._app = QApplication.instance() or QApplication([])
+            # Aucune boîte de dialogue modale pendant les mesures
+            for name in ("warning", "information", "critical"):
+                setattr(QMessageBox, name, staticmethod(lambda *a, **k: None))
+            QInputDialog.getDouble = staticmethod(lambda *a, **k: (1.0, True))
+        return self._app
+
+    @property
+    def main_window(self):
+        if self._main_window is None:
+            app = self.app
+            from windows.main_window import MainWindow
+            self._main_window = MainWindow()
+            self._main_window.show()
+            app.processEvents()
+        return self._main_window
+
+    def load_main_window(self, size):
+        """Fenêtre principale dont l'historique contient exactement `size` lignes."""
+        window = self.main_window
+        if window.history_model.rowCount() != size:
+            window.history_model.clear()
+            window.load_history(self.history(size))
+            self.app.processEvents()
+        return window
@@ -0,0 +1,264 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# benchmarks/gui_latency.py
+
+"""
+Latence de l'interface : la fenêtre principale, hors écran, est pilotée comme par un
+utilisateur (changements de catégorie et de sous-catégorie, frappe dans la recherche,
+calculs, modifications, suppressions, ouverture des graphiques) avec un historique
+synthétique chargé, et chaque action est chronométrée de l'événement jusqu'au retour
+au repos de la boucle d'événements (tous les événements en attente traités).
+
+    python -m benchmarks.gui_latency                           # historique de 10 000 lignes
+    python -m benchmarks.gui_latency --size 100000 --repeat 20 --output latence.json
+    python -m benchmarks.gui_latency --actions recherche calcul
+
+Aucun affichage nécessaire (QT_QPA_PLATFORM=offscreen) ; les boîtes de message sont
+neutralisées et la fenêtre de modification est validée automatiquement.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_SIZE = 10_000
+DEFAULT_REPEAT = 10
+# Passes de la boucle d'événements pour atteindre le repos : les événements postés
+# pendant la première (rafraîchissements...) sont traités à la seconde
+IDLE_PASSES = 2
+# Textes tapés caractère par caractère dans le champ de recherche
+SEARCH_TERMS = ("tube", "gants", "papier", "ordinateur", "pipette")
+# Valeur saisie pour les calculs (euros)
+CALCULATION_VALUE = "250"
+
+# Boutons d'ouverture des graphiques
+CHART_BUTTONS = {
+    "pie": "generate_pie_button",
+    "bar": "generate_bar_button",
+    "proportional_bar": "generate_proportional_bar_button",
+    "stacked_bar_consumables": "generate_stacked_bar_consumables_button",
+    "nacres_bar": "generate_nacres_bar_button",
+    "proportional_bar_mass": "generate_proportional_bar_button_mass",
+}
+
+ACTIONS = ("categorie", "sous-categorie", "recherche", "calcul", "modification", "suppression", "graphiques")
+
+
+class LatencyHarness:
+    """Pilote la fenêtre principale et mesure la latence événement → repos de chaque action."""
+
+    def __init__(self, context, size=DEFAULT_SIZE, repeat=DEFAULT_REPEAT, seed=None):
+        from utils.instrumentation import Instrumentation
+
+        self.context = context
+        self.app = context.app
+        self.size = size
+        self.repeat = repeat
+        self.rng = np.random.default_rng(context.seed if seed is None else seed)
+        # Latences par action (mêmes statistiques que la fenêtre de diagnostic)
+        self.latency = Instrumentation(enabled=True)
+        self.window = None
+
+    # ------------------------------------------------------------------
+    # Boucle d'événements
+    # ------------------------------------------------------------------
+    def wait_idle(self):
+        """Traite les événements en attente, jusqu'au repos de la boucle d'événements."""
+        from PySide6.QtCore import QEventLoop, QTimer
+        for _ in range(IDLE_PASSES):
+            loop = QEventLoop()
+            # Minuterie nulle : déclenchée après les événements déjà en attente
+            QTimer.singleShot(0, loop.quit)
+            loop.exec()
+
+    def timed(self, name, action):
+        """Exécute action() (l'événement utilisateur) et enregistre le temps jusqu'au repos."""
+        start = time.perf_counter()
+        action()
+        self.wait_idle()
+        self.latency.record(name, time.perf_counter() - start)
+
+    # ------------------------------------------------------------------
+    # Préparation
+    # ------------------------------------------------------------------
+    def setup(self):
+        """Fenêtre principale avec l'historique synthétique, section de calcul affichée."""
+        self.window = self.context.load_main_window(self.size)
+        self._close_charts()
+        self.window.show_calcul_section()
+        self.wait_idle()
+        return self.window
+
+    def _select(self, category):
+        """Sélection complète (sous-catégorie, nom, année la plus récente) d'une catégorie."""
+        w = self.window
+        w.search_field.clear()
+        w.category_combo.setCurrentText(category)
+        if w.subcategory_combo.count() > 1:
+            w.subcategory_combo.setCurrentIndex(1)
+        if w.subsub_name_combo.count() > 1:
+            w.subsub_name_combo.setCurrentIndex(1)
+        if w.year_combo.count():
+            w.year_combo.setCurrentIndex(w.year_combo.count() - 1)
+        self.wait_idle()
+
+    def _random_row(self, exclude_machines=False):
+        model = self.window.history_model
+        for _ in range(100):
+            row = int(self.rng.integers(0, model.rowCount()))
+            if not exclude_machines or model.record(row).category != "Machine":
+                return row
+        return row
+
+    def _close_charts(self):
+        from windows.main_window import CHART_WINDOWS
+        for chart_type in CHART_WINDOWS:
+            chart = getattr(self.window, f"{chart_type}_chart_window", None)
+            if chart is not None:
+                # Fermeture : la fenêtre se retire (signal finished) et ne se rafraîchit plus
+                chart.close()
+                self.window.data_changed.disconnect(chart.refresh_data)
+                setattr(self.window, f"{chart_type}_chart_window", None)
+        self.wait_idle()
+
+    # ------------------------------------------------------------------
+    # Scénarios
+    # ------------------------------------------------------------------
+    def run_categorie(self):
+        combo = self.window.category_combo
+        for i in range(self.repeat):
+            index = (combo.currentIndex() + 1) % combo.count()
+            self.timed("catégorie", lambda: combo.setCurrentIndex(index))
+
+    def run_sous_categorie(self):
+        self._select("Achats")
+        combo = self.window.subcategory_combo
+        for i in range(self.repeat):
+            index = 1 + (combo.currentIndex() % (combo.count() - 1))
+            self.timed("sous-catégorie", lambda: combo.setCurrentIndex(index))
+
+    def run_recherche(self):
+        from PySide6.QtTest import QTest
+        self._select("Achats")
+        field = self.window.search_field
+        for i in range(self.repeat):
+            for char in SEARCH_TERMS[i % len(SEARCH_TERMS)]:
+                self.timed("recherche (frappe)", lambda: QTest.keyClick(field, char))
+            field.clear()
+            self.wait_idle()
+
+    def run_calcul(self):
+        w = self.window
+        self._select("Achats")
+        for i in range(self.repeat):
+            w.input_field.setText(CALCULATION_VALUE)
+            self.timed("calcul", w.calculate_button.click)
+
+    def run_modification(self):
+        from PySide6.QtCore import QTimer
+        w = self.window
+        for i in range(self.repeat):
+            w.select_history_row(self._random_row(exclude_machines=True))
+            self.wait_idle()
+            # Validation de la fenêtre modale dès qu'elle est ouverte (dans sa propre boucle)
+            QTimer.singleShot(0, self._validate_edit_dialog)
+            self.timed("modification", w.modify_button.click)
+
+    def _validate_edit_dialog(self, attempts=100):
+        from PySide6.QtCore import QTimer
+        from PySide6.QtWidgets import QApplication
+        from windows.edit_calculation_dialog import EditCalculationDialog
+        dialog = QApplication.activeModalWidget()
+        if isinstance(dialog, EditCalculationDialog):
+            # Achat d'un consommable sans quantité : l'utilisateur en saisit une
+            quantity = dialog.quantity_input.text().strip()
+            if dialog.quantity_input.isVisible() and not (quantity.isdigit() and int(quantity) > 0):
+                dialog.quantity_input.setText("1")
+            dialog.on_validate()
+            if dialog.isVisible():
+                # Saisie refusée (message neutralisé) : on ferme pour ne pas bloquer la mesure
+                dialog.reject()
+        elif attempts:
+            QTimer.singleShot(0, lambda: self._validate_edit_dialog(attempts - 1))
+
+    def run_suppression(self):
+        w = self.window
+        for i in range(self.repeat):
+            w.select_history_row(self._random_row())
+            self.wait_idle()
+            self.timed("suppression", w.delete_button.click)
+
+    def run_graphiques(self):
+        w = self.window
+        for i in range(self.repeat):
+            for chart_type, button in CHART_BUTTONS.items():
+                self.timed(f"graphique {chart_type}", getattr(w, button).click)
+                self._close_charts()
+
+    def run(self, actions=ACTIONS, log=print):
+        """Exécute les scénarios demandés ; retourne les statistiques de latence."""
+        if self.window is None:
+            self.setup()
+        for action in actions:
+            start = time.perf_counter()
+            getattr(self, "run_" + action.replace("-", "_"))()
+            log(f"[INFO] {action} : {time.perf_counter() - start:.1f} s")
+        return self.latency.stats()
+
+
+def format_report(rows):
+    lines = [f"{'Action':<36} {'n':>5} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"]
+    for r in sorted(rows, key=lambda r: r["name"]):
+        lines.append(
+            f"{r['name']:<36} {r['count']:>5} {r['p50_ms']:>8.1f}ms {r['p95_ms']:>8.1f}ms "
+            f"{r['p99_ms']:>8.1f}ms {r['max_ms']:>8.1f}ms"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latence de l'interface (événement → repos), hors écran.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help=f"lignes d'historique (par défaut : {DEFAULT_SIZE})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"répétitions par action (par défaut : {DEFAULT_REPEAT})")
+    parser.add_argument("--actions", nargs="+", choices=ACTIONS, default=list(ACTIONS), help="actions à mesurer")
+    parser.add_argument("--seed", type=int, help="graine (historique et lignes sélectionnées)")
+    parser.add_argument("--output", help="fichier JSON (latences et temps par gestionnaire)")
+    args = parser.parse_args(argv)
+
+    from benchmarks.fixtures import SEED, Context, prepare_environment
+    prepare_environment()
+    from utils.instrumentation import instrumentation
+
+    with Context(seed=SEED if args.seed is None else args.seed) as context:
+        harness = LatencyHarness(context, args.size, args.repeat)
+        harness.setup()
+        # Temps par gestionnaire pendant les scénarios (détail des latences)
+        instrumentation.reset()
+        instrumentation.enable()
+        rows = harness.run(args.actions)
+        instrumentation.enable(False)
+
+    print()
+    print(f"Historique : {args.size} lignes, {args.repeat} répétitions")
+    print(format_report(rows))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                **harness.latency.report(),
+                "size": args.size,
+                "repeat": args.repeat,
+                "latency": rows,
+                "handlers": instrumentation.stats(),
+            }, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Résultats écrits : {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
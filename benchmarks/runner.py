@@ -0,0 +1,259 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# benchmarks/runner.py
+
+"""
+Exécution des benchmarks, comparaison à une référence (baseline) et détection des régressions.
+
+    python -m benchmarks                          # tous les benchmarks, comparés à benchmarks/baselines.json
+    python -m benchmarks -k calculator            # seulement ceux dont le nom contient "calculator"
+    python -m benchmarks --max-size 10000         # sans les historiques de 100 000 lignes
+    python -m benchmarks --save-baseline          # enregistre les résultats comme nouvelle référence
+
+Un benchmark est une fonction de préparation, enregistrée par @benchmark, qui reçoit le
+contexte partagé (benchmarks/fixtures.py) et retourne la fonction à chronométrer, ou un
+couple (fonction, remise à zéro) ; la remise à zéro est appelée avant chaque mesure, hors chrono.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+RESULTS_VERSION = 1
+
+# Régression : médiane plus lente que la référence de plus de DEFAULT_THRESHOLD (25 %)
+DEFAULT_THRESHOLD = 0.25
+# Tailles d'historique des benchmarks paramétrés
+SIZES = (1_000, 10_000, 100_000)
+
+# Durée de mesure visée par benchmark (s), bornes du nombre de mesures
+MIN_TIME = 0.5
+MIN_ROUNDS = 3
+MAX_ROUNDS = 50
+# Au-delà de cette durée (s), une seule mesure (historiques de 100 000 lignes en Excel...)
+SINGLE_ROUND_TIME = 5.0
+
+
+class Benchmark:
+    __slots__ = ("name", "setup", "size", "ops")
+
+    def __init__(self, name, setup, size=None, ops=1):
+        self.name = name
+        self.setup = setup
+        self.size = size
+        self.ops = ops
+
+
+# Benchmarks enregistrés, dans l'ordre de déclaration
+REGISTRY = []
+
+
+def benchmark(name, size=None, ops=1):
+    """
+    Enregistre un benchmark.
+
+    :param name: nom unique (ex. "history.read[csv-1000]")
+    :param size: taille de l'historique utilisé (filtrée par --max-size)
+    :param ops: nombre d'opérations par mesure (temps par opération dans le rapport)
+    """
+    def decorator(setup):
+        REGISTRY.append(Benchmark(name, setup, size, ops))
+        return setup
+    return decorator
+
+
+def machine_info():
+    """Description de la machine, enregistrée avec les résultats (références propres à une machine)."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def measure(func, reset=None):
+    """
+    Chronomètre func() : la première mesure sert d'étalonnage, puis assez de mesures
+    pour atteindre MIN_TIME (entre MIN_ROUNDS et MAX_ROUNDS).
+
+    :return: liste des durées (s)
+    """
+    times = []
+
+    def once():
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    once()
+    if times[0] >= SINGLE_ROUND_TIME:
+        return times
+    rounds = min(max(MIN_ROUNDS, math.ceil(MIN_TIME / max(times[0], 1e-9))), MAX_ROUNDS)
+    for _ in range(rounds - 1):
+        once()
+    return times
+
+
+def run(benchmarks, context, log=print):
+    """
+    Exécute les benchmarks.
+
+    :return: {nom: {"median_s", "min_s", "mean_s", "stdev_s", "rounds", "ops", "per_op_s"}},
+             les benchmarks en échec ont {"error": message}
+    """
+    results = {}
+    for bench in benchmarks:
+        try:
+            prepared = bench.setup(context)
+            func, reset = prepared if isinstance(prepared, tuple) else (prepared, None)
+            times = measure(func, reset)
+        except Exception as e:
+            results[bench.name] = {"error": f"{type(e).__name__}: {e}"}
+            log(f"{bench.name:<60} ÉCHEC : {e}")
+            continue
+        median = statistics.median(times)
+        results[bench.name] = {
+            "median_s": median,
+            "min_s": min(times),
+            "mean_s": statistics.fmean(times),
+            "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+            "rounds": len(times),
+            "ops": bench.ops,
+            "per_op_s": median / bench.ops,
+        }
+        log(f"{bench.name:<60} {_fmt(median):>10}  ({len(times)} mesures)")
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare des résultats à une référence.
+
+    :return: liste de (nom, médiane, médiane de référence ou None, rapport ou None, statut) ;
+             statut : "régression", "amélioration", "stable", "nouveau" ou "échec"
+    """
+    rows = []
+    for name, result in results.items():
+        if "error" in result:
+            rows.append((name, None, None, None, "échec"))
+            continue
+        ref = baseline.get(name)
+        if not ref or "median_s" not in ref:
+            rows.append((name, result["median_s"], None, None, "nouveau"))
+            continue
+        ratio = result["median_s"] / ref["median_s"] if ref["median_s"] else math.inf
+        if ratio > 1.0 + threshold:
+            status = "régression"
+        elif ratio < 1.0 / (1.0 + threshold):
+            status = "amélioration"
+        else:
+            status = "stable"
+        rows.append((name, result["median_s"], ref["median_s"], ratio, status))
+    return rows
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": RESULTS_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "machine": machine_info(),
+            "results": results,
+        }, f, indent=2, ensure_ascii=False)
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return "-"
+    if seconds >= 1.0:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def select(pattern=None, max_size=None):
+    """Benchmarks enregistrés dont le nom contient pattern et la taille ne dépasse pas max_size."""
+    from benchmarks import suite  # noqa: F401  (enregistre les benchmarks)
+    return [
+        b for b in REGISTRY
+        if (not pattern or pattern in b.name) and (max_size is None or b.size is None or b.size <= max_size)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de LABeCO2 (calculs, recherches, imports, graphiques).")
+    parser.add_argument("-k", dest="pattern", help="ne lancer que les benchmarks dont le nom contient ce texte")
+    parser.add_argument("--max-size", type=int, help="taille maximale des historiques (ex. 10000)")
+    parser.add_argument("--list", action="store_true", help="lister les benchmarks sans les lancer")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="fichier de référence (par défaut : benchmarks/baselines.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer les résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="seuil de régression relatif (par défaut : 0.25, soit +25 %%)")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    args = parser.parse_args(argv)
+
+    # Avant tout import de l'application : Qt hors écran, données utilisateur dans un dossier temporaire
+    from benchmarks.fixtures import Context, prepare_environment
+    prepare_environment()
+
+    benchmarks = select(args.pattern, args.max_size)
+    if args.list:
+        for b in benchmarks:
+            print(b.name)
+        return 0
+    if not benchmarks:
+        print("[ERREUR] Aucun benchmark ne correspond.")
+        return 1
+
+    with Context() as context:
+        results = run(benchmarks, context)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"[INFO] Résultats écrits : {args.output}")
+
+    if args.save_baseline:
+        # Les références existantes des benchmarks non relancés sont conservées
+        merged = load_results(args.baseline)["results"] if os.path.exists(args.baseline) else {}
+        merged.update({name: r for name, r in results.items() if "error" not in r})
+        save_results(merged, args.baseline)
+        print(f"[INFO] Référence enregistrée : {args.baseline}")
+        return 0 if all("error" not in r for r in results.values()) else 1
+
+    if not os.path.exists(args.baseline):
+        print(f"[INFO] Pas de référence ({args.baseline}) : relancer avec --save-baseline pour en créer une.")
+        return 0 if all("error" not in r for r in results.values()) else 1
+
+    reference = load_results(args.baseline)
+    if reference.get("machine") != machine_info():
+        print("[ATTENTION] Référence enregistrée sur une autre machine ou une autre version de Python.")
+    rows = compare(results, reference["results"], args.threshold)
+    print()
+    print(f"{'Benchmark':<60} {'Médiane':>10} {'Référence':>10} {'Écart':>8}  Statut")
+    for name, median, ref, ratio, status in rows:
+        change = f"{ratio - 1.0:+.0%}" if ratio is not None else "-"
+        print(f"{name:<60} {_fmt(median):>10} {_fmt(ref):>10} {change:>8}  {status}")
+    failures = [r for r in rows if r[4] in ("régression", "échec")]
+    if failures:
+        print(f"\n[ERREUR] {len(failures)} benchmark(s) en régression (seuil +{args.threshold:.0%}) ou en échec.")
+        return 1
+    return 0
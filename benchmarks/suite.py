@@ -0,0 +1,185 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# benchmarks/suite.py
+
+"""
+Benchmarks de LABeCO2 : recherche des facteurs, calculs par catégorie, calcul massique,
+lecture/écriture des historiques, chargement dans la fenêtre principale, total des
+émissions et rafraîchissement (agrégation + rendu) de chaque graphique.
+"""
+
+import os
+
+from benchmarks.runner import SIZES, benchmark
+
+LOOKUPS = 1_000
+CALCULATIONS = 200
+HISTORY_FORMATS = ("csv", "xlsx", "h5")
+
+# Catégories calculées par compute_emission_data (Électricité passe par Machine)
+CATEGORIES = ("Achats", "Activités agricoles", "Infra. de recherche", "Machine", "Véhicules")
+
+
+# ----------------------------------------------------------------------
+# Recherche des facteurs et calculs unitaires
+# ----------------------------------------------------------------------
+@benchmark("datamanager.get_emission_factor", ops=LOOKUPS)
+def bench_get_emission_factor(ctx):
+    dm = ctx.data_manager
+    keys = [
+        (r["category"], r["subcategory"], r["subsubcategory"] or "", r["name"] or "", r["year"])
+        for r in ctx.factor_rows(LOOKUPS)
+    ]
+
+    def run():
+        for key in keys:
+            dm.get_emission_factor(*key)
+    return run
+
+
+def _calculation_items(ctx, category):
+    """Items (data_dict) d'une catégorie, comme ceux construits par MainWindow.calculate_emission."""
+    if category == "Machine":
+        rng = ctx.rng(1)
+        return [
+            {"category": "Machine", "electricity_type": elec, "value": float(v)}
+            for elec, v in zip(rng.choice(ctx.electricity_types(), CALCULATIONS),
+                               rng.uniform(1, 1000, CALCULATIONS))
+        ]
+    rows = ctx.factor_rows(CALCULATIONS, offset=CATEGORIES.index(category), categories=[category])
+    consumables = ctx.consumable_rows(CALCULATIONS, offset=2)
+    items = []
+    for row, (code, conso) in zip(rows, consumables):
+        item = {
+            "category": row["category"], "subcategory": row["subcategory"],
+            "subsubcategory": row["subsubcategory"] or "", "name": row["name"] or "",
+            "year": str(row["year"]), "value": 100.0, "days": 20,
+            "code_nacres": "NA", "consommable": "NA", "quantity": 0,
+        }
+        if category == "Achats":
+            item.update(code_nacres=code, consommable=conso, quantity=10)
+        items.append(item)
+    return items
+
+
+def _register_calculations():
+    for category in CATEGORIES:
+        @benchmark(f"calculator.compute_emission_data[{category}]", ops=CALCULATIONS)
+        def bench(ctx, category=category):
+            calc = ctx.calculator
+            items = _calculation_items(ctx, category)
+            if not items:
+                raise ValueError(f"aucun facteur pour la catégorie {category}")
+
+            def run():
+                for item in items:
+                    calc.compute_emission_data(item)
+            return run
+
+
+_register_calculations()
+
+
+@benchmark("calculator._calculate_mass_based_emissions_old", ops=LOOKUPS)
+def bench_mass_based(ctx):
+    calc = ctx.calculator
+    consumables = ctx.consumable_rows(LOOKUPS, offset=3)
+
+    def run():
+        for code, conso in consumables:
+            calc._calculate_mass_based_emissions_old(code, conso, 10)
+    return run
+
+
+def _register_batches():
+    for size in SIZES:
+        @benchmark(f"calculator.compute_emission_batch[{size}]", size=size, ops=size)
+        def bench(ctx, size=size):
+            calc = ctx.calculator
+            items = ctx.history(size).drop(columns=[
+                "emissions_price", "emissions_price_error", "emission_mass", "emission_mass_error", "total_mass"
+            ])
+            return lambda: calc.compute_emission_batch(items)
+
+
+_register_batches()
+
+
+# ----------------------------------------------------------------------
+# Historiques : lecture / écriture, chargement dans la fenêtre principale
+# ----------------------------------------------------------------------
+def _register_history_io():
+    from utils.history_io import normalize_history, read_history, write_history
+
+    for fmt in HISTORY_FORMATS:
+        for size in SIZES:
+            @benchmark(f"history.write[{fmt}-{size}]", size=size, ops=size)
+            def bench_write(ctx, fmt=fmt, size=size):
+                history = ctx.history(size)
+                path = os.path.join(ctx.tmpdir, f"write_{size}.{fmt}")
+                return lambda: write_history(history, path)
+
+            @benchmark(f"history.read[{fmt}-{size}]", size=size, ops=size)
+            def bench_read(ctx, fmt=fmt, size=size):
+                path = ctx.history_file(fmt, size)
+                base = ctx.data_manager.vintages.base_name
+                return lambda: normalize_history(read_history(path), base)
+
+
+_register_history_io()
+
+
+def _register_main_window():
+    for size in SIZES:
+        @benchmark(f"mainwindow.load_history[{size}]", size=size, ops=size)
+        def bench_load(ctx, size=size):
+            window = ctx.main_window
+            history = ctx.history(size)
+
+            def reset():
+                window.history_model.clear()
+            return (lambda: window.load_history(history)), reset
+
+        @benchmark(f"mainwindow.update_total_emissions[{size}]", size=size, ops=size)
+        def bench_total(ctx, size=size):
+            window = ctx.load_main_window(size)
+            return window.update_total_emissions
+
+
+_register_main_window()
+
+
+# ----------------------------------------------------------------------
+# Graphiques : agrégation de l'historique + rendu (refresh_data), hors écran
+# ----------------------------------------------------------------------
+def _close_charts(window):
+    from windows.main_window import CHART_WINDOWS
+    for chart_type in CHART_WINDOWS:
+        chart = getattr(window, f"{chart_type}_chart_window", None)
+        if chart is not None:
+            # Fenêtre fermée : elle ne doit plus se rafraîchir à chaque modification de l'historique
+            window.data_changed.disconnect(chart.refresh_data)
+            chart.close()
+            setattr(window, f"{chart_type}_chart_window", None)
+
+
+def _register_charts():
+    from windows.main_window import CHART_WINDOWS
+
+    for chart_type in CHART_WINDOWS:
+        for size in SIZES:
+            @benchmark(f"chart.{chart_type}.refresh_data[{size}]", size=size, ops=1)
+            def bench(ctx, chart_type=chart_type, size=size):
+                window = ctx.load_main_window(size)
+                # Une seule fenêtre graphique ouverte : les autres ne se rafraîchissent pas pendant la mesure
+                _close_charts(window)
+                window.generate_chart(chart_type)
+                chart = getattr(window, f"{chart_type}_chart_window")
+                ctx.app.processEvents()
+                return chart.refresh_data
+
+
+_register_charts()
@@ -0,0 +1,279 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# benchmarks/synthetic_ledger.py
+
+"""
+Historiques de calculs synthétiques, reproductibles (graine), de taille quelconque,
+pour les benchmarks et les tests de charge.
+
+    python -m benchmarks.synthetic_ledger 100000                  # CSV, Excel et HDF5 dans ./synthetic_ledgers
+    python -m benchmarks.synthetic_ledger 1000000 --formats csv h5 --out /tmp/ledgers --seed 7
+
+Les clés (catégorie, sous-catégorie, sous-sous-catégorie, nom, année) sont tirées dans la
+table des facteurs, les consommables dans la base des masses (même code NACRES que l'achat),
+les machines avec un type d'électricité ; les valeurs suivent des lois log-normales selon
+l'unité (dépenses, km/jour...) et les émissions sont calculées par compute_emission_batch.
+Les fichiers ont le format de l'export de la fenêtre principale et se réimportent tels quels.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+SEED = 20240601
+FORMATS = ("csv", "xlsx", "h5")
+# Au-delà, l'export Excel dépasse la limite de lignes d'une feuille
+EXCEL_MAX_ROWS = 1_048_575
+
+# Répartition des lignes par catégorie (proche des historiques réels : surtout des achats)
+CATEGORY_WEIGHTS = {
+    "Achats": 0.70,
+    "Véhicules": 0.12,
+    "Machine": 0.08,
+    "Infra. de recherche": 0.05,
+    "Activités agricoles": 0.05,
+}
+# Part des achats faits sous un code NACRES de la base des masses, avec un consommable (calcul massique)
+CONSUMABLE_SHARE = 0.2
+
+# Lois log-normales (moyenne et écart type du logarithme) des valeurs saisies, par unité :
+# dépense en euros, km ou litres par jour, part d'utilisation d'une infrastructure...
+VALUE_LOGNORMAL = {
+    "euro": (5.5, 1.3),
+    "km": (3.5, 0.8),
+    "litre": (2.5, 0.7),
+    "jours mer": (0.5, 0.6),
+    "heure.mer": (2.0, 0.6),
+    "% utilisation infra.": (-4.5, 1.0),
+    "Utilisateur(s)": (0.5, 0.7),
+    "heures.GPU": (7.0, 1.5),
+    "heures.coeur": (9.0, 1.5),
+    "kg d'azote": (5.0, 1.0),
+    "animal.an": (2.5, 1.0),
+}
+DEFAULT_LOGNORMAL = (3.0, 1.0)
+# Véhicules saisis par jour (km/jour, litres/jour) : nombre de jours
+VEHICLE_DAY_UNITS = ("km", "litre")
+VEHICLE_DAYS = (1, 220)
+
+# Machines : nom, puissance (kW) minimale et maximale
+MACHINES = [
+    ("Centrifugeuse", 0.5, 3.0),
+    ("Congélateur -80 °C", 0.8, 1.5),
+    ("Étuve", 0.3, 2.0),
+    ("Hotte à flux laminaire", 0.2, 0.6),
+    ("Thermocycleur PCR", 0.3, 0.9),
+    ("Spectromètre de masse", 1.5, 5.0),
+    ("Microscope confocal", 0.5, 2.5),
+    ("Serveur de calcul", 0.4, 2.0),
+]
+MACHINE_HOURS = (1.0, 24.0)
+MACHINE_DAYS = (1, 250)
+
+# Colonnes de l'export, dans l'ordre
+COLUMNS = [
+    "category", "subcategory", "subsubcategory", "name", "year", "value", "days",
+    "emissions_price", "emissions_price_error", "emission_mass", "emission_mass_error", "total_mass",
+    "code_nacres", "consommable", "unit", "quantity", "electricity_type", "vintage",
+]
+
+
+def generate_history(size, seed=SEED, data_manager=None, calculator=None, vintage=None):
+    """
+    Historique synthétique de `size` lignes, au format de l'export (émissions calculées).
+
+    :param size: nombre de lignes (10^3 à 10^6 et plus)
+    :param seed: graine : même graine, mêmes tables de référence => même historique
+    :param data_manager: DataManager (créé si absent)
+    :param calculator: CarbonCalculator (créé si absent)
+    :param vintage: millésime des facteurs (par défaut le plus récent)
+    :return: DataFrame (colonnes COLUMNS)
+    """
+    if data_manager is None:
+        data_manager = calculator.dm if calculator is not None else _data_manager()
+    if calculator is None:
+        from windows.carbon_calculator import CarbonCalculator
+        calculator = CarbonCalculator(data_manager)
+    vintage = vintage or data_manager.vintages.latest
+
+    rng = np.random.default_rng(seed)
+    factors = data_manager.get_main_data(vintage)
+    names = list(CATEGORY_WEIGHTS)
+    weights = np.array([CATEGORY_WEIGHTS[c] for c in names])
+    categories = rng.choice(len(names), size, p=weights / weights.sum())
+
+    parts = []
+    for code, category in enumerate(names):
+        count = int((categories == code).sum())
+        if not count:
+            continue
+        if category == "Machine":
+            parts.append(_machines(rng, count, factors))
+        else:
+            parts.append(_factor_rows(rng, count, factors, category, data_manager))
+
+    # Lignes dans un ordre aléatoire (comme une saisie au fil de l'eau), index 0..size-1
+    frame = pd.concat(parts, ignore_index=True)
+    frame = frame.iloc[rng.permutation(len(frame))].reset_index(drop=True)
+    frame["vintage"] = vintage
+
+    results = calculator.compute_emission_batch(frame)
+    frame = pd.concat([frame, results.drop(columns="calc_error_msg")], axis=1)
+    return frame[COLUMNS]
+
+
+def _data_manager():
+    from utils.paths import resource_path
+    from windows.data_manager import DataManager
+    return DataManager(resource_path(""))
+
+
+def _values(rng, units):
+    """Valeurs saisies, tirées selon l'unité du facteur."""
+    values = np.empty(len(units))
+    for unit, idx in pd.Series(np.arange(len(units))).groupby(units.to_numpy(), sort=False):
+        mean, sigma = VALUE_LOGNORMAL.get(unit, DEFAULT_LOGNORMAL)
+        values[idx.to_numpy()] = rng.lognormal(mean, sigma, len(idx))
+    return values.round(2)
+
+
+def _factor_rows(rng, count, factors, category, data_manager):
+    """Lignes d'une catégorie de la table des facteurs (clés valides du millésime)."""
+    table = factors[factors["category"] == category]
+    positions = rng.integers(0, len(table), count)
+    consumables = None
+    if category == "Achats":
+        consumables = _consumables_by_code(data_manager)
+        # Une partie des achats sous un code NACRES qui a des consommables
+        codes = table["subsubcategory"].astype(object).fillna("").astype(str).str[:4]
+        eligible = np.flatnonzero(codes.isin(consumables.index).to_numpy())
+        if len(eligible):
+            with_mass = rng.random(count) < CONSUMABLE_SHARE
+            positions[with_mass] = eligible[rng.integers(0, len(eligible), int(with_mass.sum()))]
+    rows = table.iloc[positions].reset_index(drop=True)
+    frame = pd.DataFrame({
+        "category": category,
+        "subcategory": rows["subcategory"].astype(object),
+        "subsubcategory": rows["subsubcategory"].astype(object).fillna(""),
+        "name": rows["name"].astype(object).fillna(""),
+        "year": rows["year"].astype(str),
+        "value": _values(rng, rows["unit"]),
+        "days": 1,
+        "code_nacres": "NA",
+        "consommable": "NA",
+        "unit": rows["unit"].astype(object),
+        "quantity": 0,
+        "electricity_type": "",
+    })
+    if category == "Véhicules":
+        per_day = frame["unit"].isin(VEHICLE_DAY_UNITS).to_numpy()
+        frame.loc[per_day, "days"] = rng.integers(VEHICLE_DAYS[0], VEHICLE_DAYS[1] + 1, int(per_day.sum()))
+    elif category == "Achats":
+        # Code NACRES de l'achat (4 premiers caractères), comme MainWindow.calculate_emission
+        frame["code_nacres"] = frame["subsubcategory"].str[:4].replace("", "NA")
+        _add_consumables(rng, frame, consumables)
+    return frame
+
+
+def _consumables_by_code(data_manager):
+    """Consommables de la base des masses, par code NACRES."""
+    masse = data_manager.get_data_masse()
+    if masse is None or masse.empty:
+        return pd.Series(dtype=object)
+    return masse.groupby(masse["Code NACRES"].astype(str).str.strip())["Consommable"].agg(
+        lambda c: [str(v).strip() for v in c]
+    )
+
+
+def _add_consumables(rng, frame, consumables):
+    """Associe un consommable de même code NACRES à chaque achat qui en a, avec une quantité."""
+    chosen = np.flatnonzero(frame["code_nacres"].isin(consumables.index).to_numpy())
+    if not len(chosen):
+        return
+    codes = frame["code_nacres"].to_numpy()[chosen]
+    picks = rng.random(len(chosen))
+    frame.loc[chosen, "consommable"] = [
+        consumables[code][int(p * len(consumables[code]))] for code, p in zip(codes, picks)
+    ]
+    frame.loc[chosen, "quantity"] = rng.integers(1, 500, len(chosen))
+
+
+def _machines(rng, count, factors):
+    """Machines : puissance x heures/jour x jours (kWh), avec un type d'électricité."""
+    electricity = sorted(factors.loc[factors["category"] == "Électricité", "name"].dropna().unique())
+    machine = rng.integers(0, len(MACHINES), count)
+    low = np.array([m[1] for m in MACHINES])[machine]
+    high = np.array([m[2] for m in MACHINES])[machine]
+    power = rng.uniform(low, high)
+    hours = rng.uniform(*MACHINE_HOURS, count)
+    days = rng.integers(MACHINE_DAYS[0], MACHINE_DAYS[1] + 1, count)
+    return pd.DataFrame({
+        "category": "Machine",
+        "subcategory": np.array([m[0] for m in MACHINES], dtype=object)[machine],
+        "subsubcategory": "",
+        "name": "",
+        "year": "",
+        "value": (power * hours * days).round(2),
+        "days": days,
+        "code_nacres": "NA",
+        "consommable": "NA",
+        "unit": "kWh",
+        "quantity": 0,
+        "electricity_type": rng.choice(electricity, count) if electricity else "",
+    })
+
+
+def write_ledgers(size, directory, formats=FORMATS, seed=SEED, history=None, log=print):
+    """
+    Écrit un historique synthétique dans chacun des formats d'import.
+
+    :return: {format: chemin}
+    """
+    from utils.history_io import write_history
+    if history is None:
+        history = generate_history(size, seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for fmt in formats:
+        if fmt == "xlsx" and len(history) > EXCEL_MAX_ROWS:
+            log(f"[ATTENTION] {len(history)} lignes : trop pour une feuille Excel, format ignoré.")
+            continue
+        path = os.path.join(directory, f"ledger_{size}_{seed}.{fmt}")
+        start = time.perf_counter()
+        write_history(history, path)
+        log(f"[INFO] {path} ({time.perf_counter() - start:.1f} s)")
+        paths[fmt] = path
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historiques de calculs synthétiques (CSV, Excel, HDF5).")
+    parser.add_argument("sizes", type=int, nargs="+", help="nombre(s) de lignes, ex. 1000 100000 1000000")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS), help="formats écrits")
+    parser.add_argument("--out", default="synthetic_ledgers", help="dossier de sortie (par défaut : ./synthetic_ledgers)")
+    parser.add_argument("--seed", type=int, default=SEED, help=f"graine (par défaut : {SEED})")
+    args = parser.parse_args(argv)
+
+    # Données utilisateur (consommables) lues dans un dossier temporaire, comme les benchmarks
+    from benchmarks.fixtures import prepare_environment
+    prepare_environment()
+
+    from windows.carbon_calculator import CarbonCalculator
+    calculator = CarbonCalculator(_data_manager())
+    for size in args.sizes:
+        start = time.perf_counter()
+        history = generate_history(size, args.seed, calculator=calculator)
+        print(f"[INFO] {size} lignes générées en {time.perf_counter() - start:.1f} s")
+        write_ledgers(size, args.out, args.formats, args.seed, history=history)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
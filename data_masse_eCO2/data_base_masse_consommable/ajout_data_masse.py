@@ -10,12 +10,20 @@ import os
 import sys
 import pandas as pd
 
+from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QFormLayout,
-    QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+    QLabel, QLineEdit, QPushButton, QTableView, QAbstractItemView,
     QWidget, QMessageBox, QComboBox, QHeaderView
 )
 
+# Racine du dépôt, pour importer utils/ quand le script est lancé directement
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.consumables_store import ConsumablesStore
+from windows.dataframe_table_model import DataFrameTableModel, DataFrameFilterProxyModel
+from utils.nacres_catalogue import NacresCatalogue, NacresListModel, make_nacres_completer
+from utils.reference_store import REFERENCE_DB, read_reference_table
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -25,13 +33,12 @@ class MainWindow(QMainWindow):
 
         # 1) Dossier de base : on part du répertoire courant
         base_dir = os.path.abspath(os.getcwd())
-        self.nacres_hdf5_file = os.path.join(base_dir, 'data_masse_eCO2', 'nacres_2022.h5')
-        self._all_nacres = []  # List of (code, description) tuples
 
-        # 2) Chemins vers les fichiers HDF5
+        # 2) Chemins vers les fichiers de données
         #    Adapte si ton répertoire n'est pas celui-ci
-        self.hdf5_data_path = os.path.join(base_dir, 'data_masse_eCO2', 'data_eCO2_masse_consommable.hdf5')
-        self.hdf5_materials_path = os.path.join(base_dir, 'data_masse_eCO2', 'empreinte_carbone_materiaux.h5')
+        self.sqlite_data_path = os.path.join(base_dir, 'data_masse_eCO2', 'data_eCO2_masse_consommable.sqlite')
+        self.reference_path = os.path.join(base_dir, REFERENCE_DB)
+        self.nacres_catalogue = NacresCatalogue(self.reference_path)
 
         # 3) Nom des colonnes pour le DataFrame principal
         self.columns = [
@@ -45,7 +52,7 @@ class MainWindow(QMainWindow):
         ]
 
         # 4) Chargement initial des données
-        self.data = self.load_main_data()   # DataFrame principal
+        self.model = DataFrameTableModel(self.load_main_data(), columns=self.columns)  # Modèle du tableau
         self.materials = self.load_materials()  # Liste de matériaux
 
         # 5) Prépare l'interface
@@ -53,44 +60,31 @@ class MainWindow(QMainWindow):
 
     def load_main_data(self) -> pd.DataFrame:
         """
-        Charge le DataFrame principal depuis le fichier HDF5.
-        Si le fichier n'existe pas ou la clé n'existe pas, on crée un DataFrame vide et on le sauvegarde.
+        Charge le DataFrame principal depuis la base SQLite des consommables.
+        La base est créée si elle est absente. En cas d'échec, self.store reste à None :
+        la fenêtre s'ouvre en lecture seule (tableau vide, ajout impossible).
         """
+        self.store = None
         try:
-            if not os.path.exists(self.hdf5_data_path):
-                # Fichier absent : on crée un DF vide et on l'enregistre
-                print(f"[INFO] Le fichier {self.hdf5_data_path} n'existe pas. Création d'un fichier vide.")
-                empty_df = pd.DataFrame(columns=self.columns)
-                empty_df.to_hdf(self.hdf5_data_path, key='data', mode='w')
-                return empty_df
-
-            # Lecture du HDF5
-            df = pd.read_hdf(self.hdf5_data_path, key='data')
-            print("[INFO] Données chargées depuis", self.hdf5_data_path)
-            print(df)  # Debug console : affiche le contenu
+            self.store = ConsumablesStore(self.sqlite_data_path)
+            df = self.store.load()
+            print("[INFO] Données chargées depuis", self.sqlite_data_path)
             return df
-
-        except (FileNotFoundError, KeyError) as e:
-            # On crée un fichier HDF5 vide si la clé "data" n'existe pas
-            print(f"[WARNING] Problème lors du chargement : {e}. Création d'un nouveau DataFrame vide.")
-            empty_df = pd.DataFrame(columns=self.columns)
-            empty_df.to_hdf(self.hdf5_data_path, key='data', mode='w')
-            return empty_df
         except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Erreur inattendue lors du chargement HDF5.\n{e}")
+            QMessageBox.critical(self, "Erreur", f"Erreur inattendue lors du chargement de la base.\n{e}")
             return pd.DataFrame(columns=self.columns)
 
     def load_materials(self) -> list:
         """
-        Charge la liste des matériaux depuis un autre fichier HDF5 (optionnel).
+        Charge la liste des matériaux depuis le fichier des tables de référence.
         Retourne une liste (vide si aucun fichier / aucune info).
         """
         try:
-            if not os.path.exists(self.hdf5_materials_path):
-                print(f"[INFO] Fichier {self.hdf5_materials_path} introuvable. Liste de matériaux vide.")
+            if not os.path.exists(self.reference_path):
+                print(f"[INFO] Fichier {self.reference_path} introuvable. Liste de matériaux vide.")
                 return []
 
-            df_mat = pd.read_hdf(self.hdf5_materials_path, key='data')
+            df_mat = read_reference_table("materiaux", self.reference_path)
             # On suppose qu'il y a une colonne "Materiau" qu'on veut lister
             materials = df_mat["Materiau"].drop_duplicates().sort_values().tolist()
             print("[INFO] Matériaux chargés :", materials)
@@ -100,29 +94,18 @@ class MainWindow(QMainWindow):
             return []
 
     def load_nacres_list(self):
-        if not os.path.exists(self.nacres_hdf5_file):
-            print(f"[INFO] Fichier {self.nacres_hdf5_file} introuvable. Impossible de charger la liste NACRES.")
-            return
-
         try:
-            df_nacres = pd.read_hdf(self.nacres_hdf5_file)
-            self._all_nacres = []
-            for _, row in df_nacres.iterrows():
-                code = str(row.iloc[0])
-                desc = str(row.iloc[1])
-                self._all_nacres.append((code, desc))
+            self.nacres_model = NacresListModel(self.nacres_catalogue, self)
+            self.nacre_combo.setModel(self.nacres_model)
+            self.nacre_search.setCompleter(make_nacres_completer(self, self.nacres_catalogue))
             self.filter_nacres_list()  # Populate the combo box for the first time
         except Exception as e:
             print(f"[ERROR] Impossible de charger la liste NACRES : {e}")
 
     def filter_nacres_list(self):
-        search_text = self.nacre_search.text().strip().lower()
-        self.nacre_combo.clear()
-
-        for (code, desc) in self._all_nacres:
-            if search_text in code.lower() or search_text in desc.lower():
-                display_text = f"{code} - {desc}"
-                self.nacre_combo.addItem(display_text, code)
+        # Recherche dans les index du catalogue (préfixe de code, début de mots du libellé)
+        self.nacres_model.set_filter(self.nacre_search.text())
+        self.nacre_combo.setCurrentIndex(0 if self.nacres_model.rowCount() else -1)
 
     def init_ui(self):
         """Construit la fenêtre PySide6 : form + table."""
@@ -172,9 +155,17 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(self.display_button)
 
         # ==== Tableau des données ====
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(self.columns))
-        self.table.setHorizontalHeaderLabels(self.columns)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filtrer le tableau...")
+        main_layout.addWidget(self.filter_input)
+
+        self.proxy_model = DataFrameFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)  # ordre d'ajout par défaut
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
 
         main_layout.addWidget(self.table)
@@ -186,16 +177,19 @@ class MainWindow(QMainWindow):
 
         # Connect the search bar
         self.nacre_search.textChanged.connect(self.filter_nacres_list)
+        self.filter_input.textChanged.connect(self.proxy_model.setFilterFixedString)
 
-        # Après la création de l'interface, on montre les données existantes
+        # Les données existantes sont déjà dans le modèle
         self.load_nacres_list()
-        self.afficher_donnees()
 
     def ajouter_objet(self):
         """
-        Récupère les infos du formulaire, crée une ligne dans le DataFrame,
-        sauve dans le fichier HDF5, puis met à jour l'affichage.
+        Récupère les infos du formulaire, l'ajoute à la base SQLite des consommables
+        (un seul INSERT), puis ajoute la ligne au tableau.
         """
+        if self.store is None:
+            QMessageBox.warning(self, "Erreur", "La base des consommables n'a pas pu être ouverte : ajout impossible.")
+            return
         nom = self.nom_input.text().strip()
         marque = self.brand_input.text().strip()
         reference = self.ref_input.text().strip()
@@ -218,6 +212,21 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Erreur", "La masse unitaire doit être un nombre (ex: 14.35).")
             return
 
+        # Doublon : recherche indexée dans la base
+        erreur = self.store.find_duplicate(nom, reference, nacre)
+        if erreur:
+            QMessageBox.warning(self, "Erreur", erreur)
+            return
+        proches = self.store.find_near_duplicates(nom, reference, nacre)
+        if proches:
+            noms = ", ".join(p["Consommable"] for p in proches[:10])
+            reponse = QMessageBox.question(
+                self, "Doublon possible",
+                f"Des consommables très proches existent déjà : {noms}.\nAjouter quand même '{nom}' ?"
+            )
+            if reponse != QMessageBox.Yes:
+                return
+
         # Créer un nouvel enregistrement
         new_line = {
             "Consommable": nom,
@@ -229,15 +238,13 @@ class MainWindow(QMainWindow):
             "Source/Signature": source
         }
 
-        # Ajouter la nouvelle ligne au DF existant
-        self.data = pd.concat([self.data, pd.DataFrame([new_line])], ignore_index=True)
-
-        # Sauvegarde HDF5
+        # Sauvegarde : un seul INSERT dans la base, sans réécrire le fichier
         try:
-            self.data.to_hdf(self.hdf5_data_path, key='data', mode='w')
+            self.store.append(new_line)
             QMessageBox.information(self, "Succès", f"L'objet '{nom}' a bien été ajouté.")
         except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible d'écrire dans le fichier HDF5.\n{e}")
+            QMessageBox.critical(self, "Erreur", f"Impossible d'écrire dans la base.\n{e}")
+            return
 
         # Effacer les champs
         self.nom_input.clear()
@@ -250,26 +257,18 @@ class MainWindow(QMainWindow):
         if self.nacre_combo.count() > 0:
             self.nacre_combo.setCurrentIndex(0)
 
-        # Mettre à jour le tableau
-        self.afficher_donnees()
+        # Mettre à jour le tableau : seule la nouvelle ligne est ajoutée au modèle
+        self.model.append_row(new_line)
 
     def afficher_donnees(self):
-        """Relit le HDF5 et affiche son contenu dans le QTableWidget."""
+        """Relit la base et recharge le modèle du tableau."""
+        if self.store is None:
+            return
         try:
-            # On relit le fichier HDF5 pour être sûr d'avoir les données à jour
-            self.data = pd.read_hdf(self.hdf5_data_path, key='data')
+            # On relit la base pour être sûr d'avoir les données à jour
+            self.model.set_dataframe(self.store.load())
         except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Impossible de lire le HDF5.\n{e}")
-            return
-
-        # Ajuster la table
-        self.table.setRowCount(len(self.data))
-
-        for row_idx, row_data in self.data.iterrows():
-            for col_idx, col_name in enumerate(self.columns):
-                val = str(row_data.get(col_name, "N/A"))
-                item = QTableWidgetItem(val)
-                self.table.setItem(row_idx, col_idx, item)
+            QMessageBox.critical(self, "Erreur", f"Impossible de lire la base.\n{e}")
 
 
 def main():
@@ -7,6 +7,8 @@
 
 # ADEME - Base Empreinte® = source.
 
+import os
+import sys
 import pandas as pd
 
 # Données des matériaux
@@ -80,10 +82,19 @@ data_solvant = {
 # Création du DataFrame
 d_mat = pd.DataFrame(data_materiau)
 d_solv = pd.DataFrame(data_solvant)
-# Afficher le DataFrame
-print(d_mat)
-print(d_solv)
 
-# Enregistrer dans un fichier HDF5
-d_mat.to_hdf("./data_masse_eCO2/empreinte_carbone_materiaux.h5", key='data', mode='w')
-d_solv.to_hdf("./data_masse_eCO2/empreinte_carbone_solvants.h5", key='data', mode='w')
\ No newline at end of file
+# Incertitudes en nombres (colonne REAL du fichier de référence)
+d_mat["uncertainty"] = pd.to_numeric(d_mat["uncertainty"])
+d_solv["uncertainty"] = pd.to_numeric(d_solv["uncertainty"])
+
+if __name__ == "__main__":
+    # Afficher le DataFrame
+    print(d_mat)
+    print(d_solv)
+
+    # Reconstruire le fichier des tables de référence (data_masse_eCO2/reference_data.sqlite).
+    # Ce fichier est aussi lu par utils/factor_db_build.py, qui récupère d_mat et d_solv.
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+    from utils.factor_db_build import build
+    build()
+
@@ -16,73 +16,101 @@ import os
 import traceback
 import multiprocessing
 
-from PySide6.QtWidgets import QApplication, QSplashScreen
-from PySide6.QtGui import QIcon, QPixmap
-from PySide6.QtCore import Qt
+# Profilage du démarrage (--profile-startup) : activé avant les autres imports pour les mesurer
+from utils.startup_profile import EXIT_FLAG, measure_imports, profiler, profiling_requested, watch_first_paint
+if profiling_requested():
+    profiler.enable()
 
-from windows.main_window import MainWindow
+with profiler.phase("Import de PySide6"):
+    from PySide6.QtWidgets import QApplication, QSplashScreen
+    from PySide6.QtGui import QIcon, QPixmap
+    from PySide6.QtCore import Qt
+
+with profiler.phase("Import de windows.main_window"):
+    from windows.main_window import MainWindow
 from utils.data_loader import resource_path
+from utils.log import get_logger, setup_logging
+
+logger = get_logger("main")
+
+
+def write_startup_profile(app):
+    """Fin du profilage, au premier affichage : temps d'import mesurés à part, puis rapports écrits."""
+    profiler.mark("Premier affichage")
+    logger.info("Profilage : mesure des temps d'import (processus séparé)…")
+    report_path, trace_path = profiler.write(imports=measure_imports())
+    logger.info("Profil du démarrage : %s", report_path)
+    logger.info("Trace Chrome : %s", trace_path)
+    if EXIT_FLAG in sys.argv:
+        app.quit()
 
 def main():
-    print("\n===== Démarrage de l'application LABeCO2 =====")
+    setup_logging()
+    logger.info("===== Démarrage de l'application LABeCO2 =====")
     try:
-        app = QApplication(sys.argv)
-        print("QApplication créée")
+        with profiler.phase("Création de QApplication"):
+            app = QApplication(sys.argv)
+        logger.debug("QApplication créée")
 
         # Splash screen
         try:
-            splash_pix = QPixmap(resource_path(os.path.join("images", "Logo.png")))
-            splash = QSplashScreen(splash_pix)
-            splash.setWindowFlag(Qt.FramelessWindowHint)
-            splash.showMessage("Chargement de LABeCO2...", Qt.AlignBottom | Qt.AlignCenter, Qt.white)
-            splash.show()
-            app.processEvents()
-            print("SplashScreen affiché")
+            with profiler.phase("Splash screen"):
+                splash_pix = QPixmap(resource_path(os.path.join("images", "Logo.png")))
+                splash = QSplashScreen(splash_pix)
+                splash.setWindowFlag(Qt.FramelessWindowHint)
+                splash.showMessage("Chargement de LABeCO2...", Qt.AlignBottom | Qt.AlignCenter, Qt.white)
+                splash.show()
+                app.processEvents()
+            logger.debug("SplashScreen affiché")
         except Exception as e:
-            print("Erreur lors du splashscreen :", e)
+            logger.warning("Erreur lors du splashscreen : %s", e)
 
         # Appliquer le style QSS
         try:
             qss_path = resource_path(os.path.join("styles", "styles.qss"))
-            print(f"Chargement QSS : {qss_path}")
+            logger.debug("Chargement QSS : %s", qss_path)
             if os.path.exists(qss_path):
-                with open(qss_path, "r") as f:
-                    app.setStyleSheet(f.read())
-                print("QSS appliqué")
+                with profiler.phase("Feuille de style QSS"):
+                    with open(qss_path, "r") as f:
+                        app.setStyleSheet(f.read())
+                logger.debug("QSS appliqué")
             else:
-                print("Fichier QSS non trouvé.")
+                logger.warning("Fichier QSS non trouvé : %s", qss_path)
         except Exception as e:
-            print("Erreur QSS :", e)
+            logger.warning("Erreur QSS : %s", e)
 
         # Appliquer l'icône
         try:
             icon_path = resource_path(os.path.join("images", "icon.icns"))
-            print(f"Chargement icône : {icon_path}")
+            logger.debug("Chargement icône : %s", icon_path)
             if os.path.exists(icon_path):
-                app.setWindowIcon(QIcon(icon_path))
-                print("Icône appliquée")
+                with profiler.phase("Icône"):
+                    app.setWindowIcon(QIcon(icon_path))
+                logger.debug("Icône appliquée")
             else:
-                print("Fichier icône non trouvé.")
+                logger.warning("Fichier icône non trouvé : %s", icon_path)
         except Exception as e:
-            print("Erreur icône :", e)
+            logger.warning("Erreur icône : %s", e)
 
         # Créer la fenêtre principale
         try:
-            print("Création de MainWindow…")
-            window = MainWindow()
-            window.show()
-            splash.finish(window)
-            print("MainWindow affichée")
+            logger.debug("Création de MainWindow…")
+            with profiler.phase("Création de MainWindow"):
+                window = MainWindow()
+            if profiler.enabled:
+                watch_first_paint(window, lambda: write_startup_profile(app))
+            with profiler.phase("Affichage de MainWindow"):
+                window.show()
+                splash.finish(window)
+            logger.info("MainWindow affichée")
             sys.exit(app.exec())
         except Exception as e:
-            print("Erreur dans MainWindow :", e)
-            traceback.print_exc()
+            logger.exception("Erreur dans MainWindow : %s", e)
             input("Appuyez sur Entrée pour quitter...")
             sys.exit(1)
 
     except Exception as e:
-        print("Erreur globale :", e)
-        traceback.print_exc()
+        logger.exception("Erreur globale : %s", e)
         input("Appuyez sur Entrée pour quitter...")
 
 if __name__ == "__main__":
@@ -8,46 +8,87 @@
 import sqlite3
 import os
 import sys
+import json
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
 
-# Fonction utilitaire pour compatibilité PyInstaller
-def resource_path(relative_path):
+DB_FILENAME = "manips_type.sqlite"
+DB_RELATIVE_PATH = os.path.join("manips_types", DB_FILENAME)
+
+try:
+    from utils.paths import resource_path, sqlite_read_only_uri, user_data_path
+except ImportError:
+    # Scripts du dossier lancés directement (python manips_types/...) : racine du dépôt hors de sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.paths import resource_path, sqlite_read_only_uri, user_data_path
+
+# Journal de l'application (voir utils/log.py) ; ce module reste utilisable seul par les scripts du dossier
+logger = logging.getLogger("labeco2.manips_types")
+
+def default_db_path():
     """
-    Récupère le chemin absolu vers une ressource, compatible avec PyInstaller.
+    Chemin par défaut de la base des manips type.
+
+    - Exécutable PyInstaller : base utilisateur dans user_data_dir() ;
+    - Développement : base du dépôt (manips_types/).
     """
-    try:
-        # PyInstaller crée un dossier temporaire _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
+    return user_data_path(DB_RELATIVE_PATH)
 
-    return os.path.join(base_path, relative_path)
 
-class ManipsTypeDB:
-    def __init__(self, db_path='manips_types/manips_type.sqlite'):
-        """
-        Initialise la connexion SQLite et crée les tables si elles n'existent pas.
-        :param db_path: Chemin du fichier de base de données SQLite.
-        """
-        self.db_path = resource_path(db_path)
-        # Connexion à la base (créée si inexistante)
-        self.conn = sqlite3.connect(self.db_path)
-        # Pour récupérer les lignes sous forme de dictionnaires (clé = nom de colonne)
-        self.conn.row_factory = sqlite3.Row
-        self.create_tables()
+# ----------------------------------------------------------------------
+# Migrations du schéma
+# ----------------------------------------------------------------------
+# Chaque migration reçoit un curseur déjà placé dans une transaction.
+# La version courante du schéma est stockée dans PRAGMA user_version :
+# une base à la version N n'exécute que les migrations N+1, N+2, ...
+# Pour faire évoluer le schéma, AJOUTER une fonction en fin de liste
+# (ne jamais modifier une migration déjà livrée).
 
-    def create_tables(self):
-        """
-        Crée les tables 'manips' et 'manips_items' si elles n'existent pas déjà.
-        La table 'manips' a un champ 'source' pour distinguer les manips "native" vs "user".
-        """
-        create_manips_table = """
+def _table_columns(cursor, table):
+    """Retourne la liste des colonnes d'une table (vide si la table n'existe pas)."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+def _add_columns(cursor, table, columns):
+    """
+    Ajoute en lot des colonnes à une table (ALTER TABLE ... ADD COLUMN).
+    Les colonnes déjà présentes sont ignorées, ce qui rend la migration rejouable.
+    :param columns: liste de tuples (nom, définition SQL), ex. [("scale_label", "TEXT")]
+    """
+    existing = set(_table_columns(cursor, table))
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def _rebuild_table(cursor, table, create_sql, columns):
+    """
+    Reconstruit une table par copie (cas non supportés par ALTER TABLE :
+    suppression/renommage/changement de type d'une colonne, contraintes...).
+
+    :param create_sql: CREATE TABLE de la nouvelle structure, avec le nom `{table}__new`
+    :param columns: colonnes à recopier depuis l'ancienne table
+    """
+    cols = ", ".join(columns)
+    cursor.execute(create_sql)
+    cursor.execute(f"INSERT INTO {table}__new ({cols}) SELECT {cols} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+
+def _migration_1_tables_initiales(cursor):
+    """
+    Crée les tables 'manips' et 'manips_items' (schéma historique de la V2.1).
+    La table 'manips' a un champ 'source' pour distinguer les manips "native" vs "user".
+    """
+    cursor.execute("""
         CREATE TABLE IF NOT EXISTS manips (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             source TEXT NOT NULL DEFAULT 'native'
         );
-        """
-        create_manips_items_table = """
+    """)
+    cursor.execute("""
         CREATE TABLE IF NOT EXISTS manips_items (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             manip_id INTEGER NOT NULL,
@@ -65,14 +106,247 @@ class ManipsTypeDB:
             consommable TEXT,
             FOREIGN KEY (manip_id) REFERENCES manips(id)
         );
+    """)
+
+def _migration_2_index_items(cursor):
+    """Index sur manips_items.manip_id : get_manip_items ne parcourt plus toute la table."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_manips_items_manip_id ON manips_items(manip_id)")
+
+def _migration_3_cache_emissions(cursor):
+    """
+    Cache des émissions calculées par manip.
+    Une entrée n'est valable que si le contenu de la manip (content_hash) et la
+    version des bases de facteurs (factors_version) n'ont pas changé.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS manips_emission_cache (
+            manip_id INTEGER PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            factors_version TEXT NOT NULL,
+            results TEXT NOT NULL,
+            FOREIGN KEY (manip_id) REFERENCES manips(id)
+        );
+    """)
+
+def _migration_4_manips_parametrees(cursor):
+    """
+    Manips paramétrées : une manip peut avoir un paramètre d'échelle
+    (ex. "échantillons", "runs", "jours") et une valeur de référence (scale_base).
+    Pour chaque item, scale_fields liste les champs multipliés par le facteur d'échelle.
+    """
+    _add_columns(cursor, "manips", [
+        ("scale_label", "TEXT"),
+        ("scale_base", "REAL NOT NULL DEFAULT 1"),
+    ])
+    _add_columns(cursor, "manips_items", [
+        ("scale_fields", "TEXT NOT NULL DEFAULT 'value,quantity'"),
+    ])
+
+MIGRATIONS = [
+    _migration_1_tables_initiales,
+    _migration_2_index_items,
+    _migration_3_cache_emissions,
+    _migration_4_manips_parametrees,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class SQLiteConnectionManager:
+    """
+    Accès thread-safe à une base SQLite.
+
+    - Une connexion par thread (une connexion sqlite3 ne doit pas être partagée
+      entre threads), réutilisée d'un appel à l'autre ;
+    - Mode WAL : les lectures (GUI, export...) tournent en parallèle d'une écriture ;
+    - Un seul écrivain à la fois : transaction() prend un verrou et ouvre
+      une transaction BEGIN IMMEDIATE, validée ou annulée à la sortie du bloc.
+
+    Exemple :
+        with manager.transaction() as conn:
+            conn.execute("UPDATE manips SET name = ? WHERE id = ?", (name, manip_id))
+    """
+
+    def __init__(self, db_path, timeout=30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        # Le mode WAL est persistant dans le fichier : il suffit de l'activer une fois
+        self.connection().execute("PRAGMA journal_mode=WAL")
+
+    def connection(self):
+        """Retourne la connexion du thread courant (ouverte au premier appel)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False uniquement pour permettre close_all() depuis un autre
+            # thread : chaque connexion reste utilisée par le seul thread qui l'a ouverte.
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            # Pour récupérer les lignes sous forme de dictionnaires (clé = nom de colonne)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Context manager de lecture : fournit la connexion du thread courant."""
+        yield self.connection()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager d'écriture : un seul écrivain à la fois, COMMIT en fin de bloc,
+        ROLLBACK en cas d'exception. Les blocs imbriqués réutilisent la transaction en cours.
         """
+        with self._write_lock:
+            conn = self.connection()
+            if conn.in_transaction:
+                yield conn
+                return
+            # BEGIN explicite : sqlite3 n'ouvre pas de transaction pour les DDL
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def close(self):
+        """Ferme la connexion du thread courant."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        """Ferme toutes les connexions ouvertes (à appeler à la fermeture de l'application)."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
 
-        cursor = self.conn.cursor()
-        cursor.execute(create_manips_table)
-        cursor.execute(create_manips_items_table)
-        self.conn.commit()
 
-    def add_manip(self, manip_name, items_list, source="native"):
+class ManipsTypeDB:
+    """
+    Base des manips type.
+
+    L'accès passe par un SQLiteConnectionManager : les méthodes peuvent être
+    appelées depuis n'importe quel thread (sauvegarde, recalcul, export en tâche de fond).
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Initialise la connexion SQLite et met le schéma à jour (migrations).
+        :param db_path: Chemin du fichier de base de données SQLite, utilisé tel quel.
+                        Si None, on utilise default_db_path() (dossier utilisateur
+                        pour l'exécutable, dossier manips_types/ en développement).
+        """
+        self.db_path = default_db_path() if db_path is None else db_path
+        is_new = not os.path.exists(self.db_path)
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Connexions à la base (créée si inexistante), une par thread
+        self.db = SQLiteConnectionManager(self.db_path)
+        self.migrate()
+
+        # Première ouverture de la base utilisateur : on reprend les manips
+        # natives livrées dans le bundle (lecture seule, sans copie de fichier).
+        if is_new:
+            bundled = resource_path(DB_RELATIVE_PATH)
+            if os.path.exists(bundled) and os.path.abspath(bundled) != os.path.abspath(self.db_path):
+                self.import_manips_from(bundled)
+
+    @property
+    def conn(self):
+        """Connexion SQLite du thread courant."""
+        return self.db.connection()
+
+    def close(self):
+        """Ferme toutes les connexions à la base."""
+        self.db.close_all()
+
+    def schema_version(self):
+        """Retourne la version du schéma stockée dans la base (PRAGMA user_version)."""
+        with self.db.read() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self):
+        """
+        Applique les migrations manquantes, dans l'ordre, en une seule transaction.
+        En cas d'erreur, la base est laissée intacte dans sa version d'origine.
+        """
+        current = self.schema_version()
+        if current > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"La base {self.db_path} est en version {current}, plus récente que "
+                f"celle supportée par cette version de LABeCO2 ({SCHEMA_VERSION})."
+            )
+        if current == SCHEMA_VERSION:
+            return
+
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            for version in range(current + 1, SCHEMA_VERSION + 1):
+                MIGRATIONS[version - 1](cursor)
+            # PRAGMA user_version est transactionnel : il n'est validé qu'avec le COMMIT
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def create_tables(self):
+        """
+        Conservé pour compatibilité : crée ou met à jour les tables via migrate().
+        """
+        self.migrate()
+
+    def import_manips_from(self, other_db_path):
+        """
+        Recopie les manips (et leurs items) d'une autre base, ouverte en lecture seule.
+        Sert à initialiser la base utilisateur avec les manips natives du bundle.
+        """
+        source = sqlite3.connect(sqlite_read_only_uri(other_db_path), uri=True)
+        source.row_factory = sqlite3.Row
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+
+                def shared_columns(table, excluded):
+                    src_cols = set(_table_columns(source.cursor(), table))
+                    return [c for c in _table_columns(cursor, table) if c in src_cols and c not in excluded]
+
+                manip_cols = shared_columns("manips", ("id",))
+                item_cols = shared_columns("manips_items", ("id", "manip_id"))
+                manips = source.execute(f"SELECT id, {', '.join(manip_cols)} FROM manips ORDER BY id").fetchall()
+
+                for m in manips:
+                    cursor.execute(
+                        f"INSERT INTO manips ({', '.join(manip_cols)}) VALUES ({', '.join('?' * len(manip_cols))})",
+                        tuple(m)[1:]
+                    )
+                    new_id = cursor.lastrowid
+                    rows = source.execute(
+                        f"SELECT {', '.join(item_cols)} FROM manips_items WHERE manip_id = ?", (m["id"],)
+                    ).fetchall()
+                    cursor.executemany(
+                        f"INSERT INTO manips_items (manip_id, {', '.join(item_cols)}) "
+                        f"VALUES (?, {', '.join('?' * len(item_cols))})",
+                        [(new_id, *tuple(r)) for r in rows]
+                    )
+        finally:
+            source.close()
+
+    def add_manip(self, manip_name, items_list, source="native", scale_label=None, scale_base=1.0):
         """
         Ajoute une nouvelle manip et ses items dans la base.
         :param manip_name: str, nom de la manip
@@ -98,19 +372,27 @@ class ManipsTypeDB:
               }
             ]
         :param source: "native" ou "user" par ex. pour distinguer l'origine
+        :param scale_label: nom du paramètre d'échelle (ex. "échantillons"), None si la manip est fixe
+        :param scale_base: valeur du paramètre pour laquelle les items ont été saisis
+            (ex. 10 échantillons). Chaque item peut préciser "scale_fields"
+            (par défaut "value,quantity") : les champs multipliés lors de la mise à l'échelle.
         """
-        cursor = self.conn.cursor()
-        # 1) Insérer la manip dans la table manips
-        cursor.execute("INSERT INTO manips (name, source) VALUES (?, ?)", (manip_name, source))
-        manip_id = cursor.lastrowid  # Récupère l'ID auto-généré pour la manip
+        # Manip et items sont écrits dans une seule transaction : tout ou rien
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            # 1) Insérer la manip dans la table manips
+            cursor.execute(
+                "INSERT INTO manips (name, source, scale_label, scale_base) VALUES (?, ?, ?, ?)",
+                (manip_name, source, scale_label or None, float(scale_base or 1.0))
+            )
+            manip_id = cursor.lastrowid  # Récupère l'ID auto-généré pour la manip
 
-        # 2) Insérer chaque item dans la table manips_items
-        for item in items_list:
-            cursor.execute("""
+            # 2) Insérer chaque item dans la table manips_items
+            cursor.executemany("""
                 INSERT INTO manips_items 
-                    (manip_id, category, subcategory, subsubcategory, name, value, unit, days, year, electricity_type, quantity, consommable)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+                    (manip_id, category, subcategory, subsubcategory, name, value, unit, days, year, electricity_type, quantity, consommable, scale_fields)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(
                 manip_id,
                 item.get("category", ""),
                 item.get("subcategory", ""),
@@ -122,10 +404,10 @@ class ManipsTypeDB:
                 item.get("year", 0.0),
                 item.get("electricity_type", ""),
                 item.get("quantity", 0.0),
-                item.get("consommable", "")
-            ))
-        print("ADD MANIP : ", items_list)
-        self.conn.commit()
+                item.get("consommable", ""),
+                item.get("scale_fields", "value,quantity")
+            ) for item in items_list])
+        logger.debug("Manip ajoutée (%d items) : %s", len(items_list), items_list)
     
     def update_manip_name(self, manip_id, new_name):
         """
@@ -133,13 +415,12 @@ class ManipsTypeDB:
         :param manip_id: int, l'ID de la manip à modifier
         :param new_name: str, le nouveau nom
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE manips
-            SET name = ?
-            WHERE id = ?
-        """, (new_name, manip_id))
-        self.conn.commit()
+        with self.db.transaction() as conn:
+            conn.execute("""
+                UPDATE manips
+                SET name = ?
+                WHERE id = ?
+            """, (new_name, manip_id))
 
     def update_manip_source(self, manip_id, new_source):
         """
@@ -147,20 +428,19 @@ class ManipsTypeDB:
         :param manip_id: int, l'ID de la manip à modifier
         :param new_source: str, la nouvelle source
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            UPDATE manips
-            SET source = ?
-            WHERE id = ?
-        """, (new_source, manip_id))
-        self.conn.commit()
+        with self.db.transaction() as conn:
+            conn.execute("""
+                UPDATE manips
+                SET source = ?
+                WHERE id = ?
+            """, (new_source, manip_id))
 
     def list_manips_with_id(self):
         """
-        Retourne la liste (id, name, source) de toutes les manips, classées par id.
+        Retourne la liste (id, name, source, scale_label) de toutes les manips, classées par id.
         """
         cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, source FROM manips ORDER BY id ASC")
+        cursor.execute("SELECT id, name, source, scale_label FROM manips ORDER BY id ASC")
         rows = cursor.fetchall()
         return [dict(r) for r in rows]
 
@@ -193,7 +473,7 @@ class ManipsTypeDB:
         manip_id = row["id"]
         # Maintenant on récupère tous les items associés à ce manip_id
         cursor.execute("""
-            SELECT category, subcategory, subsubcategory, name, value, unit, days, year, electricity_type, quantity, consommable
+            SELECT category, subcategory, subsubcategory, name, value, unit, days, year, electricity_type, quantity, consommable, scale_fields
             FROM manips_items
             WHERE manip_id = ?
         """, (manip_id,))
@@ -212,6 +492,56 @@ class ManipsTypeDB:
                 "year": r["year"],
                 "electricity_type": r["electricity_type"],
                 "quantity": r["quantity"],
-                "consommable": r["consommable"]
+                "consommable": r["consommable"],
+                "scale_fields": r["scale_fields"]
             })
-        return items
\ No newline at end of file
+        return items
+
+    def get_manip_info(self, manip_name):
+        """
+        Retourne les métadonnées d'une manip (id, name, source, scale_label, scale_base),
+        ou None si elle n'existe pas.
+        """
+        row = self.conn.execute(
+            "SELECT id, name, source, scale_label, scale_base FROM manips WHERE name = ?", (manip_name,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_manip_id(self, manip_name):
+        """Retourne l'ID d'une manip à partir de son nom (None si elle n'existe pas)."""
+        row = self.conn.execute("SELECT id FROM manips WHERE name = ?", (manip_name,)).fetchone()
+        return row["id"] if row else None
+
+    @staticmethod
+    def items_hash(items_list):
+        """
+        Empreinte (SHA-1) du contenu d'une manip : toute modification d'un item
+        (valeur, quantité, catégorie...) change l'empreinte.
+        """
+        payload = json.dumps(items_list, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get_cached_emissions(self, manip_id, content_hash, factors_version):
+        """
+        Retourne la liste des items calculés mise en cache pour cette manip,
+        ou None si le cache est absent ou périmé (contenu ou facteurs modifiés).
+        """
+        row = self.conn.execute(
+            "SELECT content_hash, factors_version, results FROM manips_emission_cache WHERE manip_id = ?",
+            (manip_id,)
+        ).fetchone()
+        if not row or row["content_hash"] != content_hash or row["factors_version"] != factors_version:
+            return None
+        return json.loads(row["results"])
+
+    def store_cached_emissions(self, manip_id, content_hash, factors_version, results):
+        """
+        Enregistre les items calculés d'une manip (remplace l'entrée précédente).
+        :param results: liste de dictionnaires (sérialisés en JSON)
+        """
+        payload = json.dumps(results, ensure_ascii=False, default=str)
+        with self.db.transaction() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO manips_emission_cache (manip_id, content_hash, factors_version, results)
+                VALUES (?, ?, ?, ?)
+            """, (manip_id, content_hash, factors_version, payload))
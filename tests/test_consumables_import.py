@@ -0,0 +1,49 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# tests/test_consumables_import.py
+
+import pandas as pd
+import pytest
+
+from utils.consumables_import import REJECT_COL, import_catalogue
+from utils.consumables_store import ConsumablesStore
+
+MATERIALS = pd.DataFrame({"Materiau": ["Polypropylène (PP)"]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConsumablesStore(str(tmp_path / "consommables.sqlite"))
+    store.append({
+        "Consommable": "Tube Falcon Test 50 mL", "Référence": "REF-TEST-1",
+        "Code NACRES": "NB13", "Masse unitaire (g)": 12.0, "Matériau": "Polypropylène (PP)",
+    })
+    yield store
+    store.close()
+
+
+def test_repeated_near_duplicate_is_imported_once(store):
+    before = len(store)
+    # Deux fois la même ligne, proche (casse, accents) du consommable existant
+    row = {"Consommable": "tube falcon test 50 ml", "Référence": "REF-TEST-2",
+           "Code NACRES": "NB13", "Masse unitaire (g)": "12", "Matériau": "PP"}
+    catalogue = pd.DataFrame([row, row])
+
+    valid, rejected = import_catalogue(store, catalogue, MATERIALS, allow_near_duplicates=True)
+
+    assert len(valid) == 1
+    assert rejected[REJECT_COL].tolist() == ["doublon dans le fichier"]
+    assert len(store) == before + 1
+
+
+def test_near_duplicate_rejected_by_default(store):
+    row = {"Consommable": "tube falcon test 50 ml", "Référence": "REF-TEST-2",
+           "Code NACRES": "NB13", "Masse unitaire (g)": "12", "Matériau": "PP"}
+
+    valid, rejected = import_catalogue(store, pd.DataFrame([row, row]), MATERIALS)
+
+    assert valid.empty
+    assert rejected[REJECT_COL].tolist() == ["doublon proche", "doublon dans le fichier"]
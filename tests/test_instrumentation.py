@@ -0,0 +1,42 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# tests/test_instrumentation.py
+
+import statistics
+
+import pytest
+
+from utils.instrumentation import Instrumentation, _percentile
+
+
+def test_percentiles_of_a_single_sample():
+    registry = Instrumentation(enabled=True)
+    registry.record("action", 0.010)
+
+    (row,) = registry.stats()
+
+    assert row["count"] == 1
+    assert row["p50_ms"] == row["p95_ms"] == row["p99_ms"] == row["max_ms"] == 10.0
+
+
+def test_median_of_two_samples_is_their_mean():
+    registry = Instrumentation(enabled=True)
+    registry.record("action", 0.010)
+    registry.record("action", 0.030)
+
+    (row,) = registry.stats()
+
+    assert row["p50_ms"] == 20.0
+    assert row["p95_ms"] == 29.0
+    assert row["p99_ms"] == 29.8
+    assert row["max_ms"] == 30.0
+
+
+def test_percentiles_match_inclusive_quantiles():
+    ordered = sorted([0.7, 0.1, 0.4, 0.9, 0.3, 0.2, 0.8])
+    quartiles = statistics.quantiles(ordered, n=4, method="inclusive")
+
+    assert [_percentile(ordered, q) for q in (25, 50, 75)] == pytest.approx(quartiles)
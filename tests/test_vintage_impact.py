@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# tests/test_vintage_impact.py
+
+import pandas as pd
+
+from utils.factor_vintages import FactorVintages
+from utils.vintage_impact import CHANGED, UNKNOWN_VINTAGE, VintageImpact
+
+COLUMNS = ["category", "subcategory", "subsubcategory", "name", "unit", "year", "total", "uncertainty"]
+
+
+def _vintages():
+    """Base 20240101 et deux millésimes : "Papier " (espace finale) change en 2025, "Bois" en 2026."""
+    base = pd.DataFrame([
+        ["Achats", "Fournitures", "", "Papier ", "euro", 2019, 1.0, 0.1],
+        ["Achats", "Fournitures", "", "Bois", "euro", 2019, 2.0, 0.1],
+        ["Électricité", "", "", "France", "kWh", 2019, 0.05, 0.1],
+    ], columns=COLUMNS)
+    deltas = pd.DataFrame([
+        ["20250101", "modif", "Achats", "Fournitures", "", "Papier ", "euro", 2019, 1.5, 0.1],
+        ["20260101", "modif", "Achats", "Fournitures", "", "Papier ", "euro", 2019, 1.5, 0.1],
+        ["20260101", "modif", "Achats", "Fournitures", "", "Bois", "euro", 2019, 3.0, 0.1],
+    ], columns=["millesime", "operation"] + COLUMNS)
+    dates = pd.DataFrame({"millesime": ["20250101", "20260101"], "date": ["2025-01-01", "2026-01-01"]})
+    return FactorVintages(base, "20240101", "2024-01-01", deltas, dates)
+
+
+def _history(rows):
+    return pd.DataFrame(rows, columns=["category", "subcategory", "subsubcategory", "name",
+                                       "value", "emissions_price", "vintage"])
+
+
+def test_name_with_trailing_space_is_matched():
+    impact = VintageImpact(_vintages(), "20240101", "20250101")
+    history = _history([
+        ["Achats", "Fournitures", "", "Papier ", 100.0, 100.0, "20240101"],
+        ["Achats", "Fournitures", "", "Bois", 100.0, 200.0, "20240101"],
+    ])
+
+    lines, categories = impact.history(history)
+
+    assert lines["line"].tolist() == [0]
+    assert lines.loc[0, "name"] == "Papier "
+    assert lines.loc[0, "status"] == CHANGED
+    assert lines.loc[0, "delta"] == 50.0
+    assert categories.loc[0, "emissions_new"] == 350.0
+
+
+def test_each_line_starts_from_its_own_vintage():
+    impact = VintageImpact(_vintages(), "20240101", "20260101")
+    history = _history([
+        # Calculée en 2025 : "Papier " ne change plus en 2026
+        ["Achats", "Fournitures", "", "Papier ", 100.0, 150.0, "20250101"],
+        # Sans millésime : part de --old (base), "Papier " change
+        ["Achats", "Fournitures", "", "Papier ", 100.0, 100.0, ""],
+        # Calculée en 2025 : "Bois" change en 2026
+        ["Achats", "Fournitures", "", "Bois", 100.0, 200.0, "20250101"],
+        # Déjà calculée avec le millésime d'arrivée
+        ["Achats", "Fournitures", "", "Bois", 100.0, 300.0, "20260101"],
+        ["Achats", "Fournitures", "", "Bois", 100.0, 200.0, "20230101"],
+    ])
+
+    lines, _ = impact.history(history)
+
+    assert lines["line"].tolist() == [1, 2, 4]
+    assert lines["vintage"].tolist() == ["20240101", "20250101", "20230101"]
+    assert lines["delta"].tolist()[:2] == [50.0, 100.0]
+    assert lines["status"].tolist() == [CHANGED, CHANGED, UNKNOWN_VINTAGE]
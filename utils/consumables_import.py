@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/consumables_import.py
+
+import os
+import re
+import pandas as pd
+
+from utils.consumables_store import COLUMNS, normalize_key
+
+# Colonne ajoutée au rapport des lignes rejetées
+REJECT_COL = "Motif du rejet"
+# Numéro de ligne dans le fichier source (en-tête = ligne 1)
+LINE_COL = "Ligne"
+
+# Noms de colonnes acceptés dans les catalogues fournisseurs (clé normalisée -> colonne)
+COLUMN_ALIASES = {
+    "consommable": "Consommable",
+    "nom": "Consommable",
+    "designation": "Consommable",
+    "marque": "Marque",
+    "fournisseur": "Marque",
+    "reference": "Référence",
+    "ref": "Référence",
+    "code nacres": "Code NACRES",
+    "nacres": "Code NACRES",
+    "masse unitaire (g)": "Masse unitaire (g)",
+    "masse (g)": "Masse unitaire (g)",
+    "masse": "Masse unitaire (g)",
+    "materiau": "Matériau",
+    "matiere": "Matériau",
+    "source/signature": "Source/Signature",
+    "source": "Source/Signature",
+}
+
+
+def read_catalogue(path):
+    """
+    Lit un catalogue fournisseur (.csv, .xlsx/.xls ou .h5/.hdf5) et renomme
+    les colonnes reconnues vers celles de la base des consommables.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        # Séparateur détecté automatiquement (« , » ou « ; » selon le tableur)
+        df = pd.read_csv(path, sep=None, engine="python", dtype=str)
+    elif ext in (".xlsx", ".xls"):
+        df = pd.read_excel(path, dtype=str)
+    elif ext in (".h5", ".hdf5"):
+        df = pd.read_hdf(path)
+    else:
+        raise ValueError(f"Format de catalogue non pris en charge : {ext}")
+
+    df = df.rename(columns=lambda c: COLUMN_ALIASES.get(normalize_key(c), c))
+    missing = [c for c in ("Consommable", "Code NACRES", "Masse unitaire (g)", "Matériau") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans le catalogue : {', '.join(missing)}")
+    return df
+
+
+def material_aliases(data_materials):
+    """
+    Table de correspondance (clé normalisée -> nom officiel) des matériaux connus.
+    Le nom complet et l'abréviation entre parenthèses sont acceptés :
+    "polypropylene (pp)", "PP" -> "Polypropylène (PP)".
+    """
+    aliases = {}
+    for name in data_materials["Materiau"].dropna().unique():
+        aliases[normalize_key(name)] = name
+        abbreviation = re.search(r"\(([^)]+)\)\s*$", name)
+        if abbreviation:
+            aliases.setdefault(normalize_key(abbreviation.group(1)), name)
+    return aliases
+
+
+def validate_catalogue(df, data_materials, store=None, nacres_codes=None, allow_near_duplicates=False):
+    """
+    Valide un catalogue de consommables, colonne par colonne (opérations vectorisées).
+
+    Contrôles : nom et Code NACRES renseignés, Code NACRES connu (si nacres_codes est fourni),
+    masse numérique strictement positive, matériau présent dans data_materials,
+    puis doublons via les index de la base (store.classify_duplicates).
+
+    :param df: DataFrame lu par read_catalogue
+    :param data_materials: DataFrame des matériaux (colonne 'Materiau')
+    :param store: ConsumablesStore pour la détection des doublons (optionnel)
+    :param nacres_codes: ensemble des codes NACRES valides (optionnel)
+    :param allow_near_duplicates: accepter les doublons proches (accents, casse, espaces)
+    :return: (lignes valides, lignes rejetées avec leur motif)
+    """
+    df = df.reindex(columns=list(COLUMNS)).copy()
+    df[LINE_COL] = df.index + 2 if isinstance(df.index, pd.RangeIndex) else range(2, len(df) + 2)
+
+    text_cols = ["Consommable", "Marque", "Référence", "Code NACRES", "Source/Signature"]
+    for col in text_cols:
+        df[col] = df[col].astype("string").str.strip().replace("", pd.NA)
+    df["Code NACRES"] = df["Code NACRES"].str.upper()
+
+    raw_masses = df["Masse unitaire (g)"].astype("string")
+    masses = pd.to_numeric(raw_masses.str.replace(",", ".", regex=False).str.strip(), errors="coerce")
+    df["Masse unitaire (g)"] = masses
+
+    aliases = material_aliases(data_materials)
+    materials = df["Matériau"].astype("string")
+    df["Matériau"] = materials.map(lambda v: aliases.get(normalize_key(v)) if pd.notna(v) else None)
+
+    # Motif de rejet : le premier contrôle en échec l'emporte
+    reasons = pd.Series("", index=df.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons[mask.fillna(False).astype(bool) & (reasons == "")] = reason
+
+    reject(df["Consommable"].isna(), "nom manquant")
+    reject(df["Code NACRES"].isna(), "code NACRES manquant")
+    if nacres_codes is not None:
+        reject(~df["Code NACRES"].isin(nacres_codes), "code NACRES inconnu")
+    reject(masses.isna(), "masse non numérique")
+    reject(masses <= 0, "masse négative ou nulle")
+    reject(df["Matériau"].isna(), "matériau inconnu")
+    df.loc[df["Matériau"].isna(), "Matériau"] = materials
+
+    if store is not None:
+        candidates = reasons == ""
+        keys = df.loc[candidates, ["Consommable", "Référence", "Code NACRES"]]
+        statuses = store.classify_duplicates(keys.astype(object).where(keys.notna(), None))
+        if allow_near_duplicates:
+            statuses = statuses.replace("doublon proche", "")
+        reasons.loc[statuses.index] = statuses
+
+    rejected = df[reasons != ""].copy()
+    rejected["Masse unitaire (g)"] = raw_masses[reasons != ""]  # valeur telle que saisie
+    rejected[REJECT_COL] = reasons[reasons != ""]
+    valid = df[reasons == ""].drop(columns=[LINE_COL])
+    return valid, rejected
+
+
+def import_catalogue(store, df, data_materials, nacres_codes=None, allow_near_duplicates=False):
+    """
+    Importe un catalogue : validation, filtrage des doublons et écriture du lot
+    en une seule transaction.
+
+    :return: (lignes importées, lignes rejetées avec leur motif)
+    """
+    valid, rejected = validate_catalogue(
+        df, data_materials, store=store, nacres_codes=nacres_codes,
+        allow_near_duplicates=allow_near_duplicates
+    )
+    if not valid.empty:
+        store.append_many(valid)
+    return valid, rejected
@@ -0,0 +1,265 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/consumables_store.py
+
+import os
+import sqlite3
+import unicodedata
+import pandas as pd
+
+from utils.paths import resource_path, sqlite_read_only_uri, user_data_path
+
+# Fichier SQLite des consommables
+CONSUMABLES_DB = "data_masse_eCO2/data_eCO2_masse_consommable.sqlite"
+
+# Colonnes du DataFrame des consommables -> colonnes de la table SQLite
+COLUMNS = {
+    "Consommable": "consommable",
+    "Marque": "marque",
+    "Référence": "reference",
+    "Code NACRES": "code_nacres",
+    "Masse unitaire (g)": "masse_g",
+    "Matériau": "materiau",
+    "Source/Signature": "source",
+}
+
+
+def normalize_key(value):
+    """
+    Forme normalisée d'un texte pour la détection des doublons proches :
+    sans accents, sans distinction de casse, espaces multiples réduits.
+    "  Tube  Falcon 15 ML\t" et "tube falcon 15 ml" ont la même clé.
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class ConsumablesStore:
+    """
+    Base des masses de consommables, stockée dans une table SQLite.
+
+    Contrairement à l'ancien fichier HDF5 (réécrit en entier à chaque ajout),
+    un ajout est un simple INSERT, et la recherche de doublons passe par les index
+    sur le nom et sur (Code NACRES, Référence) : le coût ne dépend pas de la taille de la base.
+
+    Deux index en mémoire (dictionnaires), construits à l'ouverture et tenus à jour à chaque ajout,
+    servent à la détection des doublons :
+    - clés exactes : nom, et couple (Code NACRES, Référence) ;
+    - clés normalisées (normalize_key) : mêmes clés aux accents, à la casse et aux espaces près,
+      pour signaler les doublons proches.
+    """
+
+    def __init__(self, db_path=None, legacy_hdf5_path=None):
+        """
+        :param db_path: chemin du fichier SQLite (par défaut : dossier utilisateur
+                        pour l'exécutable, fichier du dépôt en développement).
+        :param legacy_hdf5_path: ancien fichier HDF5 (versions précédentes de LABeCO2),
+                                 importé à la création de la base s'il est fourni.
+        """
+        self.db_path = db_path or user_data_path(CONSUMABLES_DB)
+        self.legacy_hdf5_path = legacy_hdf5_path
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._init_schema()
+        self._build_indexes()
+
+    def _init_schema(self):
+        """Crée la table et ses index ; importe les données existantes à la création."""
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+            return
+
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS consommables (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    consommable TEXT NOT NULL,
+                    marque TEXT,
+                    reference TEXT,
+                    code_nacres TEXT NOT NULL,
+                    masse_g REAL NOT NULL,
+                    materiau TEXT NOT NULL,
+                    source TEXT
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_consommables_nacres ON consommables (code_nacres, reference)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_consommables_nom ON consommables (consommable)"
+            )
+            seed = self._read_seed()
+            if seed is not None and not seed.empty:
+                self._insert_frame(seed)
+            # Import fait une seule fois, même si l'utilisateur vide ensuite la table
+            self.conn.execute("PRAGMA user_version = 1")
+
+    def _read_seed(self):
+        """
+        Données initiales : la base SQLite livrée avec l'application (exécutable)
+        ou, à défaut, l'ancien fichier HDF5 s'il a été fourni.
+        """
+        bundled = resource_path(CONSUMABLES_DB)
+        if os.path.abspath(bundled) != os.path.abspath(self.db_path) and os.path.exists(bundled):
+            source = sqlite3.connect(sqlite_read_only_uri(bundled), uri=True)
+            try:
+                return pd.read_sql_query(
+                    f"SELECT {', '.join(COLUMNS.values())} FROM consommables ORDER BY id", source
+                ).rename(columns={v: k for k, v in COLUMNS.items()})
+            finally:
+                source.close()
+        if self.legacy_hdf5_path and os.path.exists(self.legacy_hdf5_path):
+            return pd.read_hdf(self.legacy_hdf5_path)
+        return None
+
+    def _insert_frame(self, df):
+        """Insère un DataFrame (colonnes de COLUMNS) en un seul executemany."""
+        df = df.reindex(columns=list(COLUMNS))
+        df = df.astype(object).where(df.notna(), None)
+        self.conn.executemany(
+            f"INSERT INTO consommables ({', '.join(COLUMNS.values())}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})",
+            df.itertuples(index=False, name=None)
+        )
+
+    # ------------------------------------------------------------------
+    # Index des doublons
+    # ------------------------------------------------------------------
+    def _build_indexes(self):
+        """Construit les index de doublons en une seule lecture de la table."""
+        self._rows = {}          # id -> (nom, référence, code NACRES)
+        self._exact = {}         # clé exacte -> id
+        self._normalized = {}    # clé normalisée -> [ids]
+        rows = self.conn.execute("SELECT id, consommable, reference, code_nacres FROM consommables")
+        for row in rows:
+            self._index_row(row["id"], row["consommable"], row["reference"], row["code_nacres"])
+
+    @staticmethod
+    def _keys(nom, reference, code_nacres, normalize):
+        """
+        Clés d'un consommable : son nom, et le couple (Code NACRES, Référence)
+        si la référence est renseignée.
+        """
+        norm = normalize_key if normalize else (lambda v: "" if v is None else str(v).strip())
+        keys = [("nom", norm(nom))]
+        if norm(reference):
+            keys.append(("nacres_ref", norm(code_nacres), norm(reference)))
+        return keys
+
+    def _index_row(self, row_id, nom, reference, code_nacres):
+        self._rows[row_id] = (nom, reference, code_nacres)
+        for key in self._keys(nom, reference, code_nacres, normalize=False):
+            self._exact.setdefault(key, row_id)
+        for key in self._keys(nom, reference, code_nacres, normalize=True):
+            self._normalized.setdefault(key, []).append(row_id)
+
+    def _describe(self, row_id):
+        nom, reference, code_nacres = self._rows[row_id]
+        return {"id": row_id, "Consommable": nom, "Référence": reference, "Code NACRES": code_nacres}
+
+    def find_near_duplicates(self, nom, reference, code_nacres):
+        """
+        Consommables existants dont le nom, ou le couple (Code NACRES, Référence),
+        ne diffère que par les accents, la casse ou les espaces.
+        Retourne une liste de dictionnaires (id, Consommable, Référence, Code NACRES).
+        """
+        ids = []
+        for key in self._keys(nom, reference, code_nacres, normalize=True):
+            for row_id in self._normalized.get(key, []):
+                if row_id not in ids:
+                    ids.append(row_id)
+        return [self._describe(row_id) for row_id in ids]
+
+    def classify_duplicates(self, df):
+        """
+        Classe chaque ligne d'un DataFrame à importer (colonnes de COLUMNS), en temps linéaire :
+        - "doublon" : même nom, ou même (Code NACRES, Référence), qu'un consommable existant ;
+        - "doublon dans le fichier" : répète une ligne précédente du même import (testé avant
+          les doublons proches : accepter ceux-ci n'importe pas plusieurs fois la même ligne) ;
+        - "doublon proche" : même nom ou couple qu'un consommable existant, aux accents,
+          à la casse et aux espaces près ;
+        - "" : nouvelle ligne.
+        Retourne une Series alignée sur l'index de df.
+        """
+        statuses = []
+        seen = set()
+        for nom, reference, code_nacres in zip(df["Consommable"], df["Référence"], df["Code NACRES"]):
+            exact_keys = self._keys(nom, reference, code_nacres, normalize=False)
+            norm_keys = self._keys(nom, reference, code_nacres, normalize=True)
+            if any(key in self._exact for key in exact_keys):
+                statuses.append("doublon")
+            elif any(key in seen for key in norm_keys):
+                statuses.append("doublon dans le fichier")
+            elif any(key in self._normalized for key in norm_keys):
+                statuses.append("doublon proche")
+            else:
+                statuses.append("")
+            seen.update(norm_keys)
+        return pd.Series(statuses, index=df.index, dtype=object)
+
+    def load(self):
+        """Retourne tous les consommables sous forme de DataFrame (colonnes de COLUMNS)."""
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(COLUMNS.values())} FROM consommables ORDER BY id", self.conn
+        )
+        return df.rename(columns={v: k for k, v in COLUMNS.items()})
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM consommables").fetchone()[0]
+
+    def find_duplicate(self, nom, reference, code_nacres):
+        """
+        Vérifie par recherche dans l'index qu'un consommable n'existe pas déjà.
+        Retourne un message d'erreur, ou None si l'objet est nouveau.
+        """
+        for key in self._keys(nom, reference, code_nacres, normalize=False):
+            if key not in self._exact:
+                continue
+            if key[0] == "nom":
+                return f"Un objet avec le nom '{nom}' existe déjà."
+            return f"La combinaison Référence='{reference}' et Code NACRES='{code_nacres}' existe déjà."
+        return None
+
+    def append(self, objet):
+        """
+        Ajoute un consommable (dictionnaire avec les clés de COLUMNS) par un seul INSERT.
+        Retourne l'identifiant de la ligne créée.
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                f"INSERT INTO consommables ({', '.join(COLUMNS.values())}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                tuple(objet.get(col) for col in COLUMNS)
+            )
+        self._index_row(cursor.lastrowid, objet.get("Consommable"), objet.get("Référence"), objet.get("Code NACRES"))
+        return cursor.lastrowid
+
+    def append_many(self, df):
+        """
+        Ajoute un lot de consommables (DataFrame avec les colonnes de COLUMNS)
+        dans une seule transaction : tout le lot est écrit, ou rien.
+        Retourne la liste des identifiants créés.
+        """
+        with self.conn:
+            last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM consommables").fetchone()[0]
+            self._insert_frame(df)
+            rows = self.conn.execute(
+                "SELECT id, consommable, reference, code_nacres FROM consommables WHERE id > ? ORDER BY id",
+                (last_id,)
+            ).fetchall()
+        for row in rows:
+            self._index_row(row["id"], row["consommable"], row["reference"], row["code_nacres"])
+        return [row["id"] for row in rows]
+
+    def close(self):
+        self.conn.close()
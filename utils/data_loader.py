@@ -5,20 +5,13 @@
 # Distribué sous licence : GNU GPL v3 (non commercial)
 # utils/data_loader.py
 
-import sys
 import os
 import pandas as pd
 from PySide6.QtGui import QPixmap
 
-def resource_path(relative_path):
-    """Obtenir le chemin absolu vers les ressources, fonctionne pour le développement et PyInstaller"""
-    try:
-        # PyInstaller crée un dossier temporaire et stocke le chemin dans _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Chemins : définis sans Qt dans utils/paths.py (outils en ligne de commande), réexportés ici
+from utils.paths import resource_path, user_data_dir, user_data_path  # noqa: F401  (réexport)
 
-    return os.path.join(base_path, relative_path)
 
 def load_logo():
     image_path = resource_path('images/Logo.png')
@@ -30,9 +23,9 @@ def load_logo():
 
 
 def load_data():
-    data_file = resource_path('data_base_GES1point5/data_base_GES1point5.hdf5')
-    df = pd.read_hdf(data_file)
-    return df
+    """Charge la table des facteurs d'émission depuis le fichier des tables de référence."""
+    from utils.reference_store import read_reference_table  # import local : reference_store importe ce module
+    return read_reference_table("facteurs")
 # def load_data(data_file_path):
 #     """
 #     Charge les données depuis un fichier HDF5.
@@ -0,0 +1,426 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/factor_db_build.py
+
+"""
+Construction du fichier des tables de référence (data_masse_eCO2/reference_data.sqlite)
+à partir des données sources, en une seule commande :
+
+    python -m utils.factor_db_build            # reconstruit ce qui a changé
+    python -m utils.factor_db_build --force    # reconstruit tout
+    python -m utils.factor_db_build --check    # vérifie le fichier par rapport au manifeste
+    python -m utils.factor_db_build --encrypt  # écrit aussi la version chiffrée (.enc)
+
+Les empreintes (SHA-256) des sources sont notées dans un manifeste JSON à côté du fichier :
+seules les tables dont les sources ont changé sont reconstruites.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import runpy
+import sqlite3
+import sys
+import unicodedata
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from utils.paths import resource_path, sqlite_read_only_uri
+from utils.factor_vintages import diff_factors
+from utils.reference_store import (
+    REFERENCE_DB, SCHEMA_VERSION, SEARCH_TABLE, TABLES, ReferenceStore, write_reference_tables
+)
+
+# À incrémenter quand les règles de construction changent (force une reconstruction complète)
+BUILD_VERSION = 2
+
+# Sources (chemins relatifs à la racine du dépôt), dans l'ordre des lignes de la table.
+# Millésime de base des facteurs GES 1point5 (nommé d'après la date des fichiers)
+FACTEURS_TSV = [
+    "data_base_GES1point5/data_initiales/GES1point5_electricity_factors_20241107.tsv",
+    "data_base_GES1point5/data_initiales/GES1point5_vehicles_factors_20241107.tsv",
+    "data_base_GES1point5/data_initiales/GES1point5_ractivities_factors_20241107.tsv",
+    "data_base_GES1point5/data_initiales/GES1point5_purchases_factors_20241107.tsv",
+    "data_base_GES1point5/data_initiales/GES1point5_transports_factors_20241107.tsv",
+]
+# Millésimes suivants : un dossier AAAAMMJJ par publication, avec les mêmes fichiers TSV
+MILLESIMES_DIR = "data_base_GES1point5/millesimes"
+# Ordre des fichiers d'un millésime (d'après le type indiqué dans leur nom)
+FACTEURS_KINDS = ["electricity", "vehicles", "ractivities", "purchases", "transports"]
+NACRES_XLS = "data_masse_eCO2/code_NACRES/nacres-janvier-2022.xls"
+MATERIAUX_SCRIPT = "data_masse_eCO2/data_base_materiaux/materiau_eCO2-kg.py"
+MATERIAUX_LABO_CSV = "data_masse_eCO2/data_base_materiaux/materiaux_labo.csv"
+
+# Libellé complet de la sous-catégorie « consommables » des achats
+CONSOMMABLES_LABEL = "Consommables (Matières premières, produits chimiques/biologiques et organismes vivants)"
+
+# Clés d'unicité de chaque table
+KEYS = {
+    "facteurs": ["category", "subcategory", "subsubcategory", "name", "unit"],
+    "facteurs_deltas": ["millesime", "category", "subcategory", "subsubcategory", "name", "unit"],
+    "millesimes": ["millesime"],
+    "materiaux": ["Materiau"],
+    "solvants": ["Solvant"],
+    "materiaux_labo": ["Nom de l'objet"],
+    "nacres": ["Codes Nacres"],
+}
+
+# Colonnes gardées telles quelles : les noms de facteurs servent de clé de recherche
+# dans les historiques et les manips type déjà enregistrés
+PRESERVE = {"facteurs": {"name"}, "facteurs_deltas": {"name"}}
+
+
+def _facteurs_sources():
+    """TSV du millésime de base, puis ceux des dossiers de millésimes (ordre des noms)."""
+    root = resource_path("")
+    vintages = sorted(glob.glob(os.path.join(root, MILLESIMES_DIR, "*", "*.tsv")))
+    return FACTEURS_TSV + [os.path.relpath(path, root).replace(os.sep, "/") for path in vintages]
+
+
+def _vintage_date(name):
+    """Date "AAAA-MM-JJ" d'un millésime nommé AAAAMMJJ (vide sinon)."""
+    return f"{name[:4]}-{name[4:6]}-{name[6:8]}" if len(name) == 8 and name.isdigit() else ""
+
+
+def _read_facteurs_tsv(paths):
+    """Un millésime des facteurs GES 1point5 : TSV concaténés et corrections faites jusqu'ici à la main."""
+    def kind_order(path):
+        filename = os.path.basename(path)
+        return next((i for i, kind in enumerate(FACTEURS_KINDS) if f"_{kind}_" in filename), len(FACTEURS_KINDS))
+
+    df = pd.concat([pd.read_csv(path, sep="\t") for path in sorted(paths, key=kind_order)], ignore_index=True)
+    # Les transports sont regroupés avec les véhicules (sous-catégories en minuscules)
+    transports = df["category"] == "Transports"
+    df.loc[transports, "subcategory"] = df.loc[transports, "subcategory"].str.lower()
+    df.loc[transports, "category"] = "Véhicules"
+    df["subcategory"] = df["subcategory"].replace("consommables", CONSOMMABLES_LABEL)
+    return prepare_table("facteurs", df)
+
+
+def _read_facteurs(paths):
+    """
+    Millésime de base en entier, et pour chaque millésime suivant seulement
+    son delta (lignes ajoutées, modifiées, supprimées) par rapport à la base.
+    """
+    base_paths, vintage_paths = paths[:len(FACTEURS_TSV)], paths[len(FACTEURS_TSV):]
+    base = _read_facteurs_tsv(base_paths)
+    base_name = os.path.splitext(FACTEURS_TSV[0])[0].rsplit("_", 1)[-1]
+
+    folders = {}
+    for path in vintage_paths:
+        folders.setdefault(os.path.basename(os.path.dirname(path)), []).append(path)
+    vintages = [(base_name, _vintage_date(base_name))]
+    deltas = []
+    for name in sorted(folders):
+        deltas.append(diff_factors(base, _read_facteurs_tsv(folders[name])).assign(millesime=name))
+        vintages.append((name, _vintage_date(name)))
+
+    return {
+        "facteurs": base,
+        "millesimes": pd.DataFrame(vintages, columns=["millesime", "date"]),
+        "facteurs_deltas": pd.concat(deltas, ignore_index=True) if deltas else pd.DataFrame(),
+    }
+
+
+def _read_nacres(paths):
+    """Nomenclature NACRES 2022 : codes à 4 caractères (sans les points) et libellés étendus."""
+    columns = ["Codes Nacres", "Libellé étendu nouvelle nomenclature achat"]
+    try:
+        df = pd.read_excel(paths[0], usecols=columns)
+    except ImportError as e:
+        raise RuntimeError(f"La lecture de {paths[0]} nécessite le paquet xlrd (pip install xlrd).") from e
+    df = df.dropna(subset=columns)
+    df["Codes Nacres"] = df["Codes Nacres"].str.replace(".", "", regex=False)
+    return {"nacres": df[df["Codes Nacres"].str.len() == 4]}
+
+
+def _read_materiaux(paths):
+    """Matériaux et solvants : DataFrames d_mat et d_solv définis par materiau_eCO2-kg.py."""
+    namespace = runpy.run_path(paths[0], run_name="factor_db_build")
+    return {"materiaux": namespace["d_mat"], "solvants": namespace["d_solv"]}
+
+
+def _read_materiaux_labo(paths):
+    # "N/A" est une référence valide, seules les cellules vides sont manquantes
+    return {"materiaux_labo": pd.read_csv(paths[0], keep_default_na=False, na_values=[""])}
+
+
+# Groupe de sources -> (fichiers, lecture, tables produites)
+SOURCES = {
+    "facteurs": (_facteurs_sources, _read_facteurs, ("facteurs", "millesimes", "facteurs_deltas")),
+    "nacres": ([NACRES_XLS], _read_nacres, ("nacres",)),
+    "materiaux": ([MATERIAUX_SCRIPT], _read_materiaux, ("materiaux", "solvants")),
+    "materiaux_labo": ([MATERIAUX_LABO_CSV], _read_materiaux_labo, ("materiaux_labo",)),
+}
+
+
+def normalize_text(value):
+    """Texte en forme Unicode NFC, sans espaces en début/fin ni espaces multiples."""
+    if not isinstance(value, str):
+        return value
+    text = " ".join(unicodedata.normalize("NFC", value).split())
+    return text or None
+
+
+def prepare_table(name, df):
+    """
+    Met une table aux colonnes de TABLES, normalise ses textes
+    et vérifie l'unicité de sa clé (ValueError sinon).
+    """
+    _, columns = TABLES[name]
+    df = df.reindex(columns=list(columns)).reset_index(drop=True)
+    for col, (_, sql_type) in columns.items():
+        if sql_type.startswith("TEXT") and col not in PRESERVE.get(name, set()):
+            df[col] = df[col].map(normalize_text)
+
+    key = KEYS.get(name)
+    if key:
+        duplicated = df[df.duplicated(key, keep=False)]
+        if not duplicated.empty:
+            examples = duplicated[key].drop_duplicates().head(5).astype(str).agg(" | ".join, axis=1)
+            raise ValueError(
+                f"Clés en double dans la table '{name}' ({len(duplicated)} lignes) : " + " ; ".join(examples)
+            )
+    return df
+
+
+def hierarchy_table(facteurs):
+    """
+    Arborescence catégorie > sous-catégorie, avec le nombre de facteurs et de
+    sous-sous-catégories de chaque branche (ordre de la table des facteurs).
+    """
+    grouped = facteurs.groupby(["category", "subcategory"], dropna=False, sort=False)
+    return grouped.agg(**{
+        "Nombre de facteurs": ("name", "size"),
+        "Nombre de sous-sous-catégories": ("subsubcategory", "nunique"),
+    }).reset_index()
+
+
+def _build_search_index(conn, path):
+    """(Re)construit l'index plein texte des facteurs et des codes NACRES."""
+    store = ReferenceStore(path)
+    try:
+        facteurs = store.read("facteurs")
+        nacres = store.read("nacres")
+    finally:
+        store.close()
+
+    rows = []
+    labels = facteurs[["category", "subcategory", "subsubcategory", "name"]].astype(object)
+    for position, values in enumerate(labels.itertuples(index=False, name=None)):
+        rows.append(("facteurs", position, " ".join(str(v) for v in values if pd.notna(v))))
+    for code, libelle in nacres.itertuples(index=False, name=None):
+        rows.append(("nacres", code, f"{code} {libelle}"))
+
+    # Index sans contenu (le texte n'est pas stocké) ; les clés sont dans une table à part
+    conn.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}_cles")
+    conn.execute(f"CREATE TABLE {SEARCH_TABLE}_cles (id INTEGER PRIMARY KEY, source TEXT NOT NULL, cle TEXT NOT NULL)")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        f"texte, content = '', detail = none, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    conn.executemany(
+        f"INSERT INTO {SEARCH_TABLE}_cles (id, source, cle) VALUES (?, ?, ?)",
+        ((i, source, key) for i, (source, key, _) in enumerate(rows, start=1))
+    )
+    conn.executemany(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, texte) VALUES (?, ?)",
+        ((i, text) for i, (_, _, text) in enumerate(rows, start=1))
+    )
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def table_hash(conn, name):
+    """Empreinte du contenu d'une table (colonnes et lignes dans l'ordre), indépendante du fichier."""
+    table, columns = TABLES[name]
+    digest = hashlib.sha256(json.dumps(list(columns), ensure_ascii=False).encode("utf-8"))
+    for row in conn.execute(f"SELECT * FROM {table} ORDER BY rowid"):
+        digest.update(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def content_hashes(conn):
+    """Empreintes {table: (nombre de lignes, empreinte)} et empreinte globale du fichier."""
+    present = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    tables = {}
+    for name, (table, _) in TABLES.items():
+        if table in present:
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            tables[name] = {"rows": rows, "hash": table_hash(conn, name)}
+    overall = hashlib.sha256("".join(f"{n}:{t['hash']}\n" for n, t in sorted(tables.items())).encode("utf-8"))
+    return tables, overall.hexdigest()
+
+
+def manifest_path_for(output):
+    return os.path.splitext(output)[0] + ".manifest.json"
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build(output=None, force=False, log=print):
+    """
+    Construit (ou met à jour) le fichier des tables de référence.
+
+    :param output: fichier SQLite produit (par défaut : data_masse_eCO2/reference_data.sqlite)
+    :param force: reconstruire toutes les tables, même si leurs sources n'ont pas changé
+    :param log: fonction d'affichage des messages
+    :return: le manifeste (dictionnaire) du fichier produit
+    """
+    output = output or resource_path(REFERENCE_DB)
+    manifest_path = manifest_path_for(output)
+    # Le numéro de version vient toujours de l'ancien manifeste, même si tout est reconstruit :
+    # il ne fait qu'augmenter
+    last_manifest = _load_manifest(manifest_path)
+    previous = {} if force or not os.path.exists(output) else last_manifest
+    if (previous.get("build_version"), previous.get("schema_version")) != (BUILD_VERSION, SCHEMA_VERSION):
+        previous = {}
+
+    # 1) Lecture des seules sources modifiées
+    sources = {}
+    frames = {}
+    for group, (paths, reader, _tables) in SOURCES.items():
+        paths = paths() if callable(paths) else paths
+        files = {path: file_hash(resource_path(path)) for path in paths}
+        group_hash = hashlib.sha256(json.dumps(files, sort_keys=True).encode("utf-8")).hexdigest()
+        sources[group] = {"hash": group_hash, "files": files}
+        if previous.get("sources", {}).get(group, {}).get("hash") == group_hash:
+            log(f"[INFO] {group} : sources inchangées")
+            continue
+        log(f"[INFO] {group} : reconstruction")
+        for name, df in reader([resource_path(path) for path in paths]).items():
+            frames[name] = prepare_table(name, df)
+
+    if not frames:
+        log(f"[INFO] {output} est à jour (version {previous.get('version')}).")
+        return previous
+
+    # 2) Tables dérivées et écriture des seules tables reconstruites
+    if "facteurs" in frames:
+        frames["hierarchie"] = hierarchy_table(frames["facteurs"])
+    write_reference_tables(frames, output)
+
+    conn = sqlite3.connect(output)
+    try:
+        with conn:
+            has_search = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)
+            ).fetchone()
+            if "facteurs" in frames or "nacres" in frames or not has_search:
+                _build_search_index(conn, output)
+
+            # 3) Version et empreinte du contenu
+            tables, content_hash = content_hashes(conn)
+            version = last_manifest.get("version", 0)
+            if content_hash != last_manifest.get("content_hash"):
+                version += 1
+            manifest = {
+                "schema_version": SCHEMA_VERSION,
+                "build_version": BUILD_VERSION,
+                "version": version,
+                "content_hash": content_hash,
+                "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "sources": sources,
+                "tables": tables,
+            }
+            conn.execute("CREATE TABLE IF NOT EXISTS build_info (cle TEXT PRIMARY KEY, valeur TEXT)")
+            conn.executemany(
+                "INSERT OR REPLACE INTO build_info (cle, valeur) VALUES (?, ?)",
+                [(key, str(manifest[key])) for key in ("version", "content_hash", "built_at", "build_version")]
+            )
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    log(f"[INFO] {output} : version {version}, empreinte {content_hash[:12]} ({', '.join(frames)})")
+    return manifest
+
+
+def check(output=None):
+    """
+    Vérifie que le contenu du fichier correspond à son manifeste.
+    Retourne la liste des écarts (vide si le fichier est conforme).
+    """
+    output = output or resource_path(REFERENCE_DB)
+    manifest = _load_manifest(manifest_path_for(output))
+    if not manifest:
+        return ["manifeste introuvable"]
+    problems = []
+    for group, (paths, _reader, _tables) in SOURCES.items():
+        paths = paths() if callable(paths) else paths
+        known = manifest.get("sources", {}).get(group, {}).get("files", {})
+        problems.extend(f"source ajoutée depuis la construction : {path}" for path in paths if path not in known)
+    for group, info in manifest.get("sources", {}).items():
+        for path, expected in info["files"].items():
+            if not os.path.exists(resource_path(path)):
+                problems.append(f"source absente : {path}")
+            elif file_hash(resource_path(path)) != expected:
+                problems.append(f"source modifiée depuis la construction : {path}")
+    conn = sqlite3.connect(sqlite_read_only_uri(output), uri=True)
+    try:
+        tables, content_hash = content_hashes(conn)
+    finally:
+        conn.close()
+    for name, info in manifest.get("tables", {}).items():
+        if tables.get(name, {}).get("hash") != info["hash"]:
+            problems.append(f"table modifiée : {name}")
+    if content_hash != manifest.get("content_hash"):
+        problems.append("empreinte du contenu différente du manifeste")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construit le fichier des tables de référence de LABeCO2.")
+    parser.add_argument("--output", help=f"fichier SQLite produit (par défaut : {REFERENCE_DB})")
+    parser.add_argument("--force", action="store_true", help="reconstruire toutes les tables")
+    parser.add_argument("--check", action="store_true", help="vérifier le fichier par rapport au manifeste")
+    parser.add_argument("--encrypt", action="store_true",
+                        help="écrire aussi la version chiffrée (.enc, voir utils/reference_crypto.py)")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = check(args.output)
+        for problem in problems:
+            print(f"[ERREUR] {problem}")
+        if not problems:
+            print("[INFO] Le fichier des tables de référence correspond à son manifeste.")
+        return 1 if problems else 0
+
+    if args.encrypt:
+        # Clé vérifiée avant la construction : pas de clé par défaut
+        from utils.reference_crypto import encrypt_file, load_key
+        try:
+            key = load_key()
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[ERREUR] {e}")
+            return 1
+    build(args.output, force=args.force)
+    if args.encrypt:
+        print(f"[INFO] Fichier chiffré : {encrypt_file(args.output or resource_path(REFERENCE_DB), key=key)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
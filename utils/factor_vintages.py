@@ -0,0 +1,477 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/factor_vintages.py
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Clé d'un facteur d'émission (unique dans chaque millésime)
+KEY_COLUMNS = ["category", "subcategory", "subsubcategory", "name", "unit"]
+# Colonnes utilisées pour retrouver un facteur depuis l'interface ou un historique
+LOOKUP_COLUMNS = ["category", "subcategory", "subsubcategory", "name"]
+# Libellés (hiérarchie, unités) : colonnes catégorielles en mémoire, un code entier par ligne
+# et chaque texte distinct stocké une seule fois
+CATEGORICAL_COLUMNS = ["category", "subcategory", "subsubcategory", "name", "unit", "ef.unit"]
+ELECTRICITY = "Électricité"
+
+# Opérations d'un delta par rapport au millésime de base
+ADDED = "ajout"
+CHANGED = "modif"
+REMOVED = "suppr"
+
+
+def _text(value):
+    return "" if value is None or (isinstance(value, float) and value != value) else str(value)
+
+
+def _same_value(a, b):
+    """Deux valeurs de facteur égales (nombres comparés en flottant, valeurs manquantes égales)."""
+    a, b = _text(a), _text(b)
+    try:
+        return float(a or "nan") == float(b or "nan") or a == b
+    except ValueError:
+        return a == b
+
+
+def _year_text(value):
+    """Année en texte, sans ".0" (les années lues en flottant ou en entier se comparent)."""
+    text = _text(value)
+    return text[:-2] if text.endswith(".0") else text
+
+
+def compact_factors(df):
+    """
+    Types compacts d'une table de facteurs : libellés en catégories (codes entiers +
+    dictionnaire des valeurs) et années en entiers 16 bits. Les valeurs des facteurs
+    restent en float64 : les émissions calculées sont inchangées.
+    """
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    if "year" in df.columns and not isinstance(df["year"].dtype, pd.CategoricalDtype):
+        years = pd.to_numeric(df["year"], errors="coerce")
+        # Années non numériques : colonne laissée telle quelle
+        if years.notna().sum() == df["year"].notna().sum() and (years.dropna() % 1 == 0).all():
+            df["year"] = years.astype("int16" if years.notna().all() else "Int16")
+    return df
+
+
+def expand_factors(df):
+    """Colonnes catégorielles remises en objets (avant d'y écrire des valeurs nouvelles)."""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df
+
+
+class _RowReader:
+    """
+    Lecture d'une ligne de table (dictionnaire) sans créer de Series : colonnes gardées
+    en tableaux NumPy, les colonnes catégorielles sous forme de codes + valeurs.
+    """
+
+    def __init__(self, df):
+        self.columns = []
+        for col in df.columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                self.columns.append((col, series.cat.codes.to_numpy(),
+                                     series.cat.categories.to_numpy(dtype=object)))
+            elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+                self.columns.append((col, series.to_numpy(dtype=object, na_value=np.nan), None))
+            else:
+                self.columns.append((col, series.to_numpy(), None))
+
+    def row(self, pos):
+        row = {}
+        for col, values, categories in self.columns:
+            if categories is None:
+                row[col] = values[pos]
+            else:
+                code = values[pos]
+                row[col] = categories[code] if code >= 0 else np.nan
+        return row
+
+
+def factor_keys(df, columns=KEY_COLUMNS):
+    """Clés (tuples de textes, valeurs manquantes = "") des lignes d'une table de facteurs."""
+    if df.empty:
+        return []
+    parts = [df[col].astype(object).map(_text) for col in columns]
+    return list(zip(*parts))
+
+
+def diff_factors(old, new):
+    """
+    Différences entre deux tables de facteurs, par clé (KEY_COLUMNS) :
+    lignes ajoutées, modifiées (au moins une valeur différente) et supprimées.
+
+    :return: DataFrame avec une colonne "operation" (ajout, modif, suppr) et les colonnes
+             de la table ; les lignes ajoutées ou modifiées portent les nouvelles valeurs,
+             les lignes supprimées seulement leur clé.
+    """
+    columns = list(new.columns)
+    old_pos = {key: pos for pos, key in enumerate(factor_keys(old))}
+    new_pos = {key: pos for pos, key in enumerate(factor_keys(new))}
+    value_cols = [col for col in columns if col not in KEY_COLUMNS]
+
+    added = [pos for key, pos in new_pos.items() if key not in old_pos]
+    removed = [pos for key, pos in old_pos.items() if key not in new_pos]
+
+    common = [(old_pos[key], pos) for key, pos in new_pos.items() if key in old_pos]
+    changed = []
+    if common:
+        old_idx, new_idx = map(list, zip(*common))
+        a = old.iloc[old_idx][value_cols].reset_index(drop=True)
+        b = new.iloc[new_idx][value_cols].reset_index(drop=True)
+        # Deux valeurs manquantes sont égales
+        differs = (a.astype(object) != b.astype(object)) & ~(a.isna() & b.isna())
+        changed = [new_idx[i] for i in differs.any(axis=1).to_numpy().nonzero()[0]]
+
+    parts = [
+        new.iloc[added].assign(operation=ADDED),
+        new.iloc[sorted(changed)].assign(operation=CHANGED),
+        old.iloc[removed][KEY_COLUMNS].assign(operation=REMOVED),
+    ]
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame(columns=["operation"] + columns)
+    return pd.concat(parts, ignore_index=True).reindex(columns=["operation"] + columns)
+
+
+class FactorHierarchy:
+    """
+    Index de la hiérarchie d'une table de facteurs, pour les listes de l'interface :
+    catégorie → sous-catégories → « sous-sous-catégorie - nom » → années → unité,
+    et facteurs de l'électricité par nom (machines).
+
+    Construit une fois par table : un changement de sélection est une recherche dans
+    un dictionnaire, sans filtrer la table ni créer de colonnes temporaires.
+    """
+
+    def __init__(self, df):
+        columns = [df[col].astype(object).map(_text).tolist() if col in df.columns else [""] * len(df)
+                   for col in ("category", "subcategory", "subsubcategory", "name", "unit")]
+        years = df["year"].astype(object).map(_year_text).tolist() if "year" in df.columns else [""] * len(df)
+        totals = df["total"].to_numpy(dtype=float) if "total" in df.columns else np.zeros(len(df))
+        uncertainties = (pd.to_numeric(df["uncertainty"], errors="coerce").fillna(0.0).to_numpy()
+                         if "uncertainty" in df.columns else np.zeros(len(df)))
+
+        self._categories = []
+        self._subcategories = {}   # catégorie -> {sous-catégorie: None} (ordre de la table)
+        self._labels = {}          # (catégorie, sous-catégorie) -> {libellé: None}
+        self._category_labels = {}  # catégorie -> {libellé: None}, toutes sous-catégories
+        self._years = {}           # (catégorie, sous-catégorie, sous-sous-catégorie, nom) -> {année: None}
+        self._units = {}           # clé + année ("" : première ligne de la clé) -> unité
+        self._electricity = {}     # type d'électricité -> (facteur, incertitude)
+        self._consumable_labels = {}  # 4 premiers caractères du code NACRES -> libellé (Achats, Consommables)
+
+        for pos, (category, subcategory, subsub, name, unit) in enumerate(zip(*columns)):
+            if not category:
+                continue
+            if category not in self._subcategories:
+                self._categories.append(category)
+                self._subcategories[category] = {}
+            if subcategory:
+                self._subcategories[category].setdefault(subcategory, None)
+            label = f"{subsub} - {name}".strip(" - ")
+            self._labels.setdefault((category, subcategory), {}).setdefault(label, None)
+            self._category_labels.setdefault(category, {}).setdefault(label, None)
+            key = (category, subcategory, subsub, name)
+            if years[pos]:
+                self._years.setdefault(key, {}).setdefault(years[pos], None)
+            self._units.setdefault(key + ("",), unit)
+            self._units.setdefault(key + (years[pos],), unit)
+            if category == ELECTRICITY and name:
+                self._electricity.setdefault(name, (float(totals[pos]), float(uncertainties[pos])))
+            if category == "Achats" and "Consommables" in subcategory:
+                self._consumable_labels.setdefault(subsub[:4], label)
+
+    def categories(self):
+        """Catégories de la table, dans l'ordre de la table."""
+        return list(self._categories)
+
+    def subcategories(self, category):
+        """Sous-catégories (triées) d'une catégorie."""
+        return sorted(self._subcategories.get(category, {}))
+
+    def labels(self, category, subcategory=""):
+        """
+        Libellés « sous-sous-catégorie - nom » d'une sous-catégorie (ou de toute la
+        catégorie si subcategory est vide), dans l'ordre de la table, sans doublons.
+        """
+        if subcategory:
+            return list(self._labels.get((category, subcategory), {}))
+        return list(self._category_labels.get(category, {}))
+
+    def years(self, category, subcategory, subsubcategory, name):
+        """Années (textes triés) d'une sélection."""
+        return sorted(self._years.get((category, subcategory, subsubcategory, name), {}))
+
+    def unit(self, category, subcategory, subsubcategory, name, year=""):
+        """Unité de la première ligne correspondant à la sélection (année facultative), ou None."""
+        return self._units.get((category, subcategory, subsubcategory, name, _year_text(year)))
+
+    def electricity_types(self):
+        """Types d'électricité (triés), proposés pour les machines."""
+        return sorted(self._electricity)
+
+    def electricity_factor(self, name):
+        """(facteur, incertitude) d'un type d'électricité, ou None."""
+        return self._electricity.get(name)
+
+    def consumable_label(self, code_nacres_4):
+        """Libellé de la première ligne Achats / Consommables d'un code NACRES (4 caractères), ou None."""
+        return self._consumable_labels.get(code_nacres_4[:4])
+
+
+class FactorVintages:
+    """
+    Millésimes de la base des facteurs d'émission, chargés ensemble.
+
+    Seul le millésime de base est stocké en entier ; chaque autre millésime est un delta
+    (lignes ajoutées, modifiées, supprimées) : la mémoire croît avec la taille des changements,
+    pas avec le nombre de millésimes.
+
+    - find() retrouve un facteur dans n'importe quel millésime par index (dictionnaires),
+      sans reconstruire de table ;
+    - frame() reconstruit la table complète d'un millésime (pour les listes de l'interface) ;
+      seules les deux dernières tables demandées sont gardées en mémoire.
+
+    Les tables sont gardées en types compacts (compact_factors) : libellés catégoriels,
+    années en entiers 16 bits.
+    """
+
+    def __init__(self, base, base_name, base_date="", deltas=None, vintages=None):
+        """
+        :param base: DataFrame du millésime de base
+        :param base_name: nom du millésime de base (ex. "20241107")
+        :param deltas: DataFrame des deltas (colonnes "millesime", "operation" + colonnes de base)
+        :param vintages: DataFrame des millésimes (colonnes "millesime", "date")
+        """
+        self.base = compact_factors(base)
+        self._base_rows = _RowReader(self.base)
+        self.base_name = base_name
+        self._dates = {base_name: base_date or ""}
+        if vintages is not None:
+            for name, date in zip(vintages["millesime"], vintages["date"]):
+                self._dates.setdefault(name, date or "")
+
+        # Index du millésime de base : clé -> position, clé de recherche -> [positions]
+        self._base_keys = factor_keys(self.base)
+        self._base_pos = {key: pos for pos, key in enumerate(self._base_keys)}
+        self._base_lookup = {}
+        for pos, key in enumerate(self._base_keys):
+            self._base_lookup.setdefault(key[:len(LOOKUP_COLUMNS)], []).append(pos)
+
+        # Deltas par millésime : lignes modifiées (par clé), ajoutées, clés supprimées
+        self._changed = {}
+        self._added = {}
+        self._added_lookup = {}
+        self._added_keys = {}
+        self._removed = {}
+        self._deltas = {}
+        if deltas is not None and not deltas.empty:
+            for name, delta in deltas.groupby("millesime", sort=False):
+                self._dates.setdefault(name, "")
+                self._load_delta(name, delta.drop(columns="millesime").reset_index(drop=True))
+
+        self._frames = OrderedDict()
+
+    def _load_delta(self, name, delta):
+        self._deltas[name] = delta
+        columns = list(self.base.columns)
+        operations = delta["operation"]
+        keys = factor_keys(delta)
+
+        changed = delta[operations == CHANGED]
+        self._changed[name] = {
+            key: row for key, row in zip(factor_keys(changed), changed[columns].to_dict("records"))
+        }
+        added = delta[operations == ADDED][columns].to_dict("records")
+        self._added[name] = added
+        lookup = {}
+        added_keys = {}
+        for i, key in enumerate(factor_keys(delta[operations == ADDED])):
+            lookup.setdefault(key[:len(LOOKUP_COLUMNS)], []).append(i)
+            added_keys[key] = i
+        self._added_lookup[name] = lookup
+        self._added_keys[name] = added_keys
+        self._removed[name] = {key for key, op in zip(keys, operations) if op == REMOVED}
+
+    # ------------------------------------------------------------------
+    # Millésimes
+    # ------------------------------------------------------------------
+    def names(self):
+        """Noms des millésimes, du plus ancien au plus récent."""
+        return sorted(self._dates, key=lambda name: (self._dates[name], name))
+
+    @property
+    def latest(self):
+        """Millésime le plus récent (utilisé par défaut pour les nouveaux calculs)."""
+        return self.names()[-1]
+
+    def date(self, name):
+        return self._dates[name]
+
+    def __contains__(self, name):
+        return name in self._dates
+
+    def resolve(self, name=None):
+        """Nom du millésime à utiliser (le plus récent si name est vide) ; KeyError s'il est inconnu."""
+        if name is None or _text(name) == "":
+            return self.latest
+        name = _text(name)
+        if name not in self._dates:
+            raise KeyError(f"Millésime des facteurs inconnu : '{name}'.")
+        return name
+
+    def vintage_for_date(self, date):
+        """Millésime en vigueur à une date ("AAAA-MM-JJ") : le plus récent publié avant cette date."""
+        names = self.names()
+        in_force = [name for name in names if self._dates[name] and self._dates[name] <= str(date)]
+        return in_force[-1] if in_force else names[0]
+
+    def delta(self, name):
+        """Delta d'un millésime par rapport à la base (DataFrame, vide pour la base)."""
+        if self.resolve(name) == self.base_name:
+            return pd.DataFrame(columns=["operation"] + list(self.base.columns))
+        return self._deltas.get(name, pd.DataFrame(columns=["operation"] + list(self.base.columns)))
+
+    # ------------------------------------------------------------------
+    # Recherche et tables complètes
+    # ------------------------------------------------------------------
+    def find(self, category, subcategory, subsubcategory, name, year=None, vintage=None):
+        """
+        Facteur (dictionnaire des colonnes) correspondant à la sélection dans un millésime,
+        ou None. Même règle que le filtrage de la table : première ligne correspondante,
+        année comparée en texte (sans ".0") si elle est fournie.
+        """
+        vintage = self.resolve(vintage)
+        lookup = (_text(category), _text(subcategory), _text(subsubcategory), _text(name))
+        changed = self._changed.get(vintage, {})
+        removed = self._removed.get(vintage, set())
+
+        candidates = []
+        for pos in self._base_lookup.get(lookup, []):
+            key = self._base_keys[pos]
+            if key in removed:
+                continue
+            candidates.append(changed[key] if key in changed else pos)
+        added = self._added.get(vintage, [])
+        candidates.extend(added[i] for i in self._added_lookup.get(vintage, {}).get(lookup, []))
+
+        for candidate in candidates:
+            row = self._base_rows.row(candidate) if isinstance(candidate, int) else candidate
+            if year and _year_text(row.get("year")) != _year_text(year):
+                continue
+            return row
+        return None
+
+    def _row(self, name, key):
+        """Ligne (dictionnaire) d'une clé complète dans un millésime, ou None."""
+        if key in self._removed.get(name, set()):
+            return None
+        if key in self._changed.get(name, {}):
+            return self._changed[name][key]
+        if key in self._base_pos:
+            return self._base_rows.row(self._base_pos[key])
+        i = self._added_keys.get(name, {}).get(key)
+        return None if i is None else self._added[name][i]
+
+    def compare(self, old, new):
+        """
+        Différences entre deux millésimes, par clé (KEY_COLUMNS), sans reconstruire leurs tables :
+        seules les clés présentes dans le delta de l'un ou de l'autre peuvent différer.
+
+        :return: DataFrame avec "operation" (ajout, modif, suppr), les colonnes de la clé, "year",
+                 et les valeurs avant/après : total_old, total_new, uncertainty_old, uncertainty_new
+        """
+        old, new = self.resolve(old), self.resolve(new)
+        touched = set()
+        for name in (old, new):
+            if name != self.base_name:
+                touched.update(self._changed.get(name, {}))
+                touched.update(self._added_keys.get(name, {}))
+                touched.update(self._removed.get(name, set()))
+
+        value_cols = [col for col in self.base.columns if col not in KEY_COLUMNS]
+        rows = []
+        for key in sorted(touched):
+            before, after = self._row(old, key), self._row(new, key)
+            if before is None and after is None:
+                continue
+            if before is None:
+                operation = ADDED
+            elif after is None:
+                operation = REMOVED
+            elif all(_same_value(before.get(col), after.get(col)) for col in value_cols):
+                continue
+            else:
+                operation = CHANGED
+            row = dict(zip(KEY_COLUMNS, key), operation=operation)
+            row["year"] = (after or before).get("year")
+            for col in ("total", "uncertainty"):
+                row[f"{col}_old"] = None if before is None else before.get(col)
+                row[f"{col}_new"] = None if after is None else after.get(col)
+            rows.append(row)
+
+        columns = ["operation"] + KEY_COLUMNS + ["year", "total_old", "total_new",
+                                                  "uncertainty_old", "uncertainty_new"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def frame(self, name=None):
+        """
+        Table complète d'un millésime : base, lignes modifiées remplacées sur place,
+        lignes supprimées retirées et lignes ajoutées à la fin.
+        """
+        name = self.resolve(name)
+        if name == self.base_name:
+            return self.base
+        if name in self._frames:
+            self._frames.move_to_end(name)
+            return self._frames[name]
+
+        # Libellés en objets : les lignes modifiées ou ajoutées peuvent porter de nouvelles valeurs
+        df = expand_factors(self.base)
+        changed = self._changed.get(name, {})
+        if changed:
+            positions = [self._base_pos[key] for key in changed if key in self._base_pos]
+            values = pd.DataFrame([changed[key] for key in changed if key in self._base_pos],
+                                  columns=df.columns, index=df.index[positions])
+            df.loc[values.index, :] = values
+        removed = self._removed.get(name, set())
+        if removed:
+            drop = [self._base_pos[key] for key in removed if key in self._base_pos]
+            df = df.drop(index=df.index[drop])
+        added = self._added.get(name, [])
+        if added:
+            df = pd.concat([df, pd.DataFrame(added, columns=df.columns)], ignore_index=True)
+        df = compact_factors(df.reset_index(drop=True))
+
+        self._frames[name] = df
+        if len(self._frames) > 2:
+            self._frames.popitem(last=False)
+        return df
+
+
+def load_factor_vintages(store):
+    """
+    Charge les millésimes des facteurs depuis le fichier des tables de référence
+    (ReferenceStore). Un fichier sans table des millésimes ne contient que la base.
+    """
+    tables = store.tables()
+    base = store.read("facteurs")
+    if "millesimes" not in tables or "facteurs_deltas" not in tables:
+        return FactorVintages(base, "base")
+    vintages = store.read("millesimes")
+    deltas = store.read("facteurs_deltas")
+    # Le millésime de base est le premier de la table (voir utils/factor_db_build.py)
+    return FactorVintages(base, vintages["millesime"].iloc[0], vintages["date"].iloc[0], deltas, vintages)
@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/history_io.py
+
+"""
+Lecture et écriture des historiques de calculs exportés par LABeCO2
+(CSV « ; », Excel, HDF5 clé "history"), sans interface graphique.
+"""
+
+import os
+
+import pandas as pd
+
+HISTORY_KEY = "history"
+# Extensions reconnues ; tout autre fichier est lu et écrit en CSV « ; »
+HISTORY_EXTENSIONS = (".csv", ".xlsx", ".h5", ".hdf5")
+
+NUMERIC_COLUMNS = ["value", "quantity", "days", "emissions_price", "emission_mass", "total_mass"]
+TEXT_COLUMNS = ["category", "subcategory", "subsubcategory", "name", "code_nacres", "consommable", "unit"]
+
+
+def read_history(path):
+    """Lit un historique exporté (.csv « ; », .xlsx ou .h5). Le millésime (AAAAMMJJ) est lu comme texte."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        return pd.read_excel(path, dtype={"vintage": str})
+    if ext in (".h5", ".hdf5"):
+        return pd.read_hdf(path, key=HISTORY_KEY)
+    return pd.read_csv(path, sep=";", dtype={"vintage": str})
+
+
+def write_history(df, path):
+    """Écrit un historique au format donné par l'extension (CSV « ; » par défaut)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        df.to_excel(path, index=False)
+    elif ext in (".h5", ".hdf5"):
+        df.to_hdf(path, key=HISTORY_KEY, mode="w")
+    else:
+        df.to_csv(path, index=False, sep=";")
+
+
+def normalize_history(df, base_vintage):
+    """
+    Types attendus par l'application pour un historique importé : colonnes numériques
+    (valeurs manquantes à 0), textes sans espaces superflus et millésime renseigné
+    (historique exporté avant les millésimes : calculé avec le millésime de base).
+    """
+    df = df.copy()
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    for col in TEXT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+    if "vintage" not in df.columns:
+        df["vintage"] = base_vintage
+    df["vintage"] = df["vintage"].fillna(base_vintage).astype(str).str.strip().replace("", base_vintage)
+    return df
@@ -0,0 +1,253 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/history_record.py
+
+"""
+Ligne de l'historique des calculs : objet à champs fixes (__slots__) au lieu d'un
+dictionnaire libre.
+
+- Mémoire : pas de dictionnaire par ligne, libellés (catégorie, unité, millésime...)
+  partagés entre les lignes (sys.intern) ; un dictionnaire rangé dans un
+  élément Qt serait en plus converti en QVariantMap, copié à chaque lecture.
+- Accès : attributs (record.emissions_price) dans les agrégations ; get(), [] et
+  keys() restent disponibles pour le code écrit pour des dictionnaires.
+- Un champ à None est absent (comme une clé manquante) : get() retourne la valeur
+  par défaut demandée.
+
+Conversion avec le format de l'export (colonnes FIELDS) : records_from_frame() et
+records_to_frame(). Les clés inconnues sont ignorées ; "days_machine" (ancienne clé
+des machines modifiées) est lu comme "days".
+"""
+
+import math
+import sys
+
+import pandas as pd
+
+# Champs, dans l'ordre des colonnes de l'export
+TEXT_FIELDS = (
+    "category", "subcategory", "subsubcategory", "name", "code_nacres", "consommable",
+    "unit", "electricity_type", "vintage",
+)
+FIELDS = (
+    "category", "subcategory", "subsubcategory", "name", "year", "value", "days",
+    "emissions_price", "emissions_price_error", "emission_mass", "emission_mass_error", "total_mass",
+    "code_nacres", "consommable", "unit", "quantity", "electricity_type", "vintage",
+    # Machines : puissance (kW) et temps d'utilisation (h/jour), pour la modification
+    "power", "usage_time",
+)
+# Résultats et valeur saisie : toujours renseignés (0.0 par défaut)
+FLOAT_FIELDS = (
+    "value", "emissions_price", "emissions_price_error", "emission_mass", "emission_mass_error", "total_mass",
+)
+# Nombres entiers (jours, quantités) : entiers si la valeur l'est
+COUNT_FIELDS = ("days", "quantity")
+OPTIONAL_FLOAT_FIELDS = ("power", "usage_time")
+# Anciennes clés -> champ
+ALIASES = {"days_machine": "days"}
+
+_FIELD_SET = frozenset(FIELDS)
+
+
+def _missing(value):
+    return value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value))
+
+
+def _text(value):
+    """Texte partagé (sys.intern), None si absent."""
+    if _missing(value):
+        return None
+    return sys.intern(value if type(value) is str else str(value))
+
+
+def _year(value):
+    """Année en texte ("2019", pas "2019.0"), "" pour les machines, None si absente."""
+    if _missing(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return sys.intern(str(value))
+
+
+def _float(value, default=0.0):
+    if _missing(value) or value == "":
+        return default
+    return float(value)
+
+
+def _count(value):
+    if _missing(value) or value == "":
+        return None
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _optional_float(value):
+    return _float(value, None)
+
+
+CONVERTERS = {
+    **{field: _text for field in TEXT_FIELDS},
+    "year": _year,
+    **{field: _float for field in FLOAT_FIELDS},
+    **{field: _count for field in COUNT_FIELDS},
+    **{field: _optional_float for field in OPTIONAL_FLOAT_FIELDS},
+}
+
+
+class HistoryRecord:
+    """
+    Un calcul de l'historique (champs FIELDS). Le constructeur attend des valeurs déjà
+    converties ; from_dict() et records_from_frame() convertissent.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, category=None, subcategory=None, subsubcategory=None, name=None, year=None,
+                 value=0.0, days=None, emissions_price=0.0, emissions_price_error=0.0,
+                 emission_mass=0.0, emission_mass_error=0.0, total_mass=0.0, code_nacres=None,
+                 consommable=None, unit=None, quantity=None, electricity_type=None, vintage=None,
+                 power=None, usage_time=None):
+        self.category = category
+        self.subcategory = subcategory
+        self.subsubcategory = subsubcategory
+        self.name = name
+        self.year = year
+        self.value = value
+        self.days = days
+        self.emissions_price = emissions_price
+        self.emissions_price_error = emissions_price_error
+        self.emission_mass = emission_mass
+        self.emission_mass_error = emission_mass_error
+        self.total_mass = total_mass
+        self.code_nacres = code_nacres
+        self.consommable = consommable
+        self.unit = unit
+        self.quantity = quantity
+        self.electricity_type = electricity_type
+        self.vintage = vintage
+        self.power = power
+        self.usage_time = usage_time
+
+    @classmethod
+    def from_dict(cls, data):
+        """Ligne depuis un dictionnaire (ou une autre ligne) ; valeurs converties, clés inconnues ignorées."""
+        if isinstance(data, cls):
+            return data.copy()
+        record = cls()
+        for key, value in data.items():
+            field = ALIASES.get(key, key)
+            # Une ancienne clé ne remplace pas le champ s'il est aussi présent
+            if field in _FIELD_SET and (field == key or field not in data):
+                setattr(record, field, CONVERTERS[field](value))
+        return record
+
+    def copy(self):
+        return HistoryRecord(*(getattr(self, field) for field in FIELDS))
+
+    def to_dict(self):
+        """Dictionnaire des champs renseignés."""
+        return {field: value for field in FIELDS if (value := getattr(self, field)) is not None}
+
+    # ------------------------------------------------------------------
+    # Accès comme un dictionnaire
+    # ------------------------------------------------------------------
+    def get(self, key, default=None):
+        field = ALIASES.get(key, key)
+        if field not in _FIELD_SET:
+            return default
+        value = getattr(self, field)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        field = ALIASES.get(key, key)
+        if field not in _FIELD_SET:
+            raise KeyError(f"Champ inconnu pour une ligne de l'historique : {key}")
+        setattr(self, field, CONVERTERS[field](value))
+
+    def setdefault(self, key, default=None):
+        if self.get(key) is None:
+            self[key] = default
+        return self.get(key)
+
+    def update(self, data):
+        for key, value in dict(data).items():
+            self[key] = value
+
+    def keys(self):
+        return [field for field in FIELDS if getattr(self, field) is not None]
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        if isinstance(other, (HistoryRecord, dict)):
+            return self.to_dict() == HistoryRecord.from_dict(other).to_dict()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"HistoryRecord({self.to_dict()!r})"
+
+
+def records_from_frame(df):
+    """
+    Lignes depuis un historique au format de l'export (DataFrame), colonne par colonne
+    (sans dictionnaire intermédiaire par ligne). Les colonnes inconnues sont ignorées.
+    """
+    count = len(df)
+    columns = []
+    for field in FIELDS:
+        source = field if field in df.columns else next(
+            (key for key, alias in ALIASES.items() if alias == field and key in df.columns), None
+        )
+        if source is None:
+            columns.append([0.0 if field in FLOAT_FIELDS else None] * count)
+            continue
+        series = df[source]
+        convert = CONVERTERS[field]
+        if field in FLOAT_FIELDS:
+            values = pd.to_numeric(series, errors="coerce").fillna(0.0).astype(float).tolist()
+        elif convert in (_text, _year):
+            # Chaque libellé distinct est converti une seule fois (code -1 : valeur manquante)
+            codes, uniques = pd.factorize(series)
+            labels = [convert(v) for v in uniques] + [None]
+            values = [labels[code] for code in codes.tolist()]
+        else:
+            values = [convert(v) for v in series.tolist()]
+        columns.append(values)
+    return [HistoryRecord(*values) for values in zip(*columns)]
+
+
+def records_to_frame(records):
+    """Historique au format de l'export (colonnes FIELDS) ; champs absents : valeurs manquantes."""
+    df = pd.DataFrame(
+        [[getattr(record, field) for field in FIELDS] for record in records],
+        columns=list(FIELDS),
+    )
+    # Champs numériques facultatifs : NaN plutôt que None (colonnes numériques à l'export)
+    for field in COUNT_FIELDS + OPTIONAL_FLOAT_FIELDS:
+        df[field] = pd.to_numeric(df[field], errors="coerce")
+    return df
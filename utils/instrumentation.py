@@ -0,0 +1,208 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/instrumentation.py
+
+"""
+Chronométrage des gestionnaires de l'interface et des calculs (chemins fréquents).
+
+    @instrumented()                      # nom par défaut : Classe.méthode
+    def update_subcategories(self): ...
+
+    with instrumentation.measure("import.lecture"):
+        ...
+
+Désactivé (par défaut), un appel instrumenté ne coûte qu'un appel de fonction et un test d'attribut.
+Activé (variable LABECO2_INSTRUMENTATION=1 ou fenêtre de diagnostic, Ctrl+Maj+D),
+chaque gestionnaire garde son nombre d'appels, son temps total et ses RING_SIZE
+dernières durées (percentiles). Le rapport s'exporte en JSON pour être joint
+à un signalement de lenteur.
+"""
+
+import functools
+import inspect
+import json
+import os
+import platform
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+INSTRUMENTATION_ENV = "LABECO2_INSTRUMENTATION"
+# Nombre de durées conservées par gestionnaire (percentiles sur les derniers appels)
+RING_SIZE = 512
+REPORT_VERSION = 1
+
+
+def _percentile(ordered, q):
+    """
+    Percentile d'une liste triée non vide, par interpolation linéaire entre les deux
+    valeurs encadrantes (comme statistics.quantiles(..., method="inclusive")) :
+    sur deux mesures, p50 est leur moyenne et non la plus grande.
+    """
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class _NullMeasure:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_MEASURE = _NullMeasure()
+
+
+class _Measure:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Stat:
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=RING_SIZE)
+
+
+class Instrumentation:
+    """Statistiques de durée par gestionnaire (nombre d'appels, total, percentiles)."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = datetime.now()
+        self._stats = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self._stats.clear()
+        self.started = datetime.now()
+
+    def record(self, name, seconds):
+        """Ajoute une durée (en secondes) au gestionnaire `name`."""
+        stat = self._stats.get(name)
+        if stat is None:
+            stat = self._stats[name] = _Stat()
+        stat.count += 1
+        stat.total += seconds
+        stat.samples.append(seconds)
+
+    def measure(self, name):
+        """Contexte chronométrant un bloc : `with instrumentation.measure("nom"): ...`."""
+        if not self.enabled:
+            return _NULL_MEASURE
+        return _Measure(self, name)
+
+    def stats(self):
+        """
+        Statistiques par gestionnaire, triées par temps total décroissant.
+
+        :return: liste de dictionnaires {"name", "count", "total_ms", "mean_ms",
+                 "p50_ms", "p95_ms", "p99_ms", "max_ms", "samples"} ; les percentiles
+                 et le maximum portent sur les `samples` derniers appels
+        """
+        rows = []
+        for name, stat in self._stats.items():
+            ordered = sorted(stat.samples)
+            rows.append({
+                "name": name,
+                "count": stat.count,
+                "total_ms": round(stat.total * 1000.0, 3),
+                "mean_ms": round(stat.total / stat.count * 1000.0, 3),
+                "p50_ms": round(_percentile(ordered, 50) * 1000.0, 3),
+                "p95_ms": round(_percentile(ordered, 95) * 1000.0, 3),
+                "p99_ms": round(_percentile(ordered, 99) * 1000.0, 3),
+                "max_ms": round(ordered[-1] * 1000.0, 3),
+                "samples": len(ordered),
+            })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def report(self):
+        """Rapport complet (dictionnaire sérialisable en JSON)."""
+        return {
+            "version": REPORT_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "since": self.started.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "ring_size": RING_SIZE,
+            "handlers": self.stats(),
+        }
+
+    def export(self, path=None, extra=None):
+        """
+        Écrit le rapport JSON.
+
+        :param path: fichier de sortie (par défaut : diagnostics/instrumentation_<date>.json
+                     dans le dossier utilisateur)
+        :param extra: entrées ajoutées au rapport (ex. {"logs": [...]})
+        :return: chemin du fichier écrit
+        """
+        if path is None:
+            from utils.paths import user_data_dir
+            directory = os.path.join(user_data_dir(), "diagnostics")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"instrumentation_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.report(), **(extra or {})}, f, indent=2, ensure_ascii=False)
+        return path
+
+
+# Registre partagé par toute l'application
+instrumentation = Instrumentation(enabled=os.environ.get(INSTRUMENTATION_ENV, "") not in ("", "0"))
+
+
+def instrumented(name=None, registry=None):
+    """
+    Décorateur chronométrant chaque appel de la fonction.
+
+    :param name: nom du gestionnaire dans le rapport (par défaut : nom qualifié, ex. MainWindow.calculate_emission)
+    :param registry: registre (par défaut : le registre partagé)
+    """
+    registry = registry or instrumentation
+
+    def decorator(func):
+        label = name or func.__qualname__
+        # Qt transmet à un slot (*args, **kwargs) tous les arguments du signal (ex. l'index
+        # de currentIndexChanged) : comme Qt pour le slot d'origine, ceux en trop sont ignorés.
+        code = func.__code__
+        max_args = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None and len(args) > max_args:
+                args = args[:max_args]
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.record(label, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
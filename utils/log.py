@@ -0,0 +1,128 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/log.py
+
+"""
+Journalisation de l'application (module logging de la bibliothèque standard).
+
+    from utils.log import get_logger
+    logger = get_logger(__name__)
+    logger.debug("Item à calculer : %s", item_data)   # formaté seulement si DEBUG est actif
+
+Les arguments sont passés séparément (formatage %), jamais en f-string : un message
+d'un niveau désactivé ne coûte qu'un test de niveau, sans conversion de l'objet en texte.
+
+setup_logging(), appelé par main.py, installe trois sorties :
+- console (niveau LABECO2_LOG_LEVEL, INFO par défaut) ;
+- fichier tournant logs/labeco2.log du dossier utilisateur (LABECO2_LOG_FILE pour
+  un autre fichier, LABECO2_LOG_FILE=0 pour le désactiver) ;
+- tampon circulaire en mémoire des derniers messages (recent_logs()), joint au
+  rapport de la fenêtre de diagnostic.
+"""
+
+import logging
+import logging.handlers
+import os
+from collections import deque
+
+ROOT_LOGGER = "labeco2"
+LOG_LEVEL_ENV = "LABECO2_LOG_LEVEL"
+LOG_FILE_ENV = "LABECO2_LOG_FILE"
+DEFAULT_LEVEL = "INFO"
+
+# Fichier tournant : taille maximale et nombre d'anciens fichiers conservés
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+# Nombre de messages gardés en mémoire
+RING_CAPACITY = 1000
+
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s : %(message)s"
+
+
+class RingBufferHandler(logging.Handler):
+    """Garde les derniers enregistrements en mémoire ; formatés seulement à la lecture."""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def lines(self, count=None):
+        records = list(self.records)
+        if count is not None:
+            records = records[-count:]
+        return [self.format(record) for record in records]
+
+
+_ring = RingBufferHandler()
+_ring.setFormatter(logging.Formatter(FORMAT))
+
+
+def get_logger(name):
+    """Logger de l'application pour un module (ex. get_logger(__name__) -> labeco2.windows.main_window)."""
+    if name == ROOT_LOGGER or name.startswith(ROOT_LOGGER + "."):
+        return logging.getLogger(name)
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def _level(value):
+    level = logging.getLevelName(str(value).strip().upper())
+    return level if isinstance(level, int) else logging.getLevelName(DEFAULT_LEVEL)
+
+
+def default_log_file():
+    """Fichier journal : LABECO2_LOG_FILE, sinon logs/labeco2.log du dossier utilisateur ; None si désactivé."""
+    value = os.environ.get(LOG_FILE_ENV)
+    if value == "0":
+        return None
+    if value:
+        return value
+    from utils.paths import user_data_dir
+    return os.path.join(user_data_dir(), "logs", "labeco2.log")
+
+
+def setup_logging(level=None, log_file=None, console=True):
+    """
+    Installe les sorties du journal (une seule fois, les appels suivants ne changent que le niveau).
+
+    :param level: niveau ("DEBUG", "INFO"...) ; par défaut LABECO2_LOG_LEVEL, sinon INFO
+    :param log_file: fichier journal ; par défaut default_log_file()
+    :param console: écrire aussi sur la sortie d'erreur
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(_level(level or os.environ.get(LOG_LEVEL_ENV, DEFAULT_LEVEL)))
+    if _ring in root.handlers:
+        return root
+
+    root.addHandler(_ring)
+    formatter = logging.Formatter(FORMAT)
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(levelname)s %(name)s : %(message)s"))
+        root.addHandler(stream)
+
+    path = log_file or default_log_file()
+    if path:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8", delay=True
+            )
+        except OSError as e:
+            root.warning("Journal %s inaccessible : %s", path, e)
+        else:
+            handler.setFormatter(formatter)
+            root.addHandler(handler)
+    # Les messages ne remontent pas au logger racine de Python (pas de double affichage)
+    root.propagate = False
+    return root
+
+
+def recent_logs(count=None):
+    """Derniers messages du journal (texte formaté), les plus anciens en premier."""
+    return _ring.lines(count)
@@ -0,0 +1,109 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/memory_usage.py
+
+"""
+Mémoire du processus et des tables chargées, pour la fenêtre de diagnostic et les
+rapports de performance : mémoire résidente (RSS) actuelle et maximale, octets occupés
+par chaque table du DataManager (chaînes comprises).
+
+Sans dépendance : /proc sous Linux, GetProcessMemoryInfo sous Windows, module resource
+ailleurs (maximum seulement).
+"""
+
+import sys
+
+MB = 1024 * 1024
+
+
+def _linux_memory():
+    values = {}
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) * 1024  # kB
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+def _windows_memory():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None, None
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+
+def _resource_memory():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilo-octets sous Linux, octets sous macOS
+    return None, peak if sys.platform == "darwin" else peak * 1024
+
+
+def process_memory():
+    """
+    Mémoire résidente du processus.
+
+    :return: {"rss_bytes", "peak_rss_bytes"} ; None pour une valeur indisponible
+    """
+    readers = [_linux_memory, _resource_memory] if sys.platform.startswith("linux") else (
+        [_windows_memory] if sys.platform == "win32" else [_resource_memory]
+    )
+    rss = peak = None
+    for reader in readers:
+        try:
+            rss, peak = reader()
+        except (OSError, ValueError, AttributeError, ImportError):
+            continue
+        if peak is not None:
+            break
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+def memory_report(data_manager=None):
+    """
+    Rapport mémoire : processus et, si un DataManager est fourni, ses tables.
+
+    :return: {"process": {...}, "tables": {nom: {"rows", "bytes"}}}
+    """
+    report = {"process": process_memory(), "tables": {}}
+    if data_manager is not None:
+        report["tables"] = data_manager.memory_usage()
+    return report
+
+
+def format_memory(report):
+    """Résumé d'une ligne d'un rapport mémoire (fenêtre de diagnostic)."""
+    process = report["process"]
+    parts = []
+    if process["rss_bytes"] is not None:
+        parts.append(f"processus {process['rss_bytes'] / MB:.0f} Mo")
+    if process["peak_rss_bytes"] is not None:
+        parts.append(f"pic {process['peak_rss_bytes'] / MB:.0f} Mo")
+    parts.extend(
+        f"{name} {table['bytes'] / MB:.2f} Mo ({table['rows']} lignes)"
+        for name, table in report["tables"].items()
+    )
+    return "Mémoire : " + (", ".join(parts) if parts else "indisponible")
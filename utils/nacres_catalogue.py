@@ -0,0 +1,184 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/nacres_catalogue.py
+
+import re
+from bisect import bisect_left
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide6.QtWidgets import QCompleter
+
+from utils.consumables_store import normalize_key
+from utils.log import get_logger
+from utils.reference_store import ReferenceStore
+
+logger = get_logger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text):
+    """Mots normalisés (sans accents ni majuscules) d'un texte."""
+    return _TOKEN_RE.findall(normalize_key(text))
+
+
+class NacresCatalogue:
+    """
+    Nomenclature NACRES (codes + libellés), chargée une seule fois à la première utilisation.
+
+    Deux index accélèrent la recherche :
+    - index des codes triés : recherche par préfixe de code (bisect) ;
+    - index des mots des libellés (et des codes) : chaque mot saisi doit être le début
+      d'un mot de l'entrée, « gant usage » trouve « EPI : GANTS A USAGE UNIQUE ».
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: fichier des tables de référence (par défaut : celui livré avec l'application).
+        """
+        self.store = ReferenceStore(path)
+        self._entries = None
+
+    def _ensure_loaded(self):
+        if self._entries is not None:
+            return
+        entries = []
+        try:
+            df = self.store.read("nacres")
+            codes = df.iloc[:, 0].astype(str).str.strip()
+            descriptions = df.iloc[:, 1].astype(str).str.strip()
+            entries = list(zip(codes, descriptions))
+        except FileNotFoundError as e:
+            logger.info("%s", e)
+        finally:
+            self.store.close()
+
+        # Index des codes (minuscules, triés) pour la recherche par préfixe
+        self._sorted_codes = sorted((code.lower(), i) for i, (code, _) in enumerate(entries))
+        # Index des mots : mot -> numéros d'entrées, et liste triée des mots pour les préfixes
+        token_entries = {}
+        for i, (code, desc) in enumerate(entries):
+            for token in _tokens(code) + _tokens(desc):
+                token_entries.setdefault(token, set()).add(i)
+        self._token_entries = token_entries
+        self._sorted_tokens = sorted(token_entries)
+        self._by_code = {code: desc for code, desc in entries}
+        self._entries = entries
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def entries(self):
+        """Liste des (code, libellé), dans l'ordre du fichier."""
+        self._ensure_loaded()
+        return self._entries
+
+    def codes(self):
+        """Ensemble des codes NACRES connus."""
+        self._ensure_loaded()
+        return set(self._by_code)
+
+    def description(self, code):
+        """Libellé d'un code NACRES (None s'il est inconnu)."""
+        self._ensure_loaded()
+        return self._by_code.get(code)
+
+    def _code_prefix(self, prefix):
+        start = bisect_left(self._sorted_codes, (prefix,))
+        matches = set()
+        for code, i in self._sorted_codes[start:]:
+            if not code.startswith(prefix):
+                break
+            matches.add(i)
+        return matches
+
+    def _token_prefix(self, prefix):
+        start = bisect_left(self._sorted_tokens, prefix)
+        matches = set()
+        for token in self._sorted_tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            matches |= self._token_entries[token]
+        return matches
+
+    def search(self, text):
+        """
+        Numéros des entrées correspondant au texte saisi (ordre du fichier) :
+        code commençant par le texte, ou libellé contenant un mot commençant
+        par chacun des mots saisis. Texte vide = toutes les entrées.
+        """
+        self._ensure_loaded()
+        query = normalize_key(text)
+        if not query:
+            return list(range(len(self._entries)))
+
+        matches = self._code_prefix(query.replace(" ", ""))
+        words = _tokens(query)
+        if words:
+            by_words = self._token_prefix(words[0])
+            for word in words[1:]:
+                if not by_words:
+                    break
+                by_words &= self._token_prefix(word)
+            matches |= by_words
+        return sorted(matches)
+
+
+_catalogue = None
+
+
+def get_nacres_catalogue():
+    """Catalogue NACRES partagé par toutes les fenêtres (chargé à la première utilisation)."""
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = NacresCatalogue()
+    return _catalogue
+
+
+class NacresListModel(QAbstractListModel):
+    """
+    Modèle Qt (liste) sur le catalogue NACRES, pour un QComboBox ou un QCompleter.
+    Texte affiché : « CODE - libellé » ; Qt.UserRole : le code (QComboBox.currentData()).
+    """
+
+    def __init__(self, catalogue=None, parent=None):
+        super().__init__(parent)
+        self.catalogue = catalogue if catalogue is not None else get_nacres_catalogue()
+        self._rows = list(range(len(self.catalogue)))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        code, desc = self.catalogue.entries()[self._rows[index.row()]]
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return f"{code} - {desc}"
+        if role == Qt.UserRole:
+            return code
+        return None
+
+    def set_filter(self, text):
+        """Ne garde que les entrées correspondant au texte (voir NacresCatalogue.search)."""
+        self.beginResetModel()
+        self._rows = self.catalogue.search(text)
+        self.endResetModel()
+
+
+def make_nacres_completer(parent=None, catalogue=None):
+    """
+    QCompleter sur toute la nomenclature (« CODE - libellé »), insensible à la casse,
+    qui propose les entrées contenant le texte saisi.
+    """
+    completer = QCompleter(parent)
+    # Le modèle appartient au completer (sinon il serait détruit avec la référence Python)
+    completer.setModel(NacresListModel(catalogue, completer))
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    completer.setFilterMode(Qt.MatchContains)
+    completer.setMaxVisibleItems(15)
+    return completer
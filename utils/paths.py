@@ -0,0 +1,67 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/paths.py
+
+"""
+Chemins de l'application (ressources livrées, données de l'utilisateur), sans dépendance :
+utilisables par les outils en ligne de commande sans charger Qt ni pandas.
+utils.data_loader les réexporte.
+"""
+
+import os
+import pathlib
+import sys
+
+APP_NAME = "LABeCO2"
+
+
+def resource_path(relative_path):
+    """Obtenir le chemin absolu vers les ressources, fonctionne pour le développement et PyInstaller"""
+    try:
+        # PyInstaller crée un dossier temporaire et stocke le chemin dans _MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+    return os.path.join(base_path, relative_path)
+
+
+def user_data_dir():
+    """
+    Dossier inscriptible de l'utilisateur pour les données de LABeCO2.
+
+    Le bundle PyInstaller est en lecture seule : les bases modifiables doivent vivre ailleurs.
+    La variable d'environnement LABECO2_DATA_DIR permet de forcer un autre dossier.
+    """
+    override = os.environ.get("LABECO2_DATA_DIR")
+    if override:
+        return override
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Application Support", APP_NAME)
+    if os.name == "nt":
+        return os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), APP_NAME)
+    base = os.environ.get("XDG_DATA_HOME", os.path.join(os.path.expanduser("~"), ".local", "share"))
+    return os.path.join(base, APP_NAME.lower())
+
+
+def user_data_path(relative_path):
+    """
+    Chemin d'un fichier de données modifiable par l'utilisateur :
+    dossier utilisateur pour l'exécutable PyInstaller (ou si LABECO2_DATA_DIR est défini),
+    fichier du dépôt en développement.
+    """
+    if getattr(sys, 'frozen', False) or os.environ.get("LABECO2_DATA_DIR"):
+        return os.path.join(user_data_dir(), os.path.basename(relative_path))
+    return resource_path(relative_path)
+
+
+def sqlite_read_only_uri(path):
+    """
+    URI SQLite d'ouverture en lecture seule (sqlite3.connect(..., uri=True)).
+    Le chemin est rendu absolu et encodé : "?", "#", "%" et les séparateurs Windows
+    ne sont pas interprétés comme des paramètres de l'URI.
+    """
+    return pathlib.Path(path).resolve().as_uri() + "?mode=ro"
@@ -0,0 +1,295 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/reference_crypto.py
+
+"""
+Chiffrement du fichier des tables de référence (reference_data.sqlite -> reference_data.sqlite.enc).
+
+Format : en-tête, puis blocs chiffrés AES-256-GCM (authentifiés) de CHUNK_SIZE octets.
+Le déchiffrement se fait bloc par bloc, directement en mémoire : la base SQLite est
+chargée depuis cette image mémoire (sqlite3.deserialize), aucun fichier en clair n'est écrit.
+L'image déchiffrée est gardée pour tout le processus : un seul déchiffrement par lancement.
+
+    python -m utils.reference_crypto keygen                # nouvelle clé (à garder hors du dépôt)
+    python -m utils.reference_crypto encrypt               # chiffre le fichier des tables de référence
+    python -m utils.reference_crypto bench                 # surcoût au démarrage par rapport au fichier en clair
+
+Clé : variable d'environnement LABECO2_REFERENCE_KEY, ou fichier désigné par
+LABECO2_REFERENCE_KEY_FILE (ou --key-file). Il n'y a pas de clé par défaut : une clé
+versionnée dans le dépôt ou livrée dans le bundle est publique et ne protège rien ; un
+fichier de clé situé dans le dossier de l'application est refusé. Même format qu'une clé
+Fernet (32 octets en base64). Nécessite le paquet cryptography.
+"""
+
+import argparse
+import base64
+import os
+import sqlite3
+import statistics
+import struct
+import sys
+import time
+
+from utils.paths import resource_path
+
+ENCRYPTED_SUFFIX = ".enc"
+MAGIC = b"LBCO2ENC"
+FORMAT_VERSION = 1
+# Taille des blocs en clair
+CHUNK_SIZE = 256 * 1024
+
+KEY_ENV = "LABECO2_REFERENCE_KEY"
+KEY_FILE_ENV = "LABECO2_REFERENCE_KEY_FILE"
+
+# Surcoût maximal du chargement chiffré (déchiffrement compris) par rapport au fichier en clair
+OVERHEAD_BUDGET = 0.5
+
+# en-tête : magic, version, taille des blocs, préfixe aléatoire des nonces (8 octets)
+_HEADER = struct.Struct("<8sBI8s")
+_LENGTH = struct.Struct("<I")
+
+# Images déchiffrées, par fichier : (chemin, date de modification, taille) -> octets
+_images = {}
+
+
+def _aesgcm(key):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError as e:
+        raise RuntimeError(
+            "Le fichier chiffré des tables de référence nécessite le paquet cryptography (pip install cryptography)."
+        ) from e
+    return AESGCM(key)
+
+
+def generate_key():
+    """Nouvelle clé (32 octets aléatoires, en base64 comme une clé Fernet)."""
+    return base64.urlsafe_b64encode(os.urandom(32))
+
+
+def _inside_application(path):
+    """Vrai si le fichier est dans le dossier de l'application (dépôt ou bundle PyInstaller)."""
+    root = os.path.realpath(resource_path(""))
+    path = os.path.realpath(path)
+    try:
+        return os.path.commonpath([root, path]) == root
+    except ValueError:  # disques différents sous Windows
+        return False
+
+
+def load_key(path=None):
+    """
+    Clé de chiffrement : variable LABECO2_REFERENCE_KEY, sinon fichier de clé (path, ou
+    variable LABECO2_REFERENCE_KEY_FILE) hors du dossier de l'application.
+
+    Lève FileNotFoundError si aucune clé n'est fournie, ValueError si le fichier de clé
+    est dans le dépôt ou le bundle, ou si la clé est invalide.
+    """
+    value = None if path else os.environ.get(KEY_ENV)
+    if not value:
+        path = path or os.environ.get(KEY_FILE_ENV)
+        if not path:
+            raise FileNotFoundError(
+                f"Clé de chiffrement non fournie : définir {KEY_ENV} ou {KEY_FILE_ENV} "
+                f"(fichier de clé hors du dépôt et du bundle)."
+            )
+        if _inside_application(path):
+            raise ValueError(
+                f"Fichier de clé refusé : {path} est dans le dossier de l'application. "
+                f"Une clé versionnée ou livrée avec l'application n'est pas secrète ; "
+                f"la placer ailleurs (ou utiliser {KEY_ENV})."
+            )
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Fichier de clé introuvable : {path}.")
+        with open(path, "rb") as f:
+            value = f.read()
+    key = base64.urlsafe_b64decode(value.strip() if isinstance(value, bytes) else value.strip().encode("ascii"))
+    if len(key) != 32:
+        raise ValueError("La clé de chiffrement doit faire 32 octets (base64).")
+    return key
+
+
+def _nonce(prefix, index):
+    return prefix + _LENGTH.pack(index)
+
+
+def _aad(header, index, last):
+    # Le numéro du bloc et l'indicateur de fin sont authentifiés : blocs réordonnés ou fichier tronqué refusés
+    return header + struct.pack("<IB", index, last)
+
+
+def encrypt_file(source, destination=None, key=None, chunk_size=CHUNK_SIZE):
+    """
+    Chiffre un fichier bloc par bloc (lecture en flux).
+
+    :param destination: fichier chiffré (par défaut : source + ".enc")
+    :return: chemin du fichier chiffré
+    """
+    destination = destination or source + ENCRYPTED_SUFFIX
+    aesgcm = _aesgcm(key or load_key())
+    prefix = os.urandom(8)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, chunk_size, prefix)
+
+    tmp = destination + ".tmp"
+    with open(source, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(header)
+        index = 0
+        chunk = src.read(chunk_size)
+        while True:
+            following = src.read(chunk_size)
+            # Au moins un bloc (éventuellement vide), le dernier est marqué
+            last = not following
+            ciphertext = aesgcm.encrypt(_nonce(prefix, index), chunk, _aad(header, index, last))
+            dst.write(_LENGTH.pack(len(ciphertext)))
+            dst.write(ciphertext)
+            if last:
+                break
+            chunk = following
+            index += 1
+    os.replace(tmp, destination)
+    return destination
+
+
+def iter_decrypt(stream, key=None):
+    """
+    Déchiffre un flux (fichier ouvert en binaire) bloc par bloc.
+    Lève ValueError si le fichier est altéré, tronqué ou si la clé est incorrecte.
+    """
+    header = stream.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise ValueError("Fichier chiffré invalide (en-tête incomplet).")
+    magic, version, _chunk_size, prefix = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Ce fichier n'est pas un fichier chiffré des tables de référence.")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Format chiffré {version} plus récent que l'application (format {FORMAT_VERSION}).")
+    aesgcm = _aesgcm(key or load_key())
+    from cryptography.exceptions import InvalidTag
+
+    index = 0
+    length = stream.read(_LENGTH.size)
+    while True:
+        if len(length) != _LENGTH.size:
+            raise ValueError("Fichier chiffré tronqué.")
+        ciphertext = stream.read(_LENGTH.unpack(length)[0])
+        length = stream.read(_LENGTH.size)
+        last = not length
+        try:
+            yield aesgcm.decrypt(_nonce(prefix, index), ciphertext, _aad(header, index, last))
+        except InvalidTag as e:
+            raise ValueError("Fichier chiffré altéré ou clé de chiffrement incorrecte.") from e
+        if last:
+            return
+        index += 1
+
+
+def decrypt_to_memory(path, key=None):
+    """Contenu en clair d'un fichier chiffré (octets en mémoire), déchiffré une seule fois par processus."""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if cache_key not in _images:
+        image = bytearray()
+        with open(path, "rb") as f:
+            for chunk in iter_decrypt(f, key):
+                image += chunk
+        _images[cache_key] = bytes(image)
+    return _images[cache_key]
+
+
+def open_encrypted_database(path, key=None):
+    """Connexion SQLite sur l'image déchiffrée en mémoire d'un fichier chiffré."""
+    conn = sqlite3.connect(":memory:")
+    conn.deserialize(decrypt_to_memory(path, key))
+    return conn
+
+
+def clear_cache():
+    """Oublie les images déchiffrées (utilisé par les mesures de démarrage)."""
+    _images.clear()
+
+
+def benchmark(path=None, repeat=15):
+    """
+    Compare le chargement de la table des facteurs depuis le fichier en clair
+    et depuis le fichier chiffré (déchiffrement compris).
+
+    :return: dictionnaire des temps médians (s) et du surcoût relatif
+    """
+    from utils.reference_store import REFERENCE_DB, ReferenceStore
+
+    plain = path or resource_path(REFERENCE_DB)
+    encrypted = plain + ENCRYPTED_SUFFIX
+    load_key()  # clé absente : erreur avant les mesures
+
+    def timed(store_path):
+        times = []
+        for _ in range(repeat):
+            clear_cache()
+            start = time.perf_counter()
+            store = ReferenceStore(store_path)
+            try:
+                store.read("facteurs")
+            finally:
+                store.close()
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    plain_time = timed(plain)
+    encrypted_time = timed(encrypted)
+    start = time.perf_counter()
+    clear_cache()
+    decrypt_to_memory(encrypted)
+    decrypt_time = time.perf_counter() - start
+    return {
+        "plain": plain_time,
+        "encrypted": encrypted_time,
+        "decrypt": decrypt_time,
+        "overhead": encrypted_time / plain_time - 1.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chiffrement du fichier des tables de référence de LABeCO2.")
+    parser.add_argument("command", choices=["keygen", "encrypt", "check", "bench"])
+    parser.add_argument("--input", help="fichier en clair (par défaut : data_masse_eCO2/reference_data.sqlite)")
+    parser.add_argument("--output", help="fichier chiffré (par défaut : <input>.enc)")
+    parser.add_argument("--key-file", help=f"fichier de clé, hors du dépôt (par défaut : {KEY_ENV} ou {KEY_FILE_ENV})")
+    args = parser.parse_args(argv)
+
+    from utils.reference_store import REFERENCE_DB
+    source = args.input or resource_path(REFERENCE_DB)
+
+    if args.command == "keygen":
+        print(generate_key().decode("ascii"))
+        return 0
+    if args.key_file:
+        # Clé explicite : utilisée aussi par ReferenceStore pendant les mesures (bench)
+        os.environ.pop(KEY_ENV, None)
+        os.environ[KEY_FILE_ENV] = args.key_file
+    try:
+        key = load_key()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[ERREUR] {e}")
+        return 1
+    if args.command == "encrypt":
+        print(f"[INFO] Fichier chiffré : {encrypt_file(source, args.output, key)}")
+        return 0
+    if args.command == "check":
+        encrypted = args.output or source + ENCRYPTED_SUFFIX
+        with open(source, "rb") as f:
+            same = decrypt_to_memory(encrypted, key) == f.read()
+        print(f"[INFO] {encrypted} {'correspond' if same else 'ne correspond pas'} à {source}.")
+        return 0 if same else 1
+
+    result = benchmark(args.input)
+    print(f"[INFO] En clair : {result['plain'] * 1000:.1f} ms ; chiffré : {result['encrypted'] * 1000:.1f} ms "
+          f"(dont déchiffrement {result['decrypt'] * 1000:.1f} ms) ; surcoût {result['overhead']:+.0%} "
+          f"(budget {OVERHEAD_BUDGET:+.0%})")
+    return 0 if result["overhead"] <= OVERHEAD_BUDGET else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
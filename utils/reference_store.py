@@ -0,0 +1,250 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/reference_store.py
+
+import os
+import sqlite3
+import pandas as pd
+
+from utils.paths import resource_path, sqlite_read_only_uri
+
+# Fichier unique des tables de référence (lecture seule pour l'application)
+REFERENCE_DB = "data_masse_eCO2/reference_data.sqlite"
+
+# Version du schéma, stockée dans PRAGMA user_version
+SCHEMA_VERSION = 1
+
+# Colonnes de la table des facteurs d'émission
+FACTEURS_COLUMNS = {
+    "category": ("category", "TEXT"),
+    "subcategory": ("subcategory", "TEXT"),
+    "subsubcategory": ("subsubcategory", "TEXT"),
+    "unit": ("unit", "TEXT"),
+    "name": ("name", "TEXT"),
+    "year": ("year", "INTEGER"),
+    "co2": ("co2", "REAL"),
+    "ch4": ("ch4", "REAL"),
+    "n2o": ("n2o", "REAL"),
+    "other": ("other", "INTEGER"),
+    "total": ("total", "REAL"),
+    "uncertainty": ("uncertainty", "REAL"),
+    "ef.unit": ("ef_unit", "TEXT"),
+}
+
+# Tables de référence : nom logique -> (table SQLite, {colonne du DataFrame: (colonne SQL, type)})
+TABLES = {
+    # Millésime de base des facteurs (le plus ancien), stocké en entier
+    "facteurs": ("facteurs_emission", FACTEURS_COLUMNS),
+    # Millésimes disponibles (nom et date de publication)
+    "millesimes": ("millesimes", {
+        "millesime": ("millesime", "TEXT NOT NULL"),
+        "date": ("date", "TEXT"),
+    }),
+    # Autres millésimes : lignes ajoutées, modifiées ou supprimées par rapport à la base
+    "facteurs_deltas": ("facteurs_deltas", {
+        "millesime": ("millesime", "TEXT NOT NULL"),
+        "operation": ("operation", "TEXT NOT NULL"),
+        **FACTEURS_COLUMNS,
+    }),
+    "materiaux": ("materiaux", {
+        "Materiau": ("materiau", "TEXT NOT NULL"),
+        "Equivalent CO₂ (kg eCO₂/kg)": ("eco2_kg", "REAL NOT NULL"),
+        "uncertainty": ("uncertainty", "REAL"),
+        "Source": ("source", "TEXT"),
+    }),
+    "solvants": ("solvants", {
+        "Solvant": ("solvant", "TEXT NOT NULL"),
+        "Equivalent CO₂ (kg eCO₂/kg)": ("eco2_kg", "REAL NOT NULL"),
+        "uncertainty": ("uncertainty", "REAL"),
+        "Source": ("source", "TEXT"),
+    }),
+    "materiaux_labo": ("materiaux_labo", {
+        "Nom de l'objet": ("nom", "TEXT NOT NULL"),
+        "Référence": ("reference", "TEXT"),
+        "Masse unitaire (g)": ("masse_g", "REAL"),
+        "Matériau": ("materiau", "TEXT"),
+        "Source/Signature": ("source", "TEXT"),
+    }),
+    "nacres": ("nacres", {
+        "Codes Nacres": ("code", "TEXT NOT NULL"),
+        "Libellé étendu nouvelle nomenclature achat": ("libelle", "TEXT"),
+    }),
+    # Table dérivée (utils/factor_db_build.py) : arborescence catégorie > sous-catégorie
+    "hierarchie": ("facteurs_hierarchie", {
+        "category": ("category", "TEXT"),
+        "subcategory": ("subcategory", "TEXT"),
+        "Nombre de facteurs": ("nb_facteurs", "INTEGER NOT NULL"),
+        "Nombre de sous-sous-catégories": ("nb_subsubcategories", "INTEGER NOT NULL"),
+    }),
+}
+
+# Index créés avec chaque table : nom logique -> [(nom de l'index, colonnes SQL, unique)]
+INDEXES = {
+    "facteurs": [("idx_facteurs_cle", ("category", "subcategory", "subsubcategory", "name", "unit"), False)],
+    "millesimes": [("idx_millesimes_nom", ("millesime",), True)],
+    "facteurs_deltas": [("idx_facteurs_deltas_millesime", ("millesime",), False)],
+    "materiaux": [("idx_materiaux_nom", ("materiau",), True)],
+    "solvants": [("idx_solvants_nom", ("solvant",), True)],
+    "nacres": [("idx_nacres_code", ("code",), True)],
+    "hierarchie": [("idx_hierarchie", ("category", "subcategory"), False)],
+}
+
+# Index de recherche plein texte (FTS5) construit par utils/factor_db_build.py
+SEARCH_TABLE = "recherche"
+
+
+class ReferenceStore:
+    """
+    Tables de référence (facteurs d'émission, matériaux, solvants, nomenclature NACRES...)
+    réunies dans un seul fichier SQLite, typé et versionné.
+
+    Remplace les fichiers HDF5 (~1 Mo chacun, même pour quelques lignes) :
+    read() ne lit que la table demandée, sans dépendre de PyTables.
+
+    Si le fichier en clair est absent, sa version chiffrée (même nom + ".enc",
+    voir utils/reference_crypto.py) est déchiffrée en mémoire et utilisée à la place.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: chemin du fichier SQLite (par défaut : celui livré avec l'application).
+        """
+        self.path = path or resource_path(REFERENCE_DB)
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            from utils.reference_crypto import ENCRYPTED_SUFFIX
+            encrypted = self.path if self.path.endswith(ENCRYPTED_SUFFIX) else self.path + ENCRYPTED_SUFFIX
+            if os.path.exists(self.path) and self.path != encrypted:
+                # Lecture seule : le fichier livré dans l'exécutable n'est pas modifiable
+                self._conn = sqlite3.connect(sqlite_read_only_uri(self.path), uri=True)
+            elif os.path.exists(encrypted):
+                from utils.reference_crypto import open_encrypted_database
+                self._conn = open_encrypted_database(encrypted)
+            else:
+                raise FileNotFoundError(f"Fichier {self.path} introuvable.")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                self.close()
+                raise RuntimeError(
+                    f"Le fichier {self.path} (format {version}) est plus récent que l'application "
+                    f"(format {SCHEMA_VERSION})."
+                )
+        return self._conn
+
+    def version(self):
+        """Version du schéma du fichier (PRAGMA user_version)."""
+        return self._connection().execute("PRAGMA user_version").fetchone()[0]
+
+    def tables(self):
+        """Noms logiques des tables présentes dans le fichier."""
+        present = {
+            row[0] for row in self._connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        return [name for name, (table, _) in TABLES.items() if table in present]
+
+    def build_info(self):
+        """
+        Informations de construction du fichier (version, empreinte du contenu, date),
+        écrites par utils/factor_db_build.py. Dictionnaire vide pour un fichier plus ancien.
+        """
+        conn = self._connection()
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'build_info'").fetchone():
+            return {}
+        return dict(conn.execute("SELECT cle, valeur FROM build_info"))
+
+    def search(self, text, source=None, limit=50):
+        """
+        Recherche plein texte (sans accents ni majuscules, début de mots) dans l'index
+        précalculé : facteurs d'émission et nomenclature NACRES.
+
+        :param source: "facteurs" ou "nacres" pour limiter la recherche (optionnel)
+        :return: liste de (source, clé) ; la clé est le numéro de ligne de la table
+                 des facteurs (ordre de read("facteurs")) ou le code NACRES
+        """
+        words = [w.replace('"', '') for w in str(text).split()]
+        words = [w for w in words if w]
+        if not words:
+            return []
+        query = " ".join(f'"{w}"*' for w in words)
+        sql = (
+            f"SELECT k.source, k.cle FROM {SEARCH_TABLE} JOIN {SEARCH_TABLE}_cles k ON k.id = {SEARCH_TABLE}.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH ?"
+        )
+        params = [query]
+        if source is not None:
+            sql += " AND k.source = ?"
+            params.append(source)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return [
+            (src, int(key) if src == "facteurs" else key)
+            for src, key in self._connection().execute(sql, params)
+        ]
+
+    def read(self, name):
+        """
+        Lit une table de référence et la retourne sous forme de DataFrame,
+        avec les noms de colonnes utilisés dans l'application.
+        """
+        if name not in TABLES:
+            raise KeyError(f"Table de référence inconnue : '{name}'.")
+        table, columns = TABLES[name]
+        df = pd.read_sql_query(
+            f'SELECT {", ".join(sql for sql, _ in columns.values())} FROM {table} ORDER BY rowid',
+            self._connection()
+        )
+        return df.rename(columns={sql: col for col, (sql, _) in columns.items()})
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def read_reference_table(name, path=None):
+    """Lit une seule table de référence (ouvre puis referme le fichier)."""
+    store = ReferenceStore(path)
+    try:
+        return store.read(name)
+    finally:
+        store.close()
+
+
+def write_reference_tables(frames, path=None):
+    """
+    Écrit (ou remplace) des tables de référence dans le fichier SQLite.
+    Les autres tables du fichier sont conservées.
+
+    :param frames: dictionnaire {nom logique: DataFrame}, colonnes de TABLES
+    :param path: chemin du fichier SQLite (par défaut : celui du dépôt)
+    """
+    path = path or resource_path(REFERENCE_DB)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for name, df in frames.items():
+                table, columns = TABLES[name]
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(
+                    f"CREATE TABLE {table} ({', '.join(f'{sql} {sql_type}' for sql, sql_type in columns.values())})"
+                )
+                df = df.reindex(columns=list(columns))
+                df = df.astype(object).where(df.notna(), None)
+                conn.executemany(
+                    f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})",
+                    df.itertuples(index=False, name=None)
+                )
+                for index_name, index_columns, unique in INDEXES.get(name, []):
+                    conn.execute(
+                        f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} "
+                        f"ON {table} ({', '.join(index_columns)})"
+                    )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
@@ -0,0 +1,264 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/startup_profile.py
+
+"""
+Mesure du démarrage de l'application (mode profilage).
+
+Activé par l'option `--profile-startup` de main.py ou la variable d'environnement
+LABECO2_PROFILE_STARTUP=1 : chaque phase du démarrage (QApplication, splash, QSS,
+chargement des données, construction de l'interface, premier affichage) est chronométrée,
+les temps d'import sont mesurés dans un processus séparé (`python -X importtime`),
+puis deux rapports sont écrits :
+- startup_<date>.json : rapport lisible par un script (suivi des régressions) ;
+- startup_<date>.trace.json : format Chrome trace (chrome://tracing, Perfetto).
+
+Désactivé, profiler.phase() ne coûte qu'un test d'attribut.
+"""
+
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+PROFILE_FLAG = "--profile-startup"
+EXIT_FLAG = "--profile-startup-exit"
+PROFILE_ENV = "LABECO2_PROFILE_STARTUP"
+# Dossier des rapports (par défaut : sous-dossier startup_profiles du dossier utilisateur)
+PROFILE_DIR_ENV = "LABECO2_PROFILE_DIR"
+REPORT_VERSION = 1
+
+# Module importé par le processus séparé de mesure des imports
+IMPORTTIME_MODULE = "windows.main_window"
+IMPORTTIME_TOP = 40
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profiling_requested(argv=None):
+    """Profilage demandé par l'option de ligne de commande ou la variable d'environnement."""
+    argv = sys.argv if argv is None else argv
+    return PROFILE_FLAG in argv or EXIT_FLAG in argv or os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start", "depth")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.profiler._depth
+        self.profiler._depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler._depth -= 1
+        self.profiler.events.append((self.name, self.start, end, self.depth))
+        return False
+
+
+class StartupProfiler:
+    """Chronomètre des phases du démarrage (imbriquables)."""
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.events = []     # (nom, début, fin, profondeur)
+        self.marks = []      # (nom, instant)
+        self._depth = 0
+
+    def enable(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+        self.events.clear()
+        self.marks.clear()
+
+    def phase(self, name):
+        """Contexte chronométrant une phase : `with profiler.phase("QSS"): ...`."""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def mark(self, name):
+        """Instant remarquable (ex. premier affichage)."""
+        if self.enabled:
+            self.marks.append((name, time.perf_counter()))
+
+    def _ms(self, t):
+        return round((t - self.origin) * 1000.0, 3)
+
+    def report(self, imports=None):
+        """Rapport (dictionnaire) des phases mesurées, dans l'ordre de début."""
+        phases = [
+            {"name": name, "start_ms": self._ms(start), "duration_ms": round((end - start) * 1000.0, 3),
+             "depth": depth}
+            for name, start, end, depth in sorted(self.events, key=lambda e: (e[1], e[3]))
+        ]
+        marks = [{"name": name, "at_ms": self._ms(t)} for name, t in self.marks]
+        return {
+            "version": REPORT_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "total_ms": max([m["at_ms"] for m in marks] + [p["start_ms"] + p["duration_ms"] for p in phases] + [0]),
+            "phases": phases,
+            "marks": marks,
+            "imports": imports if imports is not None else {},
+        }
+
+    def write(self, directory=None, imports=None):
+        """
+        Écrit le rapport JSON et la trace Chrome.
+
+        :return: (chemin du rapport, chemin de la trace)
+        """
+        if directory is None:
+            directory = os.environ.get(PROFILE_DIR_ENV)
+        if not directory:
+            from utils.paths import user_data_dir
+            directory = os.path.join(user_data_dir(), "startup_profiles")
+        os.makedirs(directory, exist_ok=True)
+        report = self.report(imports)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(directory, f"startup_{stamp}.json")
+        trace_path = os.path.join(directory, f"startup_{stamp}.trace.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(report), f, ensure_ascii=False)
+        return report_path, trace_path
+
+
+def measure_imports(module=IMPORTTIME_MODULE, timeout=120):
+    """
+    Temps d'import de `module` dans un processus Python séparé (`-X importtime`).
+
+    :return: {"module", "total_ms", "count", "top": [{"module", "self_ms", "cumulative_ms", "level"}],
+              "timeline": [...]} ou {"error": message} (exécutable PyInstaller, échec du processus)
+    """
+    if getattr(sys, "frozen", False):
+        return {"error": "mesure indisponible dans l'exécutable (pas d'interpréteur -X importtime)"}
+    from utils.paths import resource_path
+    root = resource_path("")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=root, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return {"error": str(e)}
+    entries = parse_importtime(completed.stderr)
+    if completed.returncode != 0 or not entries:
+        return {"error": (completed.stderr.strip().splitlines() or ["échec de l'import"])[-1]}
+
+    top_level = [e for e in entries if e["level"] == 0]
+    return {
+        "module": module,
+        "total_ms": round(sum(e["cumulative_ms"] for e in top_level), 3),
+        "count": len(entries),
+        "top": sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:IMPORTTIME_TOP],
+        "timeline": importtime_timeline(entries),
+    }
+
+
+def parse_importtime(text):
+    """Lignes de `-X importtime` -> [{"module", "self_ms", "cumulative_ms", "level"}] (ordre de sortie)."""
+    entries = []
+    for line in text.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0,
+                # Deux espaces d'indentation par niveau (un espace après « | » au niveau 0)
+                "level": max(len(indent) - 1, 0) // 2,
+            })
+    return entries
+
+
+def importtime_timeline(entries):
+    """
+    Place les imports sur une ligne de temps : `-X importtime` les liste après leurs
+    sous-imports, un module commence donc là où commence son premier sous-import.
+    :return: [{"module", "start_ms", "duration_ms", "level"}]
+    """
+    timeline = []
+    cursor = 0.0
+    for entry in entries:
+        start = cursor - (entry["cumulative_ms"] - entry["self_ms"])
+        timeline.append({"module": entry["module"], "start_ms": round(start, 3),
+                         "duration_ms": entry["cumulative_ms"], "level": entry["level"]})
+        cursor = start + entry["cumulative_ms"]
+    return timeline
+
+
+def chrome_trace(report):
+    """Rapport -> format Chrome trace (événements complets "X", en microsecondes)."""
+    events = [
+        {"name": "process_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "LABeCO2 (démarrage)"}},
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "phases"}},
+    ]
+    for phase in report["phases"]:
+        events.append({"name": phase["name"], "cat": "startup", "ph": "X", "pid": 1, "tid": 1,
+                       "ts": phase["start_ms"] * 1000.0, "dur": phase["duration_ms"] * 1000.0})
+    for mark in report["marks"]:
+        events.append({"name": mark["name"], "cat": "startup", "ph": "i", "s": "p", "pid": 1, "tid": 1,
+                       "ts": mark["at_ms"] * 1000.0})
+    timeline = report.get("imports", {}).get("timeline", [])
+    if timeline:
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": 2,
+                       "args": {"name": "imports (-X importtime, processus séparé)"}})
+        for entry in timeline:
+            events.append({"name": entry["module"], "cat": "import", "ph": "X", "pid": 1, "tid": 2,
+                           "ts": entry["start_ms"] * 1000.0, "dur": entry["duration_ms"] * 1000.0})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def watch_first_paint(widget, callback):
+    """
+    Appelle callback() une seule fois, au premier affichage (événement Paint) de widget.
+    Le filtre d'événements est rattaché au widget (détruit avec lui).
+    """
+    from PySide6.QtCore import QEvent, QObject, QTimer
+
+    class _FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                obj.removeEventFilter(self)
+                # Après le traitement du Paint : l'image est effectivement dessinée
+                QTimer.singleShot(0, callback)
+            return False
+
+    watcher = _FirstPaint(widget)
+    widget.installEventFilter(watcher)
+    return watcher
+
+
+# Profileur partagé par tous les modules du démarrage
+profiler = StartupProfiler()
@@ -0,0 +1,283 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# utils/vintage_impact.py
+
+"""
+Impact d'un changement de millésime des facteurs sur des historiques enregistrés.
+
+Les deux millésimes sont comparés par clé (FactorVintages.compare) ; seules les lignes
+d'historique qui utilisent un facteur modifié ou supprimé sont recalculées, les autres
+gardent leurs émissions. Chaque ligne part du millésime avec lequel elle a été calculée
+(colonne vintage ; --old si elle est vide). Usage, depuis la racine du dépôt :
+
+    python -m utils.vintage_impact historique1.csv historique2.xlsx --new 20250601 --output impact.xlsx
+"""
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from utils.factor_vintages import LOOKUP_COLUMNS, factor_keys, load_factor_vintages
+from utils.history_io import read_history
+from utils.reference_store import ReferenceStore
+
+ELECTRICITY = "Électricité"
+
+# Colonnes du rapport par ligne
+LINE_COLUMNS = [
+    "history", "line", "vintage", "category", "subcategory", "subsubcategory", "name", "electricity_type",
+    "value", "factor_old", "factor_new", "uncertainty_old", "uncertainty_new",
+    "emissions_old", "emissions_new", "delta", "status",
+]
+# Colonnes du rapport par catégorie
+CATEGORY_COLUMNS = ["history", "category", "lines", "lines_affected", "emissions_old", "emissions_new", "delta"]
+
+# Statut d'une ligne touchée
+CHANGED = "facteur modifié"
+REMOVED = "facteur supprimé"
+UNKNOWN_VINTAGE = "millésime inconnu"
+
+
+def _factor(row):
+    """(total, incertitude) d'une ligne de facteur, ou None."""
+    if row is None:
+        return None
+    return float(row["total"]), float(row.get("uncertainty", 0.0) or 0.0)
+
+
+class VintageImpact:
+    """
+    Facteurs touchés par le passage d'un millésime à un autre, calculés une seule fois
+    par millésime de départ puis appliqués à autant d'historiques que nécessaire.
+
+    Une ligne d'historique retrouve son facteur comme CarbonCalculator : par
+    (catégorie, sous-catégorie, sous-sous-catégorie, nom), textes comparés tels
+    qu'enregistrés, ou par type d'électricité pour les machines. Elle part du
+    millésime de sa colonne vintage, ou de l'ancien millésime si elle n'en a pas.
+    """
+
+    def __init__(self, vintages, old=None, new=None):
+        """
+        :param vintages: FactorVintages
+        :param old: millésime de départ des lignes sans millésime (par défaut : le millésime de base)
+        :param new: millésime d'arrivée (par défaut : le plus récent)
+        """
+        self.vintages = vintages
+        self.old = vintages.resolve(old or vintages.base_name)
+        self.new = vintages.resolve(new)
+        self._changes = {}
+        self.diff, self.factors, self.electricity = self.changes(self.old)
+
+    def changes(self, old):
+        """
+        Différences d'un millésime de départ vers le millésime d'arrivée (mises en cache).
+
+        :return: (diff, facteurs, électricité) : diff de FactorVintages.compare,
+                 {clé de recherche: (avant, après)} et {type d'électricité: (avant, après)},
+                 avant/après valant (total, incertitude), après None si le facteur est supprimé
+        """
+        old = self.vintages.resolve(old)
+        if old in self._changes:
+            return self._changes[old]
+        diff = self.vintages.compare(old, self.new)
+
+        # Clés de recherche dont le facteur retenu change : clé -> (avant, après)
+        factors = {}
+        for lookup in set(factor_keys(diff, LOOKUP_COLUMNS)):
+            before = _factor(self.vintages.find(*lookup, vintage=old))
+            after = _factor(self.vintages.find(*lookup, vintage=self.new))
+            if before is not None and before != after:
+                factors[lookup] = (before, after)
+
+        # Types d'électricité (machines) dont le facteur change : nom -> (avant, après)
+        electricity = {}
+        names = set(diff.loc[diff["category"] == ELECTRICITY, "name"])
+        if names:
+            before, after = (self._electricity_factors(v, names) for v in (old, self.new))
+            for name in names:
+                if before.get(name) is not None and before.get(name) != after.get(name):
+                    electricity[name] = (before[name], after.get(name))
+
+        self._changes[old] = diff, factors, electricity
+        return self._changes[old]
+
+    def _electricity_factors(self, vintage, names):
+        data = self.vintages.frame(vintage)
+        elec = data[(data["category"] == ELECTRICITY) & data["name"].isin(names)].drop_duplicates("name")
+        return {row["name"]: _factor(row) for row in elec.to_dict("records")}
+
+    def _line_vintages(self, vintage):
+        """Millésime de départ de chaque ligne (texte), None s'il est inconnu."""
+        resolved = {}
+        for name in set(vintage):
+            try:
+                resolved[name] = self.vintages.resolve(name or self.old)
+            except KeyError:
+                resolved[name] = None
+        return [resolved[name] for name in vintage]
+
+    def history(self, history, label=""):
+        """
+        Impact sur un historique (DataFrame au format de l'export).
+
+        :return: (lignes touchées, totaux par catégorie), deux DataFrames
+                 aux colonnes LINE_COLUMNS et CATEGORY_COLUMNS
+        """
+        df = history.reset_index(drop=True)
+
+        def text_col(name):
+            # Textes tels qu'enregistrés : des noms de facteurs se terminent par une espace
+            if name not in df.columns:
+                return pd.Series("", index=df.index)
+            return df[name].astype(object).fillna("").astype(str)
+
+        def num_col(name, default):
+            if name not in df.columns:
+                return pd.Series(default, index=df.index, dtype=float)
+            return pd.to_numeric(df[name], errors="coerce").fillna(default)
+
+        category = text_col("category")
+        electricity_type = text_col("electricity_type")
+        keys = list(zip(category, text_col("subcategory"), text_col("subsubcategory"), text_col("name")))
+        is_machine = (category == "Machine").tolist()
+        # Millésime de départ de chaque ligne (millésime "AAAAMMJJ" lu en nombre : sans ".0")
+        vintage_text = text_col("vintage").str.strip().str.replace(r"\.0$", "", regex=True)
+        line_vintages = self._line_vintages(vintage_text)
+
+        # Seules les lignes dont le facteur change sont recalculées
+        pairs = []
+        for key, machine, elec, vintage in zip(keys, is_machine, electricity_type, line_vintages):
+            if vintage is None:
+                pairs.append(UNKNOWN_VINTAGE)
+                continue
+            _, factors, electricity = self.changes(vintage)
+            pairs.append(electricity.get(elec) if machine else factors.get(key))
+        affected = [i for i, pair in enumerate(pairs) if pair is not None]
+
+        value = num_col("value", 0.0)
+        days = num_col("days", 1)
+        # Même règle que CarbonCalculator : km/jour × jours pour les véhicules
+        total_value = value.where(category != "Véhicules", value * days)
+        emissions = num_col("emissions_price", 0.0)
+
+        rows = []
+        for i in affected:
+            if pairs[i] == UNKNOWN_VINTAGE:
+                # Millésime d'origine absent des tables : ligne signalée, non recalculée
+                rows.append({
+                    "history": label, "line": i, "vintage": vintage_text[i], "category": keys[i][0],
+                    "subcategory": keys[i][1], "subsubcategory": keys[i][2], "name": keys[i][3],
+                    "electricity_type": electricity_type[i], "value": value[i], "status": UNKNOWN_VINTAGE,
+                })
+                continue
+            (factor_old, unc_old), after = pairs[i]
+            factor_new, unc_new = after if after is not None else (None, None)
+            emissions_old = total_value[i] * factor_old
+            emissions_new = None if after is None else total_value[i] * factor_new
+            rows.append({
+                "history": label, "line": i, "vintage": line_vintages[i],
+                "category": keys[i][0], "subcategory": keys[i][1],
+                "subsubcategory": keys[i][2], "name": keys[i][3], "electricity_type": electricity_type[i],
+                "value": value[i], "factor_old": factor_old, "factor_new": factor_new,
+                "uncertainty_old": unc_old, "uncertainty_new": unc_new,
+                "emissions_old": emissions_old, "emissions_new": emissions_new,
+                "delta": None if after is None else emissions_new - emissions_old,
+                "status": CHANGED if after is not None else REMOVED,
+            })
+        lines = pd.DataFrame(rows, columns=LINE_COLUMNS)
+
+        # Totaux par catégorie : émissions enregistrées + écart des seules lignes touchées
+        delta = pd.Series(0.0, index=df.index)
+        if not lines.empty:
+            delta[lines["line"].to_numpy()] = lines["delta"].astype(float).fillna(0.0).to_numpy()
+        flags = pd.Series(False, index=df.index)
+        flags[affected] = True
+        categories = (
+            pd.DataFrame({"category": category, "emissions_old": emissions, "delta": delta, "affected": flags})
+            .groupby("category", sort=True)
+            .agg(lines=("delta", "size"), lines_affected=("affected", "sum"),
+                 emissions_old=("emissions_old", "sum"), delta=("delta", "sum"))
+            .reset_index()
+        )
+        categories["emissions_new"] = categories["emissions_old"] + categories["delta"]
+        categories.insert(0, "history", label)
+        return lines, categories.reindex(columns=CATEGORY_COLUMNS)
+
+    def report(self, histories):
+        """
+        Impact sur plusieurs historiques.
+
+        :param histories: dictionnaire {nom: DataFrame}
+        :return: (lignes touchées, totaux par catégorie) de tous les historiques
+        """
+        results = [self.history(df, label) for label, df in histories.items()]
+        if not results:
+            return pd.DataFrame(columns=LINE_COLUMNS), pd.DataFrame(columns=CATEGORY_COLUMNS)
+        lines, categories = zip(*results)
+        return pd.concat(lines, ignore_index=True), pd.concat(categories, ignore_index=True)
+
+
+def write_report(lines, categories, path):
+    """Rapport Excel (feuilles "lignes" et "categories") ou deux CSV « ; » (<nom>_lignes.csv, <nom>_categories.csv)."""
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == ".xlsx":
+        with pd.ExcelWriter(path) as writer:
+            lines.to_excel(writer, sheet_name="lignes", index=False)
+            categories.to_excel(writer, sheet_name="categories", index=False)
+        return [path]
+    paths = [f"{stem}_lignes.csv", f"{stem}_categories.csv"]
+    lines.to_csv(paths[0], sep=";", index=False)
+    categories.to_csv(paths[1], sep=";", index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Impact d'un changement de millésime des facteurs sur des historiques LABeCO2."
+    )
+    parser.add_argument("histories", nargs="+", help="historiques exportés (.csv, .xlsx, .h5)")
+    parser.add_argument("--old", help="millésime de départ des lignes sans millésime (par défaut : millésime de base)")
+    parser.add_argument("--new", help="millésime d'arrivée (par défaut : le plus récent)")
+    parser.add_argument("--reference", help="fichier des tables de référence (par défaut : celui de l'application)")
+    parser.add_argument("--output", help="rapport détaillé (.xlsx, ou préfixe des fichiers .csv)")
+    args = parser.parse_args(argv)
+
+    store = ReferenceStore(args.reference)
+    try:
+        vintages = load_factor_vintages(store)
+    finally:
+        store.close()
+    try:
+        impact = VintageImpact(vintages, args.old, args.new)
+    except KeyError as e:
+        print(f"[ERREUR] {e.args[0]}")
+        return 1
+
+    print(f"[INFO] {impact.old} -> {impact.new} : {len(impact.diff)} facteur(s) différent(s), "
+          f"{len(impact.factors) + len(impact.electricity)} sélection(s) touchée(s)")
+    lines, categories = impact.report({path: read_history(path) for path in args.histories})
+    for label, group in categories.groupby("history", sort=False):
+        before, delta = group["emissions_old"].sum(), group["delta"].sum()
+        ratio = f" ({delta / before:+.1%})" if before else ""
+        print(f"{label} : {before:.4f} -> {before + delta:.4f} kg CO₂e{ratio}, "
+              f"{int(group['lines_affected'].sum())} ligne(s) touchée(s)")
+    removed = lines[lines["status"] == REMOVED]
+    if not removed.empty:
+        print(f"[ATTENTION] {len(removed)} ligne(s) utilisent un facteur absent du millésime {impact.new}.")
+    unknown = lines[lines["status"] == UNKNOWN_VINTAGE]
+    if not unknown.empty:
+        print(f"[ATTENTION] {len(unknown)} ligne(s) rattachée(s) à un millésime inconnu, non recalculée(s).")
+
+    if args.output:
+        for path in write_report(lines, categories, args.output):
+            print(f"[INFO] Rapport écrit : {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
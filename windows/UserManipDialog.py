@@ -3,7 +3,9 @@
 #
 # Ce fichier fait partie du projet LABeCO2.
 # Distribué sous licence : GNU GPL v3 (non commercial)
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QDialogButtonBox
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QFormLayout, QLabel, QLineEdit, QDialogButtonBox, QDoubleSpinBox
+)
 
 class UserManipDialog(QDialog):
     def __init__(self, parent=None):
@@ -26,7 +28,27 @@ class UserManipDialog(QDialog):
         self.name_edit.setPlaceholderText("Nom de la manip...")
         layout.addWidget(self.name_edit)
 
-        # 3) Boutons OK / Annuler
+        # 3) Paramètre d'échelle optionnel (manip paramétrée)
+        scale_explanation = QLabel(
+            "Optionnel : si la manip dépend d'un nombre d'échantillons, de runs ou de jours,\n"
+            "indiquez le nom du paramètre et sa valeur pour les éléments sélectionnés.\n"
+            "Les valeurs et quantités seront mises à l'échelle lors de l'ajout de la manip."
+        )
+        scale_explanation.setWordWrap(True)
+        layout.addWidget(scale_explanation)
+
+        scale_form = QFormLayout()
+        self.scale_label_edit = QLineEdit()
+        self.scale_label_edit.setPlaceholderText("ex. échantillons")
+        self.scale_base_spin = QDoubleSpinBox()
+        self.scale_base_spin.setRange(0.01, 1e9)
+        self.scale_base_spin.setDecimals(2)
+        self.scale_base_spin.setValue(1.0)
+        scale_form.addRow("Paramètre :", self.scale_label_edit)
+        scale_form.addRow("Valeur de référence :", self.scale_base_spin)
+        layout.addLayout(scale_form)
+
+        # 4) Boutons OK / Annuler
         button_box = QDialogButtonBox(
             QDialogButtonBox.Ok | QDialogButtonBox.Cancel,
             parent=self
@@ -39,4 +61,12 @@ class UserManipDialog(QDialog):
 
     def get_manip_name(self):
         """Renvoie le nom saisi par l'utilisateur."""
-        return self.name_edit.text().strip()
\ No newline at end of file
+        return self.name_edit.text().strip()
+
+    def get_scale_label(self):
+        """Renvoie le nom du paramètre d'échelle (None si la manip n'est pas paramétrée)."""
+        return self.scale_label_edit.text().strip() or None
+
+    def get_scale_base(self):
+        """Renvoie la valeur du paramètre d'échelle pour laquelle la manip a été définie."""
+        return self.scale_base_spin.value()
@@ -9,6 +9,7 @@ import math
 import pandas as pd
 from PySide6.QtWidgets import QMessageBox
 from windows.data_manager import DataManager
+from utils.instrumentation import instrumented
 
 class CarbonCalculator:
     """
@@ -18,9 +19,14 @@ class CarbonCalculator:
     def __init__(self, data_manager: DataManager):
         self.dm = data_manager
         self.data = self.dm.get_main_data()
-        self.data_masse = self.dm.get_data_masse()
         self.data_materials = self.dm.get_data_materials()
 
+    @property
+    def data_masse(self):
+        """Table des consommables du DataManager (inclut les ajouts faits en cours de session)."""
+        return self.dm.get_data_masse()
+
+    @instrumented()
     def compute_emission_data(self, data_dict):
         """
         Calcule les émissions carbone (prix + incertitude) et (masse NACRES + incertitude),
@@ -31,6 +37,7 @@ class CarbonCalculator:
         subsub     = data_dict.get('subsubcategory', '')
         name       = data_dict.get('name', '')
         year       = data_dict.get('year', '')
+        vintage    = data_dict.get('vintage')
 
         val = float(data_dict.get('value', 0.0))  # ex. km/jour ou euros ou litres
         days           = int(data_dict.get('days', 1))
@@ -47,20 +54,22 @@ class CarbonCalculator:
         tm = 0.0
         error_message = None
 
+        # Millésime des facteurs auquel le calcul est rattaché (le plus récent par défaut)
+        try:
+            vintage = self.dm.vintages.resolve(vintage)
+        except KeyError:
+            error_message = "Millésime des facteurs inconnu."
+            return (0.0, 0.0, 0.0, 0.0, 0.0, error_message)
+
         # Cas spécial : Machine
         if category == 'Machine':
-            # Récupérer le facteur d'émission et son incertitude
-            emission_factor = 0.0
-            factor_uncert = 0.0
-            mask = (self.data['category'] == 'Électricité') & (self.data['name'] == data_dict.get('electricity_type', ''))
-            filtered_data = self.data[mask]
-            if filtered_data.empty:
+            # Récupérer le facteur d'émission et son incertitude (index du millésime)
+            emission_factor, factor_uncert = self.dm.get_electricity_factor(
+                data_dict.get('electricity_type', ''), vintage
+            )
+            if emission_factor is None:
                 error_message = "Impossible de trouver le facteur d'émission pour ce type d'électricité."
                 return (0.0, 0.0, 0.0, 0.0, 0.0, error_message)
-            emission_factor = float(filtered_data['total'].iloc[0])
-            if 'uncertainty' in filtered_data.columns:
-                factor_uncert_value = filtered_data['uncertainty'].iloc[0]
-                factor_uncert = float(factor_uncert_value or 0.0)
 
             # Calcul des émissions et de l'incertitude
             emissions = val * emission_factor
@@ -78,30 +87,15 @@ class CarbonCalculator:
             # Achats, Activités, etc. => on suppose data_dict['value'] = la valeur totale
             total_value = val
 
-        # Filtrer self.data pour trouver le facteur d’émission
-        mask = (
-            (self.data['category'] == category) &
-            (self.data['subcategory'] == subcat) &
-            (self.data['subsubcategory'].fillna('') == subsub) &
-            (self.data['name'].fillna('') == name)
-        )
-        if year:
-            mask &= (self.data['year'].astype(str) == str(year))
-
-        filtered = self.data[mask]
-        if filtered.empty:
+        # Trouver le facteur d’émission dans le millésime (index du DataManager)
+        row = self.dm.find_factor(category, subcat, subsub, name, year, vintage)
+        if row is None:
             error_message = "Aucune donnée disponible pour cette sélection."
             return (0.0, 0.0, 0.0, 0.0, 0.0, error_message)
 
-        # Récupérer le facteur d'émission "total"
-        emission_factor = float(filtered['total'].iloc[0])
-
-        # Récupérer l'incertitude (évite KeyError en utilisant .iloc[0])
-        factor_uncert = 0.0
-        if 'uncertainty' in filtered.columns:
-            # c'est une Série, on prend la 1ère ligne
-            factor_uncert_value = filtered['uncertainty'].iloc[0]
-            factor_uncert = float(factor_uncert_value or 0.0)
+        # Récupérer le facteur d'émission "total" et son incertitude
+        emission_factor = float(row['total'])
+        factor_uncert = float(row.get('uncertainty', 0.0) or 0.0)
 
         # Calcul prix
         ep = total_value * emission_factor
@@ -126,30 +120,194 @@ class CarbonCalculator:
         if not code_nacres or code_nacres == 'NA':
             return (0.0, 0.0, 0.0)
 
-        matching = self.data_masse[
-            (self.data_masse['Code NACRES'].str.strip() == code_nacres.strip()) &
-            (self.data_masse['Consommable'].str.strip() == consommable.strip())
-        ]
-        if matching.empty:
+        consumable = self.dm.find_consumable_mass(code_nacres, consommable)
+        if consumable is None:
             return (0.0, 0.0, 0.0)
 
-        row = matching.iloc[0]
-        masse_g = row.get("Masse unitaire (g)", 0.0)
-        materiau = row.get("Matériau", "")
-        incert_mass_factor = float(row.get("uncertainty", 0.0) or 0.0)
+        masse_g, materiau, incert_mass_factor = consumable
 
         masse_kg_unitaire = float(masse_g) / 1000.0
         masse_totale_kg = masse_kg_unitaire * quantity
 
-        mat_filter = self.data_materials[self.data_materials['Materiau'] == materiau]
-        if mat_filter.empty:
+        eCO2_par_kg, incert_material = self.dm.get_material_data(materiau)
+        if eCO2_par_kg is None:
             return (0.0, masse_totale_kg, 0.0)
 
-        eCO2_par_kg = float(mat_filter.iloc[0].get("Equivalent CO₂ (kg eCO₂/kg)", 0.0))
-        incert_material = float(mat_filter.iloc[0].get("uncertainty", 0.0) or 0.0)
-
         eCO2_total = masse_totale_kg * eCO2_par_kg
         incert_total_fraction = (incert_mass_factor**2 + incert_material**2)**0.5
         eCO2_total_error = eCO2_total * incert_total_fraction
 
         return (eCO2_total, masse_totale_kg, eCO2_total_error)
+
+    @instrumented()
+    def compute_emission_batch(self, items):
+        """
+        Version vectorisée de compute_emission_data pour un lot d'items.
+
+        Les facteurs d'émission, masses et matériaux sont récupérés par jointure
+        (un seul passage sur les tables de référence) au lieu d'un filtrage par item.
+        Les items sont regroupés par millésime des facteurs (colonne vintage) :
+        une jointure par millésime présent dans le lot.
+
+        :param items: DataFrame avec (au moins en partie) les colonnes de data_dict :
+            category, subcategory, subsubcategory, name, year, value, days,
+            code_nacres, consommable, quantity, electricity_type, vintage.
+        :return: DataFrame indexé comme items, avec les colonnes emissions_price,
+            emissions_price_error, emission_mass, emission_mass_error, total_mass
+            et calc_error_msg (None si le calcul a réussi).
+        """
+        if 'vintage' not in items.columns:
+            return self._compute_emission_batch(items, self.data)
+
+        parts = []
+        for vintage, group in items.groupby(items['vintage'].fillna('').astype(str), sort=False):
+            try:
+                data = self.dm.get_main_data(vintage or None)
+            except KeyError:
+                parts.append(self._empty_results(group.index, "Millésime des facteurs inconnu."))
+                continue
+            parts.append(self._compute_emission_batch(group, data))
+        if not parts:
+            return self._empty_results(items.index)
+        return pd.concat(parts).reindex(items.index)
+
+    @staticmethod
+    def _empty_results(idx, error_message=None):
+        return pd.DataFrame({
+            'emissions_price': 0.0,
+            'emissions_price_error': 0.0,
+            'emission_mass': 0.0,
+            'emission_mass_error': 0.0,
+            'total_mass': 0.0,
+            'calc_error_msg': error_message,
+        }, index=idx)
+
+    def _compute_emission_batch(self, items, data):
+        """compute_emission_batch pour des items d'un même millésime (data : sa table des facteurs)."""
+        idx = items.index
+
+        def text_col(name, default):
+            if name not in items.columns:
+                return pd.Series(default, index=idx, dtype=object)
+            return items[name].fillna(default).astype(str)
+
+        def num_col(name, default):
+            if name not in items.columns:
+                return pd.Series(default, index=idx, dtype=float)
+            return pd.to_numeric(items[name], errors='coerce').fillna(default)
+
+        def year_key(y):
+            if y is None or y == '' or (isinstance(y, float) and math.isnan(y)):
+                return ''
+            try:
+                return str(int(float(y))) if float(y) else ''
+            except (TypeError, ValueError):
+                return str(y)
+
+        category = text_col('category', '')
+        val = num_col('value', 0.0).astype(float)
+        days = num_col('days', 1).astype(int)
+        quantity = num_col('quantity', 0).astype(int)
+        code_nacres = text_col('code_nacres', 'NA')
+        consommable = text_col('consommable', 'NA')
+
+        out = self._empty_results(idx)
+
+        uncert = (pd.to_numeric(data['uncertainty'], errors='coerce').fillna(0.0)
+                  if 'uncertainty' in data.columns else pd.Series(0.0, index=data.index))
+
+        # --- Cas Machine : facteur de l'électricité choisie ---
+        is_machine = category == 'Machine'
+        if is_machine.any():
+            elec_mask = data['category'] == 'Électricité'
+            elec = pd.DataFrame({
+                'name': data.loc[elec_mask, 'name'],
+                'ef': data.loc[elec_mask, 'total'].astype(float),
+                'unc': uncert[elec_mask],
+            }).drop_duplicates('name').set_index('name')
+            elec_type = text_col('electricity_type', '')[is_machine]
+            ef = elec_type.map(elec['ef'])
+            unc = elec_type.map(elec['unc'])
+            found = ef.notna()
+            ep = val[is_machine] * ef.fillna(0.0)
+            out.loc[ep.index, 'emissions_price'] = ep
+            out.loc[ep.index, 'emissions_price_error'] = ep * unc.fillna(0.0)
+            out.loc[found[~found].index, 'calc_error_msg'] = \
+                "Impossible de trouver le facteur d'émission pour ce type d'électricité."
+
+        # --- Autres catégories : jointure sur (category, subcategory, subsub, name[, year]) ---
+        others = ~is_machine
+        if others.any():
+            key4 = ['category', 'subcategory', 'subsubcategory', 'name']
+            ref = pd.DataFrame({
+                'category': data['category'],
+                'subcategory': data['subcategory'],
+                'subsubcategory': data['subsubcategory'].astype(object).fillna(''),
+                'name': data['name'].astype(object).fillna(''),
+                'year': data['year'].astype(str),
+                'ef': data['total'].astype(float),
+                'unc': uncert,
+            })
+            query = pd.DataFrame({
+                'category': category[others],
+                'subcategory': text_col('subcategory', '')[others],
+                'subsubcategory': text_col('subsubcategory', '')[others],
+                'name': text_col('name', '')[others],
+                'year': items['year'][others].map(year_key) if 'year' in items.columns else '',
+            })
+            query['_pos'] = query.index
+            with_year = query['year'] != ''
+            # Comme compute_emission_data : on retient la première ligne correspondante
+            matched = pd.concat([
+                query[with_year].merge(ref.drop_duplicates(key4 + ['year']), on=key4 + ['year'], how='left'),
+                query[~with_year].drop(columns='year').merge(ref.drop_duplicates(key4).drop(columns='year'),
+                                                            on=key4, how='left'),
+            ]).set_index('_pos')
+            ef = matched['ef'].reindex(query.index)
+            unc = matched['unc'].reindex(query.index).fillna(0.0)
+
+            total_value = val[others].where(category[others] != 'Véhicules', val[others] * days[others])
+            ep = total_value * ef.fillna(0.0)
+            out.loc[ep.index, 'emissions_price'] = ep
+            out.loc[ep.index, 'emissions_price_error'] = ep * unc
+            missing = ef.isna()
+            out.loc[missing[missing].index, 'calc_error_msg'] = "Aucune donnée disponible pour cette sélection."
+
+            # --- Calcul massique NACRES (Achats + code_nacres renseigné) ---
+            mass_rows = others & (category == 'Achats') & (code_nacres != 'NA') & (code_nacres != '')
+            mass_rows &= out['calc_error_msg'].isna()
+            if mass_rows.any():
+                masse = self.data_masse
+                masse_ref = pd.DataFrame({
+                    'code': masse['Code NACRES'].astype(str).str.strip(),
+                    'conso': masse['Consommable'].astype(str).str.strip(),
+                    'masse_g': pd.to_numeric(masse['Masse unitaire (g)'], errors='coerce'),
+                    'materiau': masse['Matériau'],
+                    'unc_mass': (pd.to_numeric(masse['uncertainty'], errors='coerce').fillna(0.0)
+                                 if 'uncertainty' in masse.columns else 0.0),
+                }).drop_duplicates(['code', 'conso'])
+                mats = self.data_materials
+                mat_ref = pd.DataFrame({
+                    'materiau': mats['Materiau'],
+                    'co2_kg': pd.to_numeric(mats['Equivalent CO₂ (kg eCO₂/kg)'], errors='coerce').fillna(0.0),
+                    'unc_mat': (pd.to_numeric(mats['uncertainty'], errors='coerce').fillna(0.0)
+                                if 'uncertainty' in mats.columns else 0.0),
+                }).drop_duplicates('materiau')
+
+                mq = pd.DataFrame({
+                    'code': code_nacres[mass_rows].str.strip(),
+                    'conso': consommable[mass_rows].str.strip(),
+                    'quantity': quantity[mass_rows],
+                })
+                mq['_pos'] = mq.index
+                mm = (mq.merge(masse_ref, on=['code', 'conso'], how='left')
+                        .merge(mat_ref, on='materiau', how='left')
+                        .set_index('_pos'))
+                tm = (mm['masse_g'] / 1000.0 * mm['quantity']).fillna(0.0)
+                em = (tm * mm['co2_kg']).fillna(0.0)
+                unc_total = (mm['unc_mass'].fillna(0.0) ** 2 + mm['unc_mat'].fillna(0.0) ** 2) ** 0.5
+                out.loc[mm.index, 'total_mass'] = tm
+                out.loc[mm.index, 'emission_mass'] = em
+                out.loc[mm.index, 'emission_mass_error'] = em * unc_total
+
+        return out
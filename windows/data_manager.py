@@ -5,9 +5,12 @@
 # Distribué sous licence : GNU GPL v3 (non commercial)
 # windows/data_manager.py
 
-import os
+import hashlib
 import pandas as pd
-from utils.data_loader import load_data  # Ajuster si nécessaire selon ta structure
+from utils.consumables_store import ConsumablesStore
+from utils.factor_vintages import FactorHierarchy, load_factor_vintages
+from utils.reference_store import ReferenceStore
+from utils.startup_profile import profiler
 
 class DataManager:
     """
@@ -35,38 +38,76 @@ class DataManager:
     MATERIAU_NAME_COL = "Materiau"
     EQUIV_CO2_COL = "Equivalent CO₂ (kg eCO₂/kg)"
 
-    # Chemins par défaut
-    DATA_MASSE_FILENAME = "data_eCO2_masse_consommable.hdf5"
-    DATA_MATERIALS_FILENAME = "empreinte_carbone_materiaux.h5"
-
     def __init__(self, base_path):
         """
         :param base_path: Répertoire de base pour charger les fichiers de données.
         """
         self.base_path = base_path
 
-        # Charger la data principale
-        self.main_data = load_data()  # ta fonction existante, ex. pour "category", "subcategory", etc.
-
-        # Construire les chemins
-        self.data_masse_path = os.path.join(base_path, "data_masse_eCO2", self.DATA_MASSE_FILENAME)
-        self.data_materials_path = os.path.join(base_path, "data_masse_eCO2", self.DATA_MATERIALS_FILENAME)
-
-        # Charger data_masse
-        if not os.path.exists(self.data_masse_path):
-            raise FileNotFoundError(f"Fichier {self.data_masse_path} introuvable.")
-        self.data_masse = pd.read_hdf(self.data_masse_path)
+        # Charger data_masse (base SQLite des consommables, modifiable par l'utilisateur)
+        with profiler.phase("DataManager : consommables (SQLite)"):
+            self.consumables_store = ConsumablesStore()
+            self.data_masse = self.consumables_store.load()
         if self.CODE_NACRES_COL not in self.data_masse.columns:
             raise KeyError(f"La colonne '{self.CODE_NACRES_COL}' est introuvable dans data_masse.")
 
-        # Charger data_materials
-        if not os.path.exists(self.data_materials_path):
-            raise FileNotFoundError(f"Fichier {self.data_materials_path} introuvable.")
-        self.data_materials = pd.read_hdf(self.data_materials_path)
+        # Charger les facteurs d'émission (millésime de base + deltas des millésimes suivants)
+        # et data_materials, depuis le fichier des tables de référence
+        reference_store = ReferenceStore()
+        try:
+            with profiler.phase("DataManager : facteurs d'émission (reference_data.sqlite)"):
+                self.vintages = load_factor_vintages(reference_store)
+            with profiler.phase("DataManager : matériaux (reference_data.sqlite)"):
+                self.data_materials = reference_store.read("materiaux")
+        finally:
+            reference_store.close()
+
+        # Data principale : millésime le plus récent
+        with profiler.phase("DataManager : table du millésime courant"):
+            self.main_data = self.vintages.frame()
+
+        # Empreintes des bases de facteurs, par millésime (calculées à la demande)
+        self._factors_versions = {}
+        # Index de la hiérarchie des facteurs, par millésime (construits à la demande)
+        self._hierarchies = {}
+        # Matériaux : nom -> (équivalent CO₂ par kg, incertitude)
+        self._materials = self._index_materials(self.data_materials)
+
+        # Index des consommables (clé -> position dans data_masse), tenus à jour à chaque ajout
+        with profiler.phase("DataManager : index des consommables"):
+            self._build_masse_indexes()
+
+    def get_main_data(self, vintage=None):
+        """
+        Retourne la DataFrame principale : le millésime le plus récent,
+        ou la table complète du millésime demandé (KeyError s'il est inconnu).
+        """
+        if vintage is None or vintage == self.vintages.latest:
+            return self.main_data
+        return self.vintages.frame(vintage)
+
+    def hierarchy(self, vintage=None):
+        """Index de la hiérarchie des facteurs d'un millésime (listes de l'interface, électricité)."""
+        vintage = self.vintages.resolve(vintage)
+        if vintage not in self._hierarchies:
+            self._hierarchies[vintage] = FactorHierarchy(self.get_main_data(vintage))
+        return self._hierarchies[vintage]
+
+    def memory_usage(self):
+        """
+        Mémoire occupée par les tables chargées (octets, chaînes comprises), pour le diagnostic.
 
-    def get_main_data(self):
-        """Retourne la DataFrame principale."""
-        return self.main_data
+        :return: {nom de la table: {"rows", "bytes"}}
+        """
+        tables = {
+            "facteurs": self.main_data,
+            "consommables": self.data_masse,
+            "materiaux": self.data_materials,
+        }
+        return {
+            name: {"rows": len(df), "bytes": int(df.memory_usage(deep=True).sum())}
+            for name, df in tables.items()
+        }
 
     def get_data_masse(self):
         """Retourne la DataFrame des consommables (NACRES)."""
@@ -76,41 +117,133 @@ class DataManager:
         """Retourne la DataFrame des matériaux."""
         return self.data_materials
 
-    def get_emission_factor(self, category, subcategory, subsubcategory, name, year=None):
+    def get_factors_version(self, vintage=None):
+        """
+        Retourne une empreinte (SHA-1) du contenu des bases de facteurs
+        (facteurs d'émission du millésime, masses des consommables, matériaux).
+
+        Sert de clé de validité pour les résultats mis en cache :
+        toute modification d'une des tables change l'empreinte.
+        """
+        vintage = self.vintages.resolve(vintage)
+        if vintage not in self._factors_versions:
+            digest = hashlib.sha1()
+            for df in (self.vintages.frame(vintage), self.data_masse, self.data_materials):
+                digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+                digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+            self._factors_versions[vintage] = digest.hexdigest()
+        return self._factors_versions[vintage]
+
+    def invalidate_factors_version(self):
+        """À appeler après toute modification en mémoire des bases de facteurs."""
+        self._factors_versions.clear()
+
+    def find_factor(self, category, subcategory, subsubcategory, name, year=None, vintage=None):
+        """
+        Retourne la ligne (dictionnaire) du facteur d'émission correspondant à la sélection
+        dans un millésime (le plus récent par défaut), ou None.
+        Recherche par index, sans filtrer ni reconstruire la table du millésime.
+        """
+        return self.vintages.find(category, subcategory, subsubcategory, name, year, vintage)
+
+    # ------------------------------------------------------------------
+    # Consommables : index de recherche et ajout incrémental
+    # ------------------------------------------------------------------
+    def _build_masse_indexes(self):
+        self._masse_by_key = {}      # (Code NACRES, Consommable) -> position
+        self._masse_by_nacres = {}   # 4 premiers caractères du code -> [positions]
+        self._masse_labels = []      # "CODE - Consommable", dans l'ordre de data_masse
+        self._masse_mass = []        # (masse unitaire (g), matériau, incertitude), par position
+        self._index_masse_rows(0, self.data_masse)
+
+    def _index_masse_rows(self, start, rows):
+        codes = rows[self.CODE_NACRES_COL].fillna('').astype(str).str.strip()
+        consommables = rows[self.CONSOMMABLE_COL].fillna('').astype(str).str.strip()
+        for pos, (code, conso) in enumerate(zip(codes, consommables), start=start):
+            self._masse_by_key.setdefault((code, conso), pos)
+            self._masse_by_nacres.setdefault(code[:4], []).append(pos)
+            self._masse_labels.append(f"{code} - {conso}")
+        # Champs du calcul massique, lus sans extraire la ligne de data_masse
+        masses = (pd.to_numeric(rows[self.MASSE_G_COL], errors='coerce').fillna(0.0)
+                  if self.MASSE_G_COL in rows.columns else pd.Series(0.0, index=rows.index))
+        materiaux = (rows[self.MATERIAU_COL].astype(object).fillna('')
+                     if self.MATERIAU_COL in rows.columns else pd.Series('', index=rows.index))
+        uncertainties = (pd.to_numeric(rows[self.UNCERTAINTY_COL], errors='coerce').fillna(0.0)
+                         if self.UNCERTAINTY_COL in rows.columns else pd.Series(0.0, index=rows.index))
+        self._masse_mass.extend(zip(masses.tolist(), materiaux.tolist(), uncertainties.tolist()))
+
+    def find_consumable(self, code_nacres, consommable):
+        """
+        Retourne la ligne de data_masse (Series) correspondant au couple
+        (Code NACRES, Consommable), ou None. Recherche par dictionnaire.
+        """
+        pos = self._masse_by_key.get((str(code_nacres).strip(), str(consommable).strip()))
+        return None if pos is None else self.data_masse.iloc[pos]
+
+    def find_consumable_mass(self, code_nacres, consommable):
+        """
+        (masse unitaire en g, matériau, incertitude) du consommable (Code NACRES, Consommable),
+        ou None : champs du calcul massique, sans extraire la ligne de data_masse.
+        """
+        pos = self._masse_by_key.get((str(code_nacres).strip(), str(consommable).strip()))
+        return None if pos is None else self._masse_mass[pos]
+
+    def consumable_labels(self, code_nacres_4=None):
+        """
+        Libellés "CODE - Consommable" des consommables, tous ou seulement ceux
+        dont le Code NACRES commence par code_nacres_4.
+        """
+        if code_nacres_4 is None:
+            return list(self._masse_labels)
+        return [self._masse_labels[pos] for pos in self._masse_by_nacres.get(code_nacres_4[:4], [])]
+
+    def append_consumables(self, rows):
+        """
+        Ajoute en mémoire des consommables déjà enregistrés dans la base
+        (ex. depuis DataMassWindow), sans recharger la base.
+        Les index de recherche sont complétés et l'empreinte des facteurs invalidée.
+
+        :param rows: liste de dictionnaires ou DataFrame (colonnes de data_masse)
+        :return: DataFrame des lignes ajoutées
+        """
+        new_rows = pd.DataFrame(rows).reindex(columns=self.data_masse.columns)
+        if new_rows.empty:
+            return new_rows
+        start = len(self.data_masse)
+        self.data_masse = pd.concat([self.data_masse, new_rows], ignore_index=True)
+        self._index_masse_rows(start, new_rows)
+        self.invalidate_factors_version()
+        return new_rows
+
+    def get_emission_factor(self, category, subcategory, subsubcategory, name, year=None, vintage=None):
         """
         Extrait le facteur d'émission (self.TOTAL_COL) et son incertitude (self.UNCERTAINTY_COL)
-        depuis la data principale.
-        """
-        df = self.main_data
-        mask = (
-            (df[self.CATEGORY_COL] == category) &
-            (df[self.SUBCATEGORY_COL] == subcategory) &
-            (df[self.SUBSUBCATEGORY_COL].fillna('') == subsubcategory) &
-            (df[self.NAME_COL].fillna('') == name)
-        )
-        if year:
-            mask &= (df[self.YEAR_COL].astype(str) == str(year))
-
-        filtered = df[mask]
-        if filtered.empty:
+        depuis la data principale (ou le millésime demandé).
+        """
+        row = self.find_factor(category, subcategory, subsubcategory, name, year, vintage)
+        if row is None:
             return None, None
 
-        emission_factor = filtered[self.TOTAL_COL].iloc[0]
-        # On récupère l'incertitude
-        uncertainty_series = filtered.get(self.UNCERTAINTY_COL, pd.Series([0.0]))
-        factor_uncert = float(uncertainty_series.iloc[0] or 0.0)
-        return float(emission_factor), factor_uncert
+        factor_uncert = float(row.get(self.UNCERTAINTY_COL, 0.0) or 0.0)
+        return float(row[self.TOTAL_COL]), factor_uncert
+
+    def _index_materials(self, df_mat):
+        """Matériau (nom sans espaces superflus) -> (co2_par_kg, incertitude) ; première ligne retenue."""
+        names = df_mat[self.MATERIAU_NAME_COL].astype(object).fillna('').astype(str).str.strip()
+        co2 = pd.to_numeric(df_mat[self.EQUIV_CO2_COL], errors='coerce').fillna(0.0)
+        uncertainties = (pd.to_numeric(df_mat[self.UNCERTAINTY_COL], errors='coerce').fillna(0.0)
+                         if self.UNCERTAINTY_COL in df_mat.columns else pd.Series(0.0, index=df_mat.index))
+        materials = {}
+        for name, co2_kg, uncert in zip(names, co2.tolist(), uncertainties.tolist()):
+            materials.setdefault(name, (co2_kg, uncert))
+        return materials
 
     def get_material_data(self, material_name):
         """
         Retourne (co2_par_kg, incert_material) pour un matériau.
         """
-        df_mat = self.data_materials
-        mask = df_mat[self.MATERIAU_NAME_COL].str.strip() == material_name.strip()
-        filtered = df_mat[mask]
-        if filtered.empty:
-            return None, None
+        return self._materials.get(str(material_name).strip(), (None, None))
 
-        co2_par_kg = float(filtered[self.EQUIV_CO2_COL].iloc[0] or 0.0)
-        incert_mat = float(filtered.get(self.UNCERTAINTY_COL, pd.Series([0.0])).iloc[0] or 0.0)
-        return co2_par_kg, incert_mat
\ No newline at end of file
+    def get_electricity_factor(self, electricity_type, vintage=None):
+        """(facteur, incertitude) d'un type d'électricité dans un millésime, ou (None, None)."""
+        return self.hierarchy(vintage).electricity_factor(electricity_type) or (None, None)
\ No newline at end of file
@@ -4,28 +4,35 @@
 # Ce fichier fait partie du projet LABeCO2.
 # Distribué sous licence : GNU GPL v3 (non commercial)
 # windows/data_mass_window.py
-import os
 import pandas as pd
 from PySide6.QtWidgets import (
     QMainWindow, QMessageBox, QVBoxLayout, QFormLayout,
-    QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QWidget, QComboBox, QHBoxLayout, QLabel
+    QLineEdit, QPushButton, QTableView, QAbstractItemView,
+    QWidget, QComboBox, QHBoxLayout, QLabel, QFileDialog
 )
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Qt, Signal
+
+from utils.consumables_store import ConsumablesStore
+from utils.consumables_import import read_catalogue, import_catalogue, REJECT_COL
+from utils.nacres_catalogue import get_nacres_catalogue, NacresListModel, make_nacres_completer
+from windows.dataframe_table_model import DataFrameTableModel, DataFrameFilterProxyModel
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 class DataMassWindow(QMainWindow):
-    data_added = Signal()
+    # Émis avec la liste des consommables ajoutés (dictionnaires, colonnes de la base)
+    data_added = Signal(object)
 
-    def __init__(self, parent=None, data_materials=None):
+    def __init__(self, parent=None, data_materials=None, store=None):
         super().__init__(parent)
 
         self.setWindowTitle("Gestion des consommables")
         self.setGeometry(100, 100, 600, 400)
-        self.nacres_hdf5_file = "./data_masse_eCO2/nacres_2022.h5"  # or adapt path
-        self._all_nacres = []  # Will store (code, description)
+        self.nacres_catalogue = get_nacres_catalogue()  # partagé, chargé une seule fois
 
-        # Nom du fichier HDF5
-        self.hdf5_file = "./data_masse_eCO2/data_eCO2_masse_consommable.hdf5"
+        # Base SQLite des consommables (partagée avec DataManager si fournie)
+        self.store = store if store is not None else ConsumablesStore()
 
         self.columns = [
             "Consommable",
@@ -37,25 +44,29 @@ class DataMassWindow(QMainWindow):
             "Source/Signature",
         ]
 
-        # Charger ou initialiser les données
-        self.data = self.charger_ou_initialiser_donnees()
+        # Charger ou initialiser les données (modèle Qt affiché par la vue)
+        self.model = DataFrameTableModel(self.charger_ou_initialiser_donnees(), columns=self.columns)
 
         # data_materials transmis par MainWindow
         # data_materials doit contenir 'Materiau' et 'eCO2_kg'
         self.data_materials = data_materials
 
         self.init_ui()
-        self.afficher_donnees()
+
+    @property
+    def data(self):
+        """DataFrame des consommables affichés (reconstruit à partir du modèle)."""
+        return self.model.dataframe()
 
     def charger_ou_initialiser_donnees(self):
-        if os.path.exists(self.hdf5_file):
-            try:
-                return pd.read_hdf(self.hdf5_file)
-            except Exception as e:
-                QMessageBox.warning(self, "Erreur", f"Impossible de charger le fichier HDF5 : {e}")
-                return pd.DataFrame(columns=self.columns)
-        else:
-            data = pd.DataFrame([{
+        try:
+            data = self.store.load()
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Impossible de charger la base des consommables : {e}")
+            return pd.DataFrame(columns=self.columns)
+
+        if data.empty:
+            objet = {
                 "Consommable": "Tube Falcon 15ml",
                 "Marque": "N/A",
                 "Référence": "N/A",
@@ -63,23 +74,19 @@ class DataMassWindow(QMainWindow):
                 "Masse unitaire (g)": 6.7,
                 "Matériau": "Polypropylène (PP)",
                 "Source/Signature": "Alexandre Souchaud"
-            }], columns=self.columns)
-
-            self.sauvegarder_donnees(data)
-            return data
-
-    def sauvegarder_donnees(self, df=None):
-        if df is None:
-            df = self.data
-
-        directory = os.path.dirname(self.hdf5_file)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+            }
+            self.sauvegarder_objet(objet)
+            data = self.ajouter_objet_df(data, objet)
+        return data
 
+    def sauvegarder_objet(self, objet):
+        """Ajoute un objet à la base (un seul INSERT, sans réécrire le fichier)."""
         try:
-            df.to_hdf(self.hdf5_file, key='data', mode='w')
+            self.store.append(objet)
         except Exception as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de sauvegarder le fichier HDF5 : {e}")
+            QMessageBox.warning(self, "Erreur", f"Impossible d'enregistrer l'objet : {e}")
+            return False
+        return True
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -130,18 +137,35 @@ class DataMassWindow(QMainWindow):
         self.add_button.clicked.connect(self.ajouter_objet_utilisateur)
         main_layout.addWidget(self.add_button)
 
+        self.import_button = QPushButton("Importer un catalogue fournisseur...")
+        self.import_button.clicked.connect(self.importer_catalogue)
+        main_layout.addWidget(self.import_button)
+
         self.display_button = QPushButton("Actualiser les données")
         self.display_button.clicked.connect(self.afficher_donnees)
         main_layout.addWidget(self.display_button)
 
-        # Tableau des données
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(self.columns))
-        self.table.setHorizontalHeaderLabels(self.columns)
+        # Filtre texte sur toutes les colonnes
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filtrer :"))
+        self.filter_input = QLineEdit()
+        filter_layout.addWidget(self.filter_input)
+        main_layout.addLayout(filter_layout)
+
+        # Tableau des données : vue sur le modèle (seules les cellules visibles sont formatées)
+        self.proxy_model = DataFrameFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
+        # Ordre d'ajout tant qu'on ne clique pas sur un en-tête
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setDefaultSectionSize(22)
 
         # Appliquer le style pour avoir le texte en noir
         self.table.setStyleSheet("""
-                                QTableWidget { 
+                                QTableView { 
                                     color: black; 
                                 }
                                 QHeaderView::section {
@@ -156,40 +180,44 @@ class DataMassWindow(QMainWindow):
         self.setCentralWidget(container)
 
         self.nacres_search.textChanged.connect(self.filter_nacres_list)
+        self.filter_input.textChanged.connect(self.proxy_model.setFilterFixedString)
         self.load_nacres_list()
 
     def load_nacres_list(self):
-        if not os.path.exists(self.nacres_hdf5_file):
-            print(f"[INFO] Fichier '{self.nacres_hdf5_file}' introuvable.")
-            return
-
         try:
-            df_nacres = pd.read_hdf(self.nacres_hdf5_file)
-            self._all_nacres = []
-            for _, row in df_nacres.iterrows():
-                code = str(row.iloc[0])
-                desc = str(row.iloc[1])
-                self._all_nacres.append((code, desc))
+            self.nacres_model = NacresListModel(self.nacres_catalogue, self)
+            self.nacres_combo.setModel(self.nacres_model)
+            self.nacres_search.setCompleter(make_nacres_completer(self, self.nacres_catalogue))
             self.filter_nacres_list()
         except Exception as e:
-            print(f"[ERROR] Impossible de charger la liste NACRES: {e}")
+            logger.error("Impossible de charger la liste NACRES : %s", e)
 
     def filter_nacres_list(self):
-        search_text = self.nacres_search.text().strip().lower()
-        self.nacres_combo.clear()
-        for (code, desc) in self._all_nacres:
-            if search_text in code.lower() or search_text in desc.lower():
-                display_text = f"{code} - {desc}"
-                self.nacres_combo.addItem(display_text, code)
+        # Recherche dans les index du catalogue (préfixe de code, début de mots du libellé)
+        self.nacres_model.set_filter(self.nacres_search.text())
+        self.nacres_combo.setCurrentIndex(0 if self.nacres_model.rowCount() else -1)
 
     def verifier_existence_objet(self, nom, reference, code_nacres):
-        if not self.data[self.data["Consommable"] == nom].empty:
-            return f"Un objet avec le nom '{nom}' existe déjà."
+        # Recherche indexée dans la base (pas de parcours du DataFrame)
+        return self.store.find_duplicate(nom, reference, code_nacres)
 
-        if not self.data[(self.data["Référence"] == reference) & (self.data["Code NACRES"] == code_nacres)].empty:
-            return f"La combinaison Référence='{reference}' et Code NACRES='{code_nacres}' existe déjà."
-
-        return None
+    def confirmer_doublons_proches(self, nom, reference, code_nacres):
+        """
+        Signale les consommables qui ne diffèrent que par les accents, la casse ou les espaces.
+        Retourne True si l'utilisateur confirme l'ajout (ou s'il n'y a aucun doublon proche).
+        """
+        proches = self.store.find_near_duplicates(nom, reference, code_nacres)
+        if not proches:
+            return True
+        lignes = "\n".join(
+            f"- {p['Consommable']} (Réf. {p['Référence'] or 'N/A'}, {p['Code NACRES']})" for p in proches[:10]
+        )
+        reponse = QMessageBox.question(
+            self, "Doublon possible",
+            f"Des consommables très proches existent déjà :\n{lignes}\n\nAjouter quand même '{nom}' ?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        return reponse == QMessageBox.Yes
 
     def ajouter_objet_utilisateur(self):
         nom = self.nom_input.text().strip()
@@ -214,6 +242,8 @@ class DataMassWindow(QMainWindow):
         if erreur:
             QMessageBox.warning(self, "Erreur", erreur)
             return
+        if not self.confirmer_doublons_proches(nom, reference, nacres):
+            return
 
         nouvel_objet = {
             "Consommable": nom,
@@ -224,10 +254,11 @@ class DataMassWindow(QMainWindow):
             "Matériau": materiau,
             "Source/Signature": source
         }
-        self.data = self.ajouter_objet_df(self.data, nouvel_objet)
-
         # Sauvegarde des données
-        self.sauvegarder_donnees()
+        if not self.sauvegarder_objet(nouvel_objet):
+            return
+        # Insertion incrémentale dans le modèle (la vue n'est pas reconstruite)
+        self.model.append_row(nouvel_objet)
 
         # Efface les champs
         self.nom_input.clear()
@@ -239,7 +270,51 @@ class DataMassWindow(QMainWindow):
         self.nacres_combo.setCurrentIndex(-1)
 
         QMessageBox.information(self, "Succès", f"L'objet '{nom}' a été ajouté avec succès.")
-        self.data_added.emit()
+        self.data_added.emit([nouvel_objet])
+
+    def importer_catalogue(self):
+        """
+        Import en lot d'un catalogue fournisseur (CSV, Excel ou HDF5) :
+        validation des masses et matériaux, filtrage des doublons, écriture en une transaction,
+        puis rapport des lignes rejetées.
+        """
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Importer un catalogue", "", "Catalogues (*.csv *.xlsx *.xls *.h5 *.hdf5)"
+        )
+        if not path:
+            return
+        if self.data_materials is None:
+            QMessageBox.warning(self, "Erreur", "Les données matériaux ne sont pas chargées.")
+            return
+
+        nacres_codes = self.nacres_catalogue.codes() or None
+        try:
+            catalogue = read_catalogue(path)
+            importes, rejets = import_catalogue(self.store, catalogue, self.data_materials, nacres_codes=nacres_codes)
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Impossible d'importer le catalogue : {e}")
+            return
+
+        if not importes.empty:
+            records = importes.astype(object).where(importes.notna(), None).to_dict("records")
+            self.model.append_rows(records)
+            self.data_added.emit(records)
+
+        message = f"{len(importes)} consommable(s) importé(s), {len(rejets)} ligne(s) rejetée(s)."
+        if rejets.empty:
+            QMessageBox.information(self, "Import terminé", message)
+            return
+
+        motifs = "\n".join(f"- {motif} : {n}" for motif, n in rejets[REJECT_COL].value_counts().items())
+        reponse = QMessageBox.question(
+            self, "Import terminé",
+            f"{message}\n\nMotifs de rejet :\n{motifs}\n\nEnregistrer le rapport des lignes rejetées ?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if reponse == QMessageBox.Yes:
+            report_path, _ = QFileDialog.getSaveFileName(self, "Rapport des rejets", "rejets_import.csv", "CSV (*.csv)")
+            if report_path:
+                rejets.to_csv(report_path, sep=";", index=False)
 
     def ajouter_objet_df(self, df, objet):
         nouvel_objet = pd.DataFrame([objet])
@@ -251,11 +326,8 @@ class DataMassWindow(QMainWindow):
             return pd.concat([df, nouvel_objet], ignore_index=True)
 
     def afficher_donnees(self):
-        self.table.setRowCount(len(self.data))
-        for row_idx, row_data in self.data.iterrows():
-            for col_idx, col_name in enumerate(self.columns):
-                item = QTableWidgetItem(str(row_data[col_name]))
-                self.table.setItem(row_idx, col_idx, item)
+        """Relit la base et recharge le modèle (bouton « Actualiser »)."""
+        self.model.set_dataframe(self.charger_ou_initialiser_donnees())
 
     def calculer_eCO2_via_masse(self):
         """
@@ -267,13 +339,13 @@ class DataMassWindow(QMainWindow):
         Ici, comme exemple, on va calculer pour le dernier objet du tableau.
         """
 
-        if self.data.empty:
+        if self.model.rowCount() == 0:
             QMessageBox.warning(self, "Erreur", "Aucun consommable disponible.")
             return
 
         # Récupérer le dernier objet ou la sélection
         # Ici, on prend le dernier objet pour l'exemple
-        last_obj = self.data.iloc[-1]
+        last_obj = self.model.row(self.model.rowCount() - 1)
 
         try:
             quantite_str = self.qty_input.text().strip()
@@ -0,0 +1,196 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# windows/dataframe_table_model.py
+
+import math
+import numpy as np
+import pandas as pd
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    Modèle Qt (QAbstractTableModel) au-dessus d'un DataFrame, pour un QTableView.
+
+    - Les données sont gardées colonne par colonne : aucune cellule n'est créée à l'avance,
+      le texte n'est formaté qu'au moment où la vue affiche la cellule ;
+    - append_row() ajoute une ligne en O(1) et prévient la vue (beginInsertRows),
+      sans reconstruire le tableau ;
+    - Qt.UserRole renvoie la valeur brute (tri numérique des masses, par exemple) ;
+    - le tri (sort) est fait en une passe pandas, sans appeler data() pour chaque comparaison.
+    """
+
+    def __init__(self, df=None, columns=None, parent=None):
+        super().__init__(parent)
+        self._column_names = list(columns) if columns is not None else (
+            list(df.columns) if df is not None else []
+        )
+        self._columns = {}
+        self._numeric = {}
+        self._row_count = 0
+        self._search_text = None  # texte de recherche par ligne, construit au premier filtrage
+        self._load(df)
+
+    def _load(self, df):
+        if df is None:
+            df = pd.DataFrame(columns=self._column_names)
+        df = df.reindex(columns=self._column_names)
+        self._columns = {col: df[col].tolist() for col in self._column_names}
+        self._numeric = {col: pd.api.types.is_numeric_dtype(df[col]) for col in self._column_names}
+        self._row_count = len(df)
+        self._search_text = None
+
+    # ------------------------------------------------------------------
+    # API QAbstractTableModel
+    # ------------------------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._column_names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = self._column_names[index.column()]
+        value = self._columns[column][index.row()]
+        if role == Qt.DisplayRole:
+            return self.format_value(value)
+        if role == Qt.UserRole:
+            # Valeur brute pour le tri : les valeurs manquantes passent en premier
+            if self._is_missing(value):
+                return float("-inf") if self._numeric[column] else ""
+            return value if self._numeric[column] else str(value)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._column_names[section]
+        return str(section + 1)
+
+    # ------------------------------------------------------------------
+    # Données
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _is_missing(value):
+        return value is None or (isinstance(value, float) and math.isnan(value))
+
+    @classmethod
+    def format_value(cls, value):
+        """Texte affiché pour une cellule (vide pour une valeur manquante)."""
+        if cls._is_missing(value):
+            return ""
+        return str(value)
+
+    def set_dataframe(self, df):
+        """Remplace toutes les données (ex. bouton « Actualiser »)."""
+        self.beginResetModel()
+        self._load(df)
+        self.endResetModel()
+
+    def append_row(self, row):
+        """
+        Ajoute une ligne à la fin du modèle.
+        :param row: dictionnaire {nom de colonne: valeur} (colonnes absentes = vides)
+        """
+        self.append_rows([row])
+
+    def append_rows(self, rows):
+        """Ajoute plusieurs lignes en une seule notification à la vue."""
+        if not rows:
+            return
+        first = self._row_count
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for row in rows:
+            for col in self._column_names:
+                self._columns[col].append(row.get(col))
+        self._row_count += len(rows)
+        if self._search_text is not None:
+            self._search_text.extend(self._row_search_text(first + i) for i in range(len(rows)))
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Trie les lignes sur une colonne (valeurs manquantes en premier)."""
+        if column < 0 or column >= len(self._column_names) or self._row_count == 0:
+            return
+        name = self._column_names[column]
+        keys = pd.Series(self._columns[name])
+        if not self._numeric[name]:
+            keys = keys.where(keys.notna(), "").astype(str).str.lower()
+        perm = keys.sort_values(
+            ascending=(order == Qt.AscendingOrder), kind="stable", na_position="first"
+        ).index.to_numpy()
+
+        self.layoutAboutToBeChanged.emit()
+        for col in self._column_names:
+            values = self._columns[col]
+            self._columns[col] = [values[i] for i in perm]
+        if self._search_text is not None:
+            self._search_text = [self._search_text[i] for i in perm]
+
+        # Les index persistants (sélection, ligne courante) suivent leurs lignes
+        new_rows = np.empty_like(perm)
+        new_rows[perm] = np.arange(len(perm))
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(
+            old_indexes,
+            [self.index(int(new_rows[idx.row()]), idx.column()) for idx in old_indexes]
+        )
+        self.layoutChanged.emit()
+
+    def _row_search_text(self, row_idx):
+        return "\t".join(self.format_value(values[row_idx]) for values in self._columns.values()).lower()
+
+    def search_text(self, row_idx):
+        """Texte (en minuscules) de toutes les cellules d'une ligne, pour le filtrage."""
+        if self._search_text is None:
+            self._search_text = [self._row_search_text(i) for i in range(self._row_count)]
+        return self._search_text[row_idx]
+
+    def row(self, row_idx):
+        """Retourne une ligne sous forme de dictionnaire."""
+        return {col: values[row_idx] for col, values in self._columns.items()}
+
+    def dataframe(self):
+        """Reconstruit un DataFrame à partir du modèle."""
+        return pd.DataFrame(self._columns, columns=self._column_names)
+
+
+class DataFrameFilterProxyModel(QSortFilterProxyModel):
+    """
+    Proxy de tri et de filtre pour DataFrameTableModel :
+    - le filtre texte (insensible à la casse) porte sur toutes les colonnes,
+      via le texte de recherche précalculé par le modèle ;
+    - le tri est délégué au modèle source (DataFrameTableModel.sort).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._filter_text = ""
+        self.setFilterKeyColumn(-1)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.setSortRole(Qt.UserRole)
+
+    def setFilterFixedString(self, text):
+        self._filter_text = (text or "").strip().lower()
+        super().setFilterFixedString(text)  # relance le filtrage
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._filter_text:
+            return True
+        source = self.sourceModel()
+        if isinstance(source, DataFrameTableModel):
+            return self._filter_text in source.search_text(source_row)
+        return super().filterAcceptsRow(source_row, source_parent)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        source = self.sourceModel()
+        if isinstance(source, DataFrameTableModel):
+            source.sort(column, order)
+        else:
+            super().sort(column, order)
@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# windows/diagnostics_dialog.py
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import (
+    QCheckBox, QDialog, QFileDialog, QHBoxLayout, QHeaderView, QLabel, QMessageBox,
+    QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout
+)
+
+from utils.instrumentation import RING_SIZE, instrumentation
+from utils.log import recent_logs
+from utils.memory_usage import format_memory, memory_report
+
+# Colonnes affichées : (clé des statistiques, titre)
+COLUMNS = [
+    ("name", "Gestionnaire"),
+    ("count", "Appels"),
+    ("total_ms", "Total (ms)"),
+    ("mean_ms", "Moyenne (ms)"),
+    ("p50_ms", "p50 (ms)"),
+    ("p95_ms", "p95 (ms)"),
+    ("p99_ms", "p99 (ms)"),
+    ("max_ms", "Max (ms)"),
+]
+
+# Rafraîchissement du tableau pendant que la fenêtre est ouverte (ms)
+REFRESH_INTERVAL_MS = 1000
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    Fenêtre de diagnostic des performances (Ctrl+Maj+D dans la fenêtre principale) :
+    durées des gestionnaires instrumentés, mémoire (processus et tables chargées),
+    activation des mesures et export JSON.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostic des performances")
+        self.resize(760, 420)
+
+        layout = QVBoxLayout(self)
+
+        explanation_label = QLabel(
+            "Durées des actions de l'interface et des calculs depuis l'activation des mesures.\n"
+            f"Les percentiles portent sur les {RING_SIZE} derniers appels de chaque gestionnaire.\n"
+            "Exportez le rapport JSON (avec les derniers messages du journal) pour le joindre à un signalement de lenteur."
+        )
+        explanation_label.setWordWrap(True)
+        layout.addWidget(explanation_label)
+
+        self.enabled_checkbox = QCheckBox("Mesures actives")
+        self.enabled_checkbox.setChecked(instrumentation.enabled)
+        self.enabled_checkbox.toggled.connect(instrumentation.enable)
+        layout.addWidget(self.enabled_checkbox)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for _, title in COLUMNS])
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.memory_label = QLabel()
+        self.memory_label.setWordWrap(True)
+        layout.addWidget(self.memory_label)
+
+        buttons_layout = QHBoxLayout()
+        self.reset_button = QPushButton("Réinitialiser")
+        self.reset_button.clicked.connect(self.reset)
+        self.export_button = QPushButton("Exporter (JSON)")
+        self.export_button.clicked.connect(self.export_report)
+        close_button = QPushButton("Fermer")
+        close_button.clicked.connect(self.close)
+        buttons_layout.addWidget(self.reset_button)
+        buttons_layout.addWidget(self.export_button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(close_button)
+        layout.addLayout(buttons_layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def refresh(self):
+        """Recharge le tableau depuis le registre d'instrumentation."""
+        rows = instrumentation.stats()
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, (key, _) in enumerate(COLUMNS):
+                value = row[key]
+                text = f"{value:.3f}" if isinstance(value, float) else str(value)
+                self.table.setItem(r, c, QTableWidgetItem(text))
+        self.memory_label.setText(format_memory(self.memory_report()))
+
+    def memory_report(self):
+        """Mémoire du processus et des tables du DataManager de la fenêtre principale."""
+        return memory_report(getattr(self.parent(), "data_manager", None))
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def export_report(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exporter le diagnostic", "diagnostic_performances.json", "JSON (*.json)"
+        )
+        if not path:
+            return
+        try:
+            # Derniers messages du journal et mémoire joints au rapport
+            instrumentation.export(path, extra={"logs": recent_logs(), "memory": self.memory_report()})
+        except OSError as e:
+            QMessageBox.warning(self, "Erreur", f"Impossible d'écrire le rapport : {e}")
+            return
+        QMessageBox.information(self, "Export", f"Rapport écrit : {path}")
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
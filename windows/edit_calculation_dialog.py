@@ -13,19 +13,26 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 
+from utils.factor_vintages import FactorHierarchy
+from utils.log import get_logger
+
+logger = get_logger(__name__)
+
 class EditCalculationDialog(QDialog):
     """
     Boîte de dialogue pour modifier un calcul existant.
     Cette classe reproduit la logique de sélection (catégorie, sous-catégorie, etc.)
     similaire à celle du MainWindow, mais pour l'édition.
 
-    data (dict) est un dictionnaire contenant les infos du calcul à modifier.
+    data (HistoryRecord ou dict) contient les infos du calcul à modifier.
     main_data : DataFrame principal (self.data du main_window) 
     data_masse : DataFrame pour les consommables (self.data_masse du main_window)
     data_materials : DataFrame pour les matériaux (self.data_materials du main_window)
+    hierarchy : index de la hiérarchie de main_data (FactorHierarchy, construit si absent)
     """
 
-    def __init__(self, parent=None, data=None, main_data=None, data_masse=None, data_materials=None):
+    def __init__(self, parent=None, data=None, main_data=None, data_masse=None, data_materials=None,
+                 hierarchy=None):
         super().__init__(parent)
         self.setWindowTitle("Modifier le calcul")
         
@@ -34,6 +41,7 @@ class EditCalculationDialog(QDialog):
         self.main_data = main_data
         self.data_masse = data_masse
         self.data_materials = data_materials
+        self.hierarchy = hierarchy if hierarchy is not None else FactorHierarchy(main_data)
         
         # Variables internes
         self.current_unit = None
@@ -55,7 +63,7 @@ class EditCalculationDialog(QDialog):
         self.category_combo = QComboBox()
 
         # Remplir la combo avec vos catégories
-        categories = self.main_data['category'].dropna().unique().tolist()
+        categories = self.hierarchy.categories()
         # Retrait de 'Électricité' si nécessaire
         categories = [cat for cat in categories if cat != 'Électricité']
         categories.append('Machine')
@@ -126,8 +134,7 @@ class EditCalculationDialog(QDialog):
         self.electricity_label = QLabel("Type d'électricité:")
         self.electricity_combo = QComboBox()
 
-        electricity_types = self.main_data[self.main_data['category'] == 'Électricité']['name'].dropna().unique()
-        self.electricity_combo.addItems(sorted(electricity_types))
+        self.electricity_combo.addItems(self.hierarchy.electricity_types())
 
         self.machine_form_layout = QFormLayout()
         self.machine_form_layout.addRow(self.machine_name_label, self.machine_name_field)
@@ -177,7 +184,7 @@ class EditCalculationDialog(QDialog):
             self.machine_name_field.setText(data.get('subcategory', ''))
             self.power_field.setText(str(data.get('power', '')))
             self.usage_time_field.setText(str(data.get('usage_time', '')))
-            self.days_machine_field.setText(str(data.get('days_machine', '')))
+            self.days_machine_field.setText(str(data.get('days', '')))
 
             electricity_type = data.get('electricity_type', '')
             if electricity_type:
@@ -303,7 +310,7 @@ class EditCalculationDialog(QDialog):
                     'unit': 'kWh',
                     'power': power,
                     'usage_time': usage_time,
-                    'days_machine': days_machine,
+                    'days': days_machine,
                     'electricity_type': electricity_type,
                     'code_nacres': prev_code_nacres,
                     'consommable': prev_consommable,
@@ -402,11 +409,11 @@ class EditCalculationDialog(QDialog):
                                             'Veuillez entrer une quantité positive.')
                         return
 
-            print("Debug - Nouveau self.modified_data :", self.modified_data)
+            logger.debug("Calcul modifié : %s", self.modified_data)
             self.accept()
 
         except ValueError as ve:
-            print("Erreur de conversion détectée :", ve)
+            logger.warning("Erreur de conversion : %s", ve)
             QMessageBox.warning(self, 'Erreur', f"Erreur de conversion numérique : {ve}")
             return
 
@@ -430,9 +437,8 @@ class EditCalculationDialog(QDialog):
             self.machine_widget.setVisible(False)
             
             # Charger les sous-catégories
-            subcategories = self.main_data[self.main_data['category'] == category]['subcategory'].dropna().unique()
             self.subcategory_combo.clear()
-            self.subcategory_combo.addItems(sorted(subcategories.astype(str)))
+            self.subcategory_combo.addItems(self.hierarchy.subcategories(category))
 
             self.update_subsubcategory_names()
 
@@ -450,10 +456,7 @@ class EditCalculationDialog(QDialog):
         category = self.category_combo.currentText()
         subcategory = self.subcategory_combo.currentText()
         search_text = self.search_field.text().lower()
-        mask = (self.main_data['category'] == category) & (self.main_data['subcategory'] == subcategory)
-        filtered_data = self.main_data[mask]
-        subsub_names = (filtered_data['subsubcategory'].fillna('') + ' - ' + filtered_data['name'].fillna('')).str.strip(' - ')
-        subsub_names_unique = subsub_names.unique()
+        subsub_names_unique = self.hierarchy.labels(category, subcategory) if subcategory else []
 
         if search_text:
             subsub_names_filtered = [s for s in subsub_names_unique if search_text in s.lower()]
@@ -470,15 +473,9 @@ class EditCalculationDialog(QDialog):
         subsub_name = self.subsub_name_combo.currentText()
         subsubcategory, name = self.split_subsub_name(subsub_name)
 
-        mask = (
-            (self.main_data['category'] == category) &
-            (self.main_data['subcategory'] == subcategory) &
-            (self.main_data['subsubcategory'].fillna('') == subsubcategory) &
-            (self.main_data['name'].fillna('') == name)
-        )
-        years = self.main_data[mask]['year'].dropna().astype(str).unique()
+        years = self.hierarchy.years(category, subcategory, subsubcategory, name)
         self.year_combo.clear()
-        self.year_combo.addItems(sorted(years))
+        self.year_combo.addItems(years)
         self.update_unit()
 
     def update_unit(self):
@@ -488,17 +485,9 @@ class EditCalculationDialog(QDialog):
         year = self.year_combo.currentText()
         subsubcategory, name = self.split_subsub_name(subsub_name)
 
-        mask = (
-            (self.main_data['category'] == category) &
-            (self.main_data['subcategory'] == subcategory) &
-            (self.main_data['subsubcategory'].fillna('') == subsubcategory) &
-            (self.main_data['name'].fillna('') == name) &
-            (self.main_data['year'].astype(str) == year)
-        )
-
-        filtered_data = self.main_data[mask]
-        if not filtered_data.empty:
-            unit = filtered_data['unit'].values[0] or 'valeur'
+        unit = self.hierarchy.unit(category, subcategory, subsubcategory, name, year) if year else None
+        if unit is not None:
+            unit = unit or 'valeur'
             self.current_unit = unit
             self.input_label.setText(f'Entrez la valeur en {unit}:')
             self.input_field.setEnabled(True)
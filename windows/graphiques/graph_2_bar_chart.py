@@ -15,6 +15,7 @@ from PySide6.QtCore import Qt  # Constantes Qt, comme Qt.WA_DeleteOnClose
 from matplotlib.figure import Figure  # Représente une figure Matplotlib
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas  # Intègre une figure Matplotlib dans une application Qt
 from utils.color_utils import CATEGORY_COLORS, CATEGORY_ORDER, generate_color_shades  # Utilitaires personnalisés pour gérer les couleurs et catégories
+from utils.instrumentation import instrumented  # Chronométrage des rafraîchissements (diagnostic)
 
 
 class BarChartWindow(QDialog):
@@ -85,6 +86,7 @@ class BarChartWindow(QDialog):
         layout.addWidget(self.canvas)  # Ajout du canvas
         self.setLayout(layout)
 
+    @instrumented()
     def refresh_data(self):
         """
         Met à jour les données nécessaires au graphique.
@@ -95,14 +97,11 @@ class BarChartWindow(QDialog):
         errors = []  # Liste des erreurs associées
 
         # Parcourt l'historique des calculs dans la fenêtre principale
-        for i in range(self.main_window.history_list.count()):
-            item = self.main_window.history_list.item(i)
-            data = item.data(Qt.UserRole)  # Récupère les données de l'élément
-            if data:
-                categories.append(data.get('category', ''))  # Ajoute la catégorie
-                subcategories.append(data.get('subcategory', ''))  # Ajoute la sous-catégorie
-                emissions.append(data.get('emissions_price', 0))  # Ajoute les émissions
-                errors.append(data.get('emissions_price_error', 0))  # Ajoute les erreurs
+        for data in self.main_window.history_records():
+            categories.append(data.category or '')  # Ajoute la catégorie
+            subcategories.append(data.subcategory or '')  # Ajoute la sous-catégorie
+            emissions.append(data.emissions_price)  # Ajoute les émissions
+            errors.append(data.emissions_price_error)  # Ajoute les erreurs
 
         # Agrège les émissions par catégorie et sous-catégorie
         subcategory_emissions = {}
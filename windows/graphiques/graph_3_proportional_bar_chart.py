@@ -15,6 +15,7 @@ from PySide6.QtCore import Qt
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from utils.color_utils import CATEGORY_COLORS, CATEGORY_ORDER, generate_color_shades
+from utils.instrumentation import instrumented
 
 
 class ProportionalBarChartWindow(QDialog):
@@ -80,6 +81,7 @@ class ProportionalBarChartWindow(QDialog):
         layout.addWidget(self.canvas)
         self.setLayout(layout)
 
+    @instrumented()
     def refresh_data(self):
         """
         Met à jour les données à partir de l'historique dans la fenêtre principale.
@@ -90,18 +92,11 @@ class ProportionalBarChartWindow(QDialog):
         errors = []  # Liste des erreurs associées
 
         # Récupération des informations depuis l'historique
-        for i in range(self.main_window.history_list.count()):
-            item = self.main_window.history_list.item(i)
-            data = item.data(Qt.UserRole)
-            if data:
-                category = data.get('category', '')
-                subcategory = data.get('subcategory', '')
-                emission = data.get('emissions_price', 0)
-                error = data.get('emissions_price_error', 0)
-                categories.append(category)
-                subcategories.append(subcategory)
-                emissions.append(emission)
-                errors.append(error)
+        for data in self.main_window.history_records():
+            categories.append(data.category or '')
+            subcategories.append(data.subcategory or '')
+            emissions.append(data.emissions_price)
+            errors.append(data.emissions_price_error)
 
         # Agrégation des émissions par catégorie et sous-catégorie
         subcategory_emissions = {}
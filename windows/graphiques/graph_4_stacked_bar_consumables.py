@@ -18,6 +18,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QAction
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+from utils.instrumentation import instrumented
 
 class StackedBarConsumablesWindow(QDialog):
     """
@@ -102,6 +103,7 @@ class StackedBarConsumablesWindow(QDialog):
         layout.addWidget(self.canvas)  # Ajout du canvas
         self.setLayout(layout)
 
+    @instrumented()
     def refresh_data(self):
         """
         Récupère et agrège les données depuis la fenêtre principale (MainWindow).
@@ -115,22 +117,17 @@ class StackedBarConsumablesWindow(QDialog):
         self.nacres_data = {}
 
         # Parcourt l'historique pour récupérer les consommables
-        for i in range(parent.history_list.count()):
-            item = parent.history_list.item(i)
-            data = item.data(Qt.UserRole)
-            if not data:
-                continue
-
-            category = data.get('category', '')
-            subcat = data.get('subcategory', '')
-            quantity = data.get('quantity', 0)
+        for data in parent.history_records():
+            category = data.category or ''
+            subcat = data.subcategory or ''
+            quantity = data.quantity or 0
             code_nacres = data.get('code_nacres', 'NA')
 
             # Émissions + erreurs
-            emissions_price = float(data.get('emissions_price', 0.0) or 0.0)
-            emissions_price_error = float(data.get('emissions_price_error', 0.0) or 0.0)
-            emission_mass = float(data.get('emission_mass', 0.0) or 0.0)
-            emission_mass_error = float(data.get('emission_mass_error', 0.0) or 0.0)
+            emissions_price = data.emissions_price
+            emissions_price_error = data.emissions_price_error
+            emission_mass = data.emission_mass
+            emission_mass_error = data.emission_mass_error
 
             # Critère : Achats -> Consommables, quantity>0, code_nacres != 'NA'
             if (category == 'Achats'
@@ -19,6 +19,7 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 
 # Exemple : si vous avez ce module de couleurs
 from utils.color_utils import generate_color_shades
+from utils.instrumentation import instrumented
 
 
 class NacresBarChartWindow(QDialog):
@@ -68,9 +69,10 @@ class NacresBarChartWindow(QDialog):
         # Écoute les modifications de données
         self.main_window.data_changed.connect(self.refresh_data)
 
+    @instrumented()
     def refresh_data(self):
         """
-        Récupère l'historique depuis self.main_window.history_list,
+        Récupère l'historique depuis self.main_window.history_records(),
         agrège les données par code NACRES, et dessine le graphique.
         """
         self.figure.clear()
@@ -78,17 +80,12 @@ class NacresBarChartWindow(QDialog):
         # Récupération des données : 'emissions_price' et erreurs associées
         nacres_dict = {}
         nacres_errors = {}
-        for i in range(self.main_window.history_list.count()):
-            item = self.main_window.history_list.item(i)
-            data = item.data(Qt.UserRole)
-            if not data:
-                continue
-
+        for data in self.main_window.history_records():
             code_nacres = data.get('code_nacres', 'NA')
-            category = data.get('category', '')
-            quantity = data.get('quantity', 0)
-            emissions_price = data.get('emissions_price', 0.0)
-            emissions_error = data.get('emissions_price_error', 0.0)
+            category = data.category or ''
+            quantity = data.quantity or 0
+            emissions_price = data.emissions_price
+            emissions_error = data.emissions_price_error
 
             # On filtre les données valides
             if code_nacres != 'NA' and category == 'Achats' and quantity > 0:
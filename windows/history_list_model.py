@@ -0,0 +1,207 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+# Copyright (c) 2024, LABeCO2, Alexandre Souchaud. Tous droits réservés.
+#
+# Ce fichier fait partie du projet LABeCO2.
+# Distribué sous licence : GNU GPL v3 (non commercial)
+# windows/history_list_model.py
+
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QTimer
+from PySide6.QtWidgets import QStyledItemDelegate
+
+# Décimales des émissions et des masses affichées par défaut
+DEFAULT_DECIMALS = 4
+# Marge ajoutée à la largeur du texte le plus long (icône de sélection, bords)
+TEXT_MARGIN = 12
+
+
+def format_history_record(record, decimals=DEFAULT_DECIMALS):
+    """
+    Texte affiché pour une ligne de l'historique (HistoryRecord).
+
+    :param decimals: décimales des émissions, incertitudes et masses
+    """
+    category = record.get('category', '')
+    subcategory = record.get('subcategory', '')
+    name = record.get('name', '')
+    value = record.get('value', 0.0)
+    unit = record.get('unit', '')
+    ep = record.emissions_price
+    ep_err = record.emissions_price_error
+    em = record.emission_mass
+    em_err = record.emission_mass_error
+    tm = record.total_mass
+    code_nacres = record.get('code_nacres', 'NA')
+    consommable = record.get('consommable', 'NA')
+
+    def fmt_err(val, err):
+        if err is not None and err > 0:
+            return f"{val:.{decimals}f} ± {err:.{decimals}f}"
+        else:
+            return f"{val:.{decimals}f}"
+
+    if category == 'Machine':
+        return (
+            f"Machine - {subcategory} - {record.get('electricity_type')} - {value:.2f} kWh : "
+            f"{fmt_err(ep, ep_err)} kg CO₂e"
+        )
+    if category == 'Véhicules':
+        days = record.get('days', 1)
+        try:
+            km_per_day = float(value)
+            total_km = km_per_day * days
+        except (ValueError, ZeroDivisionError):
+            km_per_day = 0
+            total_km = km_per_day * days
+        return (
+            f"{category} - {subcategory} - {code_nacres} - {name} : "
+            f"{km_per_day:.2f} km/jour sur {days} jours, total {total_km} {unit} : "
+            f"{fmt_err(ep, ep_err)} kg CO₂e"
+        )
+    # Achats / Autres
+    item_text = (
+        f"{category} - {subcategory[:12]} - {code_nacres} - {name} - "
+        f"Dépense: {value} {unit} : {fmt_err(ep, ep_err)} kg CO₂e"
+    )
+    if consommable != 'NA':
+        item_text += f" [Consommable: {consommable}]"
+    if em != 0.0 and tm != 0.0:
+        item_text += f" - Masse {tm:.{decimals}f} kg : {fmt_err(em, em_err)} kg CO₂e"
+    return item_text
+
+
+class HistoryListModel(QAbstractListModel):
+    """
+    Modèle de l'historique des calculs (une HistoryRecord par ligne), pour un QListView.
+
+    - Le texte d'une ligne n'est formaté que lorsque la vue l'affiche (lignes visibles),
+      puis gardé en cache jusqu'à la modification de la ligne : importer 100 000 lignes
+      ne formate aucun texte ;
+    - le format (nombre de décimales) se change sans reconstruire les lignes ;
+    - Qt.UserRole renvoie la HistoryRecord de la ligne.
+    """
+
+    def __init__(self, parent=None, decimals=DEFAULT_DECIMALS):
+        super().__init__(parent)
+        self._records = []
+        self._texts = []  # texte affiché par ligne (None : pas encore formaté)
+        self.decimals = decimals
+
+    # ------------------------------------------------------------------
+    # API QAbstractListModel
+    # ------------------------------------------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.text(row)
+        if role == Qt.UserRole:
+            return self._records[row]
+        return None
+
+    # ------------------------------------------------------------------
+    # Données
+    # ------------------------------------------------------------------
+    def text(self, row):
+        """Texte affiché de la ligne, formaté au premier affichage."""
+        text = self._texts[row]
+        if text is None:
+            text = self._texts[row] = format_history_record(self._records[row], self.decimals)
+        return text
+
+    def record(self, row):
+        return self._records[row]
+
+    def records(self):
+        """Lignes (HistoryRecord), dans l'ordre de la liste."""
+        return list(self._records)
+
+    def append_records(self, records):
+        """Ajoute des lignes à la fin, en une seule notification à la vue."""
+        if not records:
+            return
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)
+        self._records.extend(records)
+        self._texts.extend([None] * len(records))
+        self.endInsertRows()
+
+    def set_record(self, row, record):
+        """Remplace une ligne ; son texte sera reformaté au prochain affichage."""
+        self._records[row] = record
+        self._texts[row] = None
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.ToolTipRole, Qt.UserRole])
+
+    def remove_rows(self, rows):
+        """
+        Supprime des lignes (numéros quelconques) : une notification à la vue par suite
+        de lignes contiguës, de la dernière suite à la première.
+        """
+        runs = []
+        for row in sorted(set(rows)):
+            if runs and row == runs[-1][1] + 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._records[first:last + 1]
+            del self._texts[first:last + 1]
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._records = []
+        self._texts = []
+        self.endResetModel()
+
+    def set_decimals(self, decimals):
+        """Change le nombre de décimales affichées : textes reformatés à l'affichage, lignes visibles seulement."""
+        if decimals == self.decimals:
+            return
+        self.decimals = decimals
+        self._texts = [None] * len(self._records)
+        if self._records:
+            self.dataChanged.emit(self.index(0), self.index(len(self._records) - 1),
+                                  [Qt.DisplayRole, Qt.ToolTipRole])
+
+
+class HistoryItemDelegate(QStyledItemDelegate):
+    """
+    Délégué de la liste de l'historique, utilisé avec setUniformItemSizes(True) : la vue
+    ne demande la taille que d'une ligne, sans formater les autres. La largeur annoncée est
+    celle du plus long texte affiché jusqu'ici ; quand elle augmente, la mise en page est
+    refaite (barre de défilement horizontale à la bonne taille).
+    """
+
+    def __init__(self, view):
+        super().__init__(view)
+        self._view = view
+        self._max_width = 0
+        self._relayout_pending = False
+
+    def paint(self, painter, option, index):
+        width = option.fontMetrics.horizontalAdvance(index.data(Qt.DisplayRole) or "") + TEXT_MARGIN
+        if width > self._max_width:
+            self._max_width = width
+            if not self._relayout_pending:
+                self._relayout_pending = True
+                QTimer.singleShot(0, self._relayout)
+        super().paint(painter, option, index)
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        return QSize(max(size.width(), self._max_width), size.height())
+
+    def reset_width(self):
+        """Oublie la largeur mesurée (historique vidé, format changé)."""
+        self._max_width = 0
+        self._relayout()
+
+    def _relayout(self):
+        self._relayout_pending = False
+        self._view.doItemsLayout()
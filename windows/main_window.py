@@ -14,32 +14,51 @@
 
 import sys
 import os
+import importlib
 import pandas as pd
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QLabel, QPushButton, QComboBox, QLineEdit,
-    QListWidget, QMessageBox, QVBoxLayout, QHBoxLayout, QWidget,
-    QFormLayout,  QDialog, QScrollArea, QSizePolicy, QAbstractItemView,
+    QListView, QMessageBox, QVBoxLayout, QHBoxLayout, QWidget,
+    QFormLayout,  QDialog, QScrollArea, QSizePolicy, QAbstractItemView, QInputDialog,
     # QListWidgetItem, QSpacerItem, QDialogButtonBox, QFileDialog, QInputDialog,
 )
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QPixmap, QIntValidator
+from PySide6.QtCore import Qt, Signal, QTimer, QItemSelectionModel
+from PySide6.QtGui import QPixmap, QIntValidator, QKeySequence, QShortcut
 
 # On importe DataManager et CarbonCalculator
 from windows.data_manager import DataManager
 from windows.carbon_calculator import CarbonCalculator
+from windows.history_list_model import HistoryListModel, HistoryItemDelegate
 
 from utils.data_loader import load_logo, resource_path
+from utils.history_io import normalize_history, read_history, write_history
+from utils.history_record import HistoryRecord, records_from_frame, records_to_frame
 from manips_types.a_manips_type_db import ManipsTypeDB
-from windows.graphiques.graph_1_pie_chart import PieChartWindow
-from windows.graphiques.graph_2_bar_chart import BarChartWindow
-from windows.graphiques.graph_3_proportional_bar_chart import ProportionalBarChartWindow
+from utils.instrumentation import instrumented
+from utils.log import get_logger
+from utils.startup_profile import profiler
 from windows.data_mass_window import DataMassWindow
 from windows.edit_calculation_dialog import EditCalculationDialog
-from windows.graphiques.graph_4_stacked_bar_consumables import StackedBarConsumablesWindow
-from windows.graphiques.graph_5_nacres_bar_chart import NacresBarChartWindow
-from windows.graphiques.graph_6_proportional_bar_chart_mass import ProportionalBarChartNacresWindow
 from windows.UserManipDialog import UserManipDialog
 
+# Fenêtres graphiques : type -> (module, classe).
+# Importées à la première utilisation (generate_chart) : elles chargent matplotlib,
+# NumPy et adjustText, inutiles tant qu'aucun graphique n'est ouvert.
+CHART_WINDOWS = {
+    'pie': ("windows.graphiques.graph_1_pie_chart", "PieChartWindow"),
+    'bar': ("windows.graphiques.graph_2_bar_chart", "BarChartWindow"),
+    'proportional_bar': ("windows.graphiques.graph_3_proportional_bar_chart", "ProportionalBarChartWindow"),
+    'stacked_bar_consumables': ("windows.graphiques.graph_4_stacked_bar_consumables", "StackedBarConsumablesWindow"),
+    'nacres_bar': ("windows.graphiques.graph_5_nacres_bar_chart", "NacresBarChartWindow"),
+    'proportional_bar_mass': ("windows.graphiques.graph_6_proportional_bar_chart_mass", "ProportionalBarChartNacresWindow"),
+}
+
+# Préchargement des modules graphiques une fois la fenêtre affichée (délai en ms),
+# un module par passage dans la boucle d'événements. LABECO2_CHART_PREWARM=0 le désactive.
+CHART_PREWARM_DELAY_MS = 3000
+
+logger = get_logger(__name__)
+
 
 
 class MainWindow(QMainWindow):
@@ -61,19 +80,23 @@ class MainWindow(QMainWindow):
         else:
             base_path = os.path.abspath(".")
         
-        # Chemin de la base de données SQLite pour les manips type
-        db_path = os.path.join(base_path, "./manips_types/manips_type.sqlite")
-        self.manips_db = ManipsTypeDB(db_path=db_path)
+        # Base SQLite des manips type : stockée hors du bundle (dossier utilisateur)
+        # pour l'exécutable, mise à jour automatiquement via les migrations.
+        with profiler.phase("Ouverture de la base des manips type"):
+            self.manips_db = ManipsTypeDB()
 
         try:
-            self.data_manager = DataManager(base_path)
+            with profiler.phase("Chargement des données (DataManager)"):
+                self.data_manager = DataManager(base_path)
         except Exception as e:
             QMessageBox.critical(self, "Erreur", f"Impossible de charger les données : {e}")
             sys.exit(1)
 
-        # 2) Récup DataFrame
-        self.data = self.data_manager.get_main_data()
-        self.data_masse = self.data_manager.get_data_masse()
+        # 2) Récup DataFrame (millésime des facteurs le plus récent pour les nouveaux calculs)
+        self.current_vintage = self.data_manager.vintages.latest
+        self.data = self.data_manager.get_main_data(self.current_vintage)
+        # Index de la hiérarchie des facteurs (listes de l'interface), par millésime
+        self.hierarchy = self.data_manager.hierarchy(self.current_vintage)
         self.data_materials = self.data_manager.get_data_materials()
 
         # 3) CarbonCalculator
@@ -92,6 +115,7 @@ class MainWindow(QMainWindow):
         self.data_mass_window = None
         self.stacked_bar_consumables_window = None
         self.nacres_bar_chart_window = None
+        self.diagnostics_dialog = None
 
         # Widgets
         self.category_combo = None
@@ -102,6 +126,7 @@ class MainWindow(QMainWindow):
         self.days_field = None
         self.machine_group = None
         self.history_list = None
+        self.history_model = None
         self.result_area = None
         self.search_field = None
         self.logo_label = None
@@ -131,7 +156,11 @@ class MainWindow(QMainWindow):
             }
         """)
 
-        self.initUI()
+        with profiler.phase("Construction de l'interface (initUI)"):
+            self.initUI()
+
+        # Modules graphiques préchargés une fois la fenêtre affichée et inactive
+        self.schedule_chart_prewarm()
 
     def initUI(self):
         """
@@ -144,11 +173,16 @@ class MainWindow(QMainWindow):
         main_layout.setSpacing(5)
         main_layout.setContentsMargins(10, 10, 10, 10)
 
-        self.initUIHeader(main_layout)
-        self.initUICategorySelectors(main_layout)
-        self.initUIMachineSection(main_layout)
-        self.initUIHistory(main_layout)
-        self.initUIGraphButtons(main_layout)
+        with profiler.phase("initUIHeader"):
+            self.initUIHeader(main_layout)
+        with profiler.phase("initUICategorySelectors"):
+            self.initUICategorySelectors(main_layout)
+        with profiler.phase("initUIMachineSection"):
+            self.initUIMachineSection(main_layout)
+        with profiler.phase("initUIHistory"):
+            self.initUIHistory(main_layout)
+        with profiler.phase("initUIGraphButtons"):
+            self.initUIGraphButtons(main_layout)
 
         # Label de résultat
         self.result_area = QLabel("Total des émissions : 0.0000 kg CO₂e")
@@ -170,8 +204,10 @@ class MainWindow(QMainWindow):
         scroll_area.setWidget(container)
         self.setCentralWidget(scroll_area)
 
-        self.initUISignals()
-        self.update_subcategories()
+        with profiler.phase("initUISignals"):
+            self.initUISignals()
+        with profiler.phase("update_subcategories (état initial)"):
+            self.update_subcategories()
 
         self.resize(780, 700)
         screen = QApplication.primaryScreen()
@@ -296,10 +332,20 @@ class MainWindow(QMainWindow):
         Args:
             main_layout (QVBoxLayout): Le layout principal auquel ajouter les sélecteurs de catégories.
         """
+        # Millésime de la base des facteurs (masqué s'il n'y en a qu'un)
+        self.vintage_label = QLabel('Millésime des facteurs :')
+        self.vintage_combo = QComboBox()
+        vintages = self.data_manager.vintages
+        for vintage in reversed(vintages.names()):
+            self.vintage_combo.addItem(vintages.date(vintage) or vintage, vintage)
+        has_vintages = self.vintage_combo.count() > 1
+        self.vintage_label.setVisible(has_vintages)
+        self.vintage_combo.setVisible(has_vintages)
+
         # Label + ComboBox catégorie
         self.category_label = QLabel('Catégorie:')
         self.category_combo = QComboBox()
-        categories = self.data['category'].dropna().unique().tolist()
+        categories = self.hierarchy.categories()
         # Éviter 'Électricité' ici
         categories = [cat for cat in categories if cat != 'Électricité']
         categories.append('Machine')
@@ -373,6 +419,7 @@ class MainWindow(QMainWindow):
         form_layout.setSpacing(5)
         form_layout.setLabelAlignment(Qt.AlignRight)
 
+        form_layout.addRow(self.vintage_label, self.vintage_combo)
         form_layout.addRow(self.category_label, self.category_combo)
         form_layout.addRow(self.subcategory_label, self.subcategory_combo)
         form_layout.addRow(self.subsub_name_label, nom_layout)
@@ -451,10 +498,7 @@ class MainWindow(QMainWindow):
         self.electricity_label = QLabel('Type d\'électricité:')
         self.electricity_combo = QComboBox()
         self.electricity_combo.setMaximumWidth(200)
-        # Récupérer la liste de name pour la catégorie Électricité
-        mask_elec = self.data['category'] == 'Électricité'
-        electricity_types = self.data[mask_elec]['name'].dropna().unique()
-        self.electricity_combo.addItems(sorted(electricity_types))
+        self.update_electricity_types()
 
         self.add_machine_button = QPushButton('Ajouter la machine')
 
@@ -484,8 +528,15 @@ class MainWindow(QMainWindow):
         self.history_label = QLabel('Historique des calculs:')
         main_layout.addWidget(self.history_label)
 
-        # self.history_list = QListWidget()
-        self.history_list = QListWidget()
+        # Liste sur un modèle : le texte d'une ligne n'est formaté que lorsqu'elle est affichée
+        self.history_model = HistoryListModel(self)
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        # Hauteur de ligne uniforme : la vue ne mesure pas chaque ligne
+        self.history_list.setUniformItemSizes(True)
+        history_delegate = HistoryItemDelegate(self.history_list)
+        self.history_list.setItemDelegate(history_delegate)
+        self.history_model.modelReset.connect(history_delegate.reset_width)
         # self.history_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.history_list.setSelectionMode(QAbstractItemView.MultiSelection)
         self.history_list.setMaximumHeight(100)
@@ -602,6 +653,7 @@ class MainWindow(QMainWindow):
         self.header_label.linkActivated.connect(self.toggle_text_display)
         self.add_calcul_button.clicked.connect(self.show_calcul_section)
 
+        self.vintage_combo.currentIndexChanged.connect(self.on_vintage_changed)
         self.category_combo.currentIndexChanged.connect(self.update_subcategories)
         self.subcategory_combo.currentIndexChanged.connect(self.update_subsubcategory_names)
         self.subcategory_combo.currentIndexChanged.connect(self.update_quantity_visibility)
@@ -631,13 +683,27 @@ class MainWindow(QMainWindow):
         self.generate_nacres_bar_button.clicked.connect(self.generate_nacres_bar_chart)
         self.generate_proportional_bar_button_mass.clicked.connect(self.generate_proportional_bar_chart_mass)     
 
-        self.history_list.itemDoubleClicked.connect(self.modify_selected_calculation)
+        self.history_list.doubleClicked.connect(self.modify_selected_calculation)
         self.add_machine_button.clicked.connect(self.add_machine)
         self.conso_filtered_combo.currentIndexChanged.connect(self.on_conso_filtered_changed)
 
         self.manage_consumables_button.clicked.connect(self.open_data_mass_window)
         
         self.add_manip_type_button.clicked.connect(self.add_manip_type_to_history)
+
+        # Fenêtre de diagnostic des performances
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_diagnostics)
+
+    def show_diagnostics(self):
+        """Affiche la fenêtre de diagnostic des performances (non modale)."""
+        from windows.diagnostics_dialog import DiagnosticsDialog
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+            self.diagnostics_dialog.finished.connect(lambda: setattr(self, 'diagnostics_dialog', None))
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+        self.diagnostics_dialog.activateWindow()
+
     # ------------------------------------------------------------------
     # Fonctions pour gérer filtres & masques
     # ------------------------------------------------------------------
@@ -675,96 +741,6 @@ class MainWindow(QMainWindow):
         self.existing_group.setVisible(True)
         self.existing_group.adjustSize()
 
-    def calculate_emission_for_item(self, item_data: dict) -> dict:
-        """
-        Calcule les émissions de carbone pour un seul "item" de la même manière
-        que la fonction 'calculate_emission', mais en se basant uniquement sur
-        un dictionnaire item_data (sans accès direct à l'UI).
-
-        - Gère le cas 'Machine' comme dans calculate_emission.
-        - Reconstruit subsub_name si nécessaire pour en extraire le code NACRES.
-        - Appelle compute_emission_data(item_data) pour obtenir ep, ep_err, em, em_err, tm, msg.
-        - Stocke ensuite ces résultats dans item_data et le renvoie.
-
-        Args:
-            item_data (dict): Contient a minima :
-                - category (str)
-                - subcategory (str)
-                - subsubcategory (str)
-                - name (str)           # Pour le code NACRES si Achats
-                - value (float)        # km/jour, €...
-                - days (int)
-                - quantity (int/float)
-                - consommable (str)    # S'il s'agit d'un consommable Achats
-                - year (str)           # Optionnel
-                ...
-        Returns:
-            dict: item_data mis à jour avec :
-                - "emissions_price", "emissions_price_error"
-                - "emission_mass", "emission_mass_error"
-                - "total_mass"
-                - éventuellement "calc_error_msg" si erreur
-        """
-        # 1) Lire les champs principaux
-        category = item_data.get('category', '')
-        subcategory = item_data.get('subcategory', '')
-        # # On recompose un subsub_name comme "subsubcategory - name"
-        # # pour simuler ce que fait `calculate_emission()` avec `split_subsub_name`
-        base_subsub = item_data.get('subsubcategory', '')
-        base_name = item_data.get('name', '')
-        subsub_name = (base_subsub + " " + base_name).strip(' - ')
-
-        # year = item_data.get('year', '')
-        # days = int(item_data.get('days', 1))
-        # quantity = item_data.get('quantity', 0)
-
-        # 2) Gérer le cas spécial : Machine
-        #    Dans la fonction 'calculate_emission', on appelait self.add_machine().
-        #    Ici, on peut soit reproduire la logique de add_machine, soit renvoyer item_data avec un message.
-        if category == 'Machine':
-            # Ici, par exemple, on "simule" ce que fait add_machine :
-            # => on suppose que carbon_calculator gère 'value' = kWh
-            ep, ep_err, em, em_err, tm, msg = self.carbon_calculator.compute_emission_data(item_data)
-            if msg:
-                item_data["calc_error_msg"] = msg
-                return item_data
-            item_data["emissions_price"] = ep
-            item_data["emissions_price_error"] = ep_err
-            item_data["emission_mass"] = em
-            item_data["emission_mass_error"] = em_err
-            item_data["total_mass"] = tm
-            return item_data
-
-        # 3) Gérer NACRES si Achats (optionnel)
-        code_nacres = 'NA'
-        if category == 'Achats' and base_subsub:
-            code_nacres = subsub_name[:4]
-        item_data['code_nacres'] = code_nacres
-
-        print ("ITEM DATA ", item_data)
-
-        # Si la fonction 'calculate_emission' fait plus de choses, on peut les reproduire ici.
-
-        # 4) Appeler compute_emission_data
-        #    => on s’appuie sur la structure existante, 
-        #    => item_data doit déjà contenir tout (category, subcategory, subsub, value, days, quantity, etc.)
-        ep, ep_err, em, em_err, tm, msg = self.carbon_calculator.compute_emission_data(item_data)
-
-        # 5) Si erreur renvoyée
-        if msg:
-            item_data["calc_error_msg"] = msg
-            return item_data
-
-        # 6) Stocker le résultat dans item_data
-        item_data["emissions_price"] = ep
-        item_data["emissions_price_error"] = ep_err
-        item_data["emission_mass"] = em
-        item_data["emission_mass_error"] = em_err
-        item_data["total_mass"] = tm
-
-        # 7) Retour
-        return item_data
-
     def add_manip_type_to_history(self):
         """
         Ajoute tous les éléments (items) de la manipulation sélectionnée dans la liste déroulante
@@ -772,12 +748,14 @@ class MainWindow(QMainWindow):
 
         1. Vérifie qu'une manip type est sélectionnée dans la combo.
         2. Récupère le nom de la manip (stocké en userData).
-        3. Récupère tous les items associés à cette manip depuis la base SQLite.
-        4. Pour chaque item, construit un dictionnaire 'new_data' incluant tous les champs essentiels,
-        notamment "consommable" et "quantity".
-        5. Appelle calculate_emission_for_item(new_data) pour recalculer les émissions.
-        6. Si le calcul retourne une erreur (champ "calc_error_msg"), affiche un avertissement et arrête.
-        7. Sinon, ajoute l'item recalculé à l'historique et met à jour le total des émissions.
+        3. Si la manip est paramétrée (ex. nombre d'échantillons), demande la valeur
+        du paramètre en une seule boîte de dialogue.
+        4. Récupère tous les items associés à cette manip depuis la base SQLite.
+        5. Si les émissions de cette manip sont en cache (même contenu, mêmes bases de facteurs,
+        pas de mise à l'échelle), réutilise directement les items calculés.
+        6. Sinon, met les items à l'échelle et calcule leurs émissions en un seul passage
+        vectorisé (compute_manip_items). En cas d'erreur, affiche un avertissement et arrête.
+        7. Ajoute les items calculés à l'historique en un seul bloc et met à jour le total.
         """
         # 1) Vérifier l'index sélectionné dans la combo
         current_idx = self.manip_type_combo.currentIndex()
@@ -788,47 +766,128 @@ class MainWindow(QMainWindow):
         manip_name = self.manip_type_combo.itemData(current_idx)
         if not manip_name:
             return
+        manip_info = self.manips_db.get_manip_info(manip_name)
+        if not manip_info:
+            QMessageBox.warning(self, "Erreur", f"La manip '{manip_name}' est introuvable.")
+            return
+
+        # 3) Manip paramétrée : demander la valeur du paramètre d'échelle
+        scale = 1.0
+        scale_label = manip_info.get("scale_label")
+        scale_base = float(manip_info.get("scale_base") or 1.0)
+        if scale_label:
+            requested, ok = QInputDialog.getDouble(
+                self, "Manip paramétrée",
+                f"Nombre de {scale_label} (manip définie pour {scale_base:g}) :",
+                scale_base, 0.0, 1e9, 2
+            )
+            if not ok:
+                return
+            scale = requested / scale_base if scale_base else requested
 
-        # 3) Récupérer tous les items associés à cette manip depuis la base
+        # 4) Récupérer tous les items associés à cette manip depuis la base
         items = self.manips_db.get_manip_items(manip_name)
         if not items:
             QMessageBox.warning(self, "Erreur", f"Aucun item trouvé pour la manip '{manip_name}'.")
             return
 
-        # 4) Pour chaque item, construire le dictionnaire new_data et inclure "consommable" et "quantity"
-        for item in items:
-            new_data = {
-                "category": item["category"],
-                "subcategory": item["subcategory"],
-                "subsubcategory": item["subsubcategory"],
-                "name": item["name"],
-                "value": item["value"],
-                "unit": item["unit"],
-                "quantity": item.get("quantity", 0.0),
-                "days": item.get("days", 0),
-                "year": item.get("year", 0),
-                "electricity_type": item.get("electricity_type", ""),
-                "consommable": item.get("consommable", ""),
-                "code_nacres": item.get("code_nacres", "")
-            }
+        # 5) Résultats déjà calculés ? Le cache n'est valable que si ni la manip
+        #    ni les bases de facteurs n'ont changé depuis le dernier calcul.
+        content_hash = ManipsTypeDB.items_hash(items)
+        factors_version = self.data_manager.get_factors_version(self.current_vintage)
+        results = None
+        if scale == 1.0:
+            results = self.manips_db.get_cached_emissions(manip_info["id"], content_hash, factors_version)
+            if results is not None:
+                # Même contenu de facteurs : le calcul est rattaché au millésime courant
+                results = [dict(row, vintage=self.current_vintage) for row in results]
+
+        # 6) Calcul vectorisé de tous les items (mis à l'échelle si besoin)
+        if results is None:
+            results, error_msg = self.compute_manip_items(items, scale)
+            if error_msg:
+                QMessageBox.warning(self, "Erreur de calcul", error_msg)
+                return
+            if scale == 1.0:
+                self.manips_db.store_cached_emissions(manip_info["id"], content_hash, factors_version, results)
 
-            # Optionnel : vérifier via un debug
-            # print("DEBUG new_data:", new_data)
+        # 7) Ajouter les items calculés à l'historique en un seul bloc
+        self.add_history_block(results)
 
-            # 5) Recalculer les émissions pour cet item
-            updated_data = self.calculate_emission_for_item(new_data)
+    def compute_manip_items(self, items, scale=1.0):
+        """
+        Met à l'échelle les items d'une manip type et calcule leurs émissions
+        en un seul passage vectorisé (CarbonCalculator.compute_emission_batch).
 
-            # 6) Si un message d'erreur a été renvoyé, afficher une alerte et interrompre
-            if "calc_error_msg" in updated_data:
-                QMessageBox.warning(self, "Erreur de calcul", updated_data["calc_error_msg"])
-                return  # On peut choisir de continuer plutôt que d'arrêter, selon la logique souhaitée
+        Pour chaque item, les champs listés dans "scale_fields" (par défaut "value,quantity",
+        noms séparés par des virgules) sont multipliés par `scale`. Les quantités et nombres
+        de jours restent entiers : arrondis au plus proche (0,5 vers le haut), sans descendre
+        à 0 s'ils étaient positifs (un consommable ne disparaît pas du calcul massique).
 
-            # 7) Ajouter l'item recalculé à l'historique
-            self.create_or_update_history_item(updated_data)
+        Args:
+            items (list[dict]): items retournés par ManipsTypeDB.get_manip_items.
+            scale (float): facteur d'échelle (1.0 = manip telle que saisie).
+
+        Returns:
+            tuple: (liste de dictionnaires prêts pour l'historique, message d'erreur ou None)
+        """
+        columns = ["category", "subcategory", "subsubcategory", "name", "value", "unit",
+                   "quantity", "days", "year", "electricity_type", "consommable", "code_nacres"]
+        df = pd.DataFrame(items).reindex(columns=columns + ["scale_fields"])
+        # Les items sont calculés (et rattachés) avec le millésime courant des facteurs
+        df["vintage"] = self.current_vintage
+        for col in ["category", "subcategory", "subsubcategory", "name", "unit",
+                    "electricity_type", "consommable", "code_nacres"]:
+            df[col] = df[col].fillna("").astype(object)
+        for col, default in (("value", 0.0), ("quantity", 0.0), ("days", 0), ("year", 0)):
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(default)
+
+        if scale != 1.0:
+            # Noms de champs entiers ("days_machine" ne met pas "days" à l'échelle)
+            scale_fields = df["scale_fields"].fillna("value,quantity").astype(str).map(
+                lambda fields: {field.strip() for field in fields.split(",")}
+            )
+            for field in ("value", "quantity", "days"):
+                mask = scale_fields.map(lambda fields: field in fields).astype(bool)
+                original = df.loc[mask, field]
+                scaled = original * scale
+                if field != "value":
+                    rounded = (scaled + 0.5) // 1
+                    scaled = rounded.where(original <= 0, rounded.clip(lower=1))
+                df.loc[mask, field] = scaled
+
+        # Code NACRES : 4 premiers caractères de la sous-sous-catégorie pour les Achats
+        # (même règle que calculate_emission), puis émissions par compute_emission_batch
+        subsub_name = (df["subsubcategory"] + " " + df["name"]).str.strip(" - ")
+        is_achats = (df["category"] == "Achats") & (df["subsubcategory"] != "")
+        not_machine = df["category"] != "Machine"
+        df.loc[not_machine, "code_nacres"] = "NA"
+        df.loc[is_achats, "code_nacres"] = subsub_name[is_achats].str[:4]
+
+        computed = self.carbon_calculator.compute_emission_batch(df)
+        errors = computed["calc_error_msg"].dropna()
+        if not errors.empty:
+            return [], errors.iloc[0]
+
+        df = df.drop(columns="scale_fields")
+        for col in ["emissions_price", "emissions_price_error", "emission_mass",
+                    "emission_mass_error", "total_mass"]:
+            df[col] = computed[col].astype(float)
+        return df.to_dict("records"), None
+
+    def add_history_block(self, rows):
+        """
+        Ajoute un bloc de lignes déjà calculées à l'historique, en une seule
+        insertion dans la liste, puis met à jour le total une seule fois.
 
-        # Mettre à jour le total des émissions
+        Args:
+            rows (list[dict]): dictionnaires au format de l'historique.
+        """
+        self.history_model.append_records([self.as_history_record(data) for data in rows])
         self.update_total_emissions()
+        self.data_changed.emit()
 
+    @instrumented()
     def on_search_text_changed(self, text):
         """
         Gère l'événement de changement de texte dans le champ de recherche.
@@ -860,6 +919,26 @@ class MainWindow(QMainWindow):
 
         self.update_quantity_visibility()
 
+    def update_electricity_types(self):
+        """Remplit la liste des types d'électricité (catégorie Électricité du millésime courant)."""
+        self.electricity_combo.clear()
+        self.electricity_combo.addItems(self.hierarchy.electricity_types())
+
+    def on_vintage_changed(self):
+        """
+        Change le millésime des facteurs utilisé pour les nouveaux calculs.
+        Les calculs déjà dans l'historique gardent le millésime avec lequel ils ont été faits.
+        """
+        vintage = self.vintage_combo.currentData()
+        if not vintage or vintage == self.current_vintage:
+            return
+        self.current_vintage = vintage
+        self.data = self.data_manager.get_main_data(vintage)
+        self.hierarchy = self.data_manager.hierarchy(vintage)
+        self.update_electricity_types()
+        self.update_subcategories()
+
+    @instrumented()
     def update_subcategories(self):
         """
         Met à jour les sous-catégories et les zones d'interface en fonction de la catégorie sélectionnée.
@@ -923,9 +1002,8 @@ class MainWindow(QMainWindow):
                 self.days_field.setVisible(False)
                 self.days_field.setEnabled(False)
             # Mettre à jour la liste des sous-catégories en fonction de la catégorie
-            subcats = self.data[self.data['category'] == category]['subcategory'].dropna().unique()
             self.subcategory_combo.clear()
-            self.subcategory_combo.addItems(sorted(subcats.astype(str)))
+            self.subcategory_combo.addItems(self.hierarchy.subcategories(category))
             self.update_subsubcategory_names()
             self.update_nacres_visibility()
 
@@ -957,6 +1035,7 @@ class MainWindow(QMainWindow):
             self.quantity_label.setVisible(False)
             self.quantity_input.setVisible(False)
 
+    @instrumented()
     def update_subsubcategory_names(self):
         """
         Met à jour les noms des sous-sous-catégories en fonction de la catégorie et sous-catégorie sélectionnées.
@@ -968,21 +1047,8 @@ class MainWindow(QMainWindow):
         subcategory = self.subcategory_combo.currentText()
         search_text = self.search_field.text().lower()
 
-        mask = (self.data['category'] == category)
-        if subcategory:
-            mask &= (self.data['subcategory'] == subcategory)
-
-        filtered_data = self.data[mask]
-
-        # Construction "subsubcategory - name"
-        subsub_names = (
-            filtered_data['subsubcategory'].fillna('')
-            + ' - '
-            + filtered_data['name'].fillna('')
-        ).str.strip(' - ')
-
-        # On rend unique
-        subsub_names_unique = subsub_names.unique()
+        # Libellés "subsubcategory - name", uniques (index de la hiérarchie)
+        subsub_names_unique = self.hierarchy.labels(category, subcategory)
 
         # Appliquer la recherche
         if search_text:
@@ -1014,17 +1080,11 @@ class MainWindow(QMainWindow):
         subsub_name = self.subsub_name_combo.currentText()
         subsubcategory, name = self.split_subsub_name(subsub_name)
 
-        mask = (
-            (self.data['category'] == category) &
-            (self.data['subcategory'] == subcategory) &
-            (self.data['subsubcategory'].fillna('') == subsubcategory) &
-            (self.data['name'].fillna('') == name)
-        )
-        years = self.data[mask]['year'].dropna().astype(str).unique()
+        years = self.hierarchy.years(category, subcategory, subsubcategory, name)
 
         self.year_combo.blockSignals(True)
         self.year_combo.clear()
-        self.year_combo.addItems(sorted(years))
+        self.year_combo.addItems(years)
         self.year_combo.blockSignals(False)
         self.update_unit()
 
@@ -1041,18 +1101,9 @@ class MainWindow(QMainWindow):
         year = self.year_combo.currentText()
         subsubcategory, name = self.split_subsub_name(subsub_name)
 
-        mask = (
-            (self.data['category'] == category) &
-            (self.data['subcategory'] == subcategory) &
-            (self.data['subsubcategory'].fillna('') == subsubcategory) &
-            (self.data['name'].fillna('') == name)
-        )
-        if year:
-            mask &= (self.data['year'].astype(str) == year)
-
-        filtered_data = self.data[mask]
-        if not filtered_data.empty:
-            unit = filtered_data['unit'].values[0] or 'valeur'
+        unit = self.hierarchy.unit(category, subcategory, subsubcategory, name, year)
+        if unit is not None:
+            unit = unit or 'valeur'
             self.current_unit = unit
             self.input_label.setText(f'Entrez la valeur en {unit}:')
             self.input_field.setEnabled(True)
@@ -1061,6 +1112,7 @@ class MainWindow(QMainWindow):
             self.input_label.setText('Entrez la valeur:')
             self.input_field.setEnabled(False)
 
+    @instrumented()
     def update_conso_filtered_combo(self, filter_text=None):
         """
         Met à jour la combobox des consommables filtrés en fonction d'un texte de filtre.
@@ -1080,10 +1132,7 @@ class MainWindow(QMainWindow):
         else:
             filter_text = filter_text.lower()
 
-        for idx, row in self.data_masse.iterrows():
-            full_code = row.get('Code NACRES', '').strip()
-            consommable = row.get('Consommable', '').strip()
-            display_text = f"{full_code} - {consommable}"
+        for display_text in self.data_manager.consumable_labels():
             if not filter_text or filter_text in display_text.lower():
                 self.conso_filtered_combo.addItem(display_text)
 
@@ -1111,13 +1160,7 @@ class MainWindow(QMainWindow):
         # Récupère les 4 premiers caractères comme code NACRES approximatif
         code_nacres_4 = subsub_name[:4]
 
-        filtered_items = []
-        for idx, row in self.data_masse.iterrows():
-            full_code = row.get('Code NACRES', '').strip()
-            consommable = row.get('Consommable', '').strip()
-            display_text = f"{full_code} - {consommable}"
-            if full_code.startswith(code_nacres_4):
-                filtered_items.append(display_text)
+        filtered_items = self.data_manager.consumable_labels(code_nacres_4)
 
         self.conso_filtered_combo.blockSignals(True)
         self.conso_filtered_combo.clear()
@@ -1184,12 +1227,8 @@ class MainWindow(QMainWindow):
         self.update_subsubcategory_names()
 
         # Ensuite, on cherche la subsub dont .str[:4] == code_nacres_4
-        filtered_data = self.data[
-            (self.data['category'] == "Achats") &
-            (self.data['subcategory'].str.contains("Consommables", na=False)) &
-            (self.data['subsubcategory'].fillna('').str[:4] == code_nacres_4)
-        ]
-        if filtered_data.empty:
+        new_subsub_text = self.hierarchy.consumable_label(code_nacres_4)
+        if new_subsub_text is None:
             # subsub => "non renseignée"
             self.subsub_name_combo.blockSignals(True)
             idx_nr = self.subsub_name_combo.findText("non renseignée")
@@ -1199,11 +1238,6 @@ class MainWindow(QMainWindow):
                 self.subsub_name_combo.setCurrentIndex(0)
             self.subsub_name_combo.blockSignals(False)
         else:
-            row = filtered_data.iloc[0]
-            real_subsub = row['subsubcategory'] or ''
-            real_name = row['name'] or ''
-            new_subsub_text = f"{real_subsub} - {real_name}".strip(" - ")
-
             self.subsub_name_combo.blockSignals(True)
             idx_ss = self.subsub_name_combo.findText(new_subsub_text)
             if idx_ss != -1:
@@ -1255,15 +1289,85 @@ class MainWindow(QMainWindow):
             subsub, name = '', subsub_name
         return subsub.strip(), name.strip()
     
+    @property
+    def data_masse(self):
+        """Table des consommables du DataManager (inclut les ajouts faits en cours de session)."""
+        return self.data_manager.get_data_masse()
+
     def open_data_mass_window(self):
         # On ouvre la fenêtre DataMassWindow
-        self.data_mass_window = DataMassWindow(parent=self, data_materials=self.data_materials)
+        self.data_mass_window = DataMassWindow(
+            parent=self,
+            data_materials=self.data_materials,
+            store=self.data_manager.consumables_store
+        )
+        self.data_mass_window.data_added.connect(self.on_consumables_added)
         self.data_mass_window.show()
+
+    def on_consumables_added(self, rows):
+        """
+        Propage les consommables ajoutés dans DataMassWindow sans recharger les données :
+        table en mémoire et index du DataManager, liste des consommables,
+        puis (au choix de l'utilisateur) recalcul des lignes de l'historique concernées.
+
+        Args:
+            rows (list[dict]): Les consommables ajoutés (colonnes de data_masse).
+        """
+        new_rows = self.data_manager.append_consumables(rows)
+        if new_rows.empty:
+            return
+
+        # Rafraîchir la liste des consommables en gardant la sélection courante
+        current = self.conso_filtered_combo.currentText()
+        subsub_name = self.subsub_name_combo.currentText()
+        if subsub_name and subsub_name != "non renseignée":
+            self.on_subsub_name_changed()
+        else:
+            self.update_conso_filtered_combo()
+        idx = self.conso_filtered_combo.findText(current)
+        if idx != -1:
+            self.conso_filtered_combo.setCurrentIndex(idx)
+
+        # Lignes de l'historique qui utilisent ces consommables
+        keys = set(zip(
+            new_rows[DataManager.CODE_NACRES_COL].fillna('').astype(str).str.strip(),
+            new_rows[DataManager.CONSOMMABLE_COL].fillna('').astype(str).str.strip()
+        ))
+        rows = []
+        for row, data in enumerate(self.history_model.records()):
+            key = (data.get('code_nacres', 'NA').strip(), data.get('consommable', 'NA').strip())
+            if data.category == 'Achats' and key in keys:
+                rows.append(row)
+        if not rows:
+            return
+
+        reply = QMessageBox.question(
+            self, "Consommables ajoutés",
+            f"{len(rows)} ligne(s) de l'historique utilisent les consommables ajoutés.\n"
+            "Recalculer leurs émissions massiques ?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if reply != QMessageBox.Yes:
+            return
+
+        for row in rows:
+            data = self.history_model.record(row).copy()
+            ep, ep_err, em, em_err, tm, msg = self.carbon_calculator.compute_emission_data(data)
+            if msg:
+                continue
+            data['emissions_price'] = ep
+            data['emissions_price_error'] = ep_err
+            data['emission_mass'] = em
+            data['emission_mass_error'] = em_err
+            data['total_mass'] = tm
+            self.create_or_update_history_item(data, row)
+        self.update_total_emissions()
+        self.data_changed.emit()
     
     def define_user_manip_from_history(self):
         # 1) Vérifier si des éléments sont sélectionnés
-        selected_items = self.history_list.selectedItems()
-        if not selected_items:
+        selected_rows = self.selected_history_rows()
+        if not selected_rows:
             QMessageBox.warning(
                 self,
                 "Aucun item sélectionné",
@@ -1283,8 +1387,8 @@ class MainWindow(QMainWindow):
 
             # 3) Construire la liste des items à partir de la sélection
             items_list = []
-            for lw_item in selected_items:
-                data = lw_item.data(Qt.UserRole)
+            for row in selected_rows:
+                data = self.history_model.record(row)
                 if not data:
                     continue
                 items_list.append({
@@ -1308,9 +1412,13 @@ class MainWindow(QMainWindow):
                 )
                 return
 
-            # 4) Ajouter la manip en base (source = "user")
+            # 4) Ajouter la manip en base (source = "user"), avec son paramètre d'échelle éventuel
             try:
-                self.manips_db.add_manip(manip_name, items_list, source="user")
+                self.manips_db.add_manip(
+                    manip_name, items_list, source="user",
+                    scale_label=dialog.get_scale_label(),
+                    scale_base=dialog.get_scale_base()
+                )
                 QMessageBox.information(
                     self, 
                     "Manip ajoutée", 
@@ -1332,6 +1440,8 @@ class MainWindow(QMainWindow):
         for m in manip_list:
             # Le texte qu'on veut afficher
             display_text = f"{m['name']} - {m['source']}"
+            if m.get('scale_label'):
+                display_text += f" (par {m['scale_label']})"
             
             # On ajoute l'item dans la combo
             # - `display_text` est ce que l'utilisateur voit,
@@ -1340,6 +1450,7 @@ class MainWindow(QMainWindow):
     # ------------------------------------------------------------------
     # Calculs d'émissions
     # ------------------------------------------------------------------ 
+    @instrumented()
     def calculate_emission(self):
         """
         Calcule les émissions de carbone pour la catégorie sélectionnée.
@@ -1415,6 +1526,7 @@ class MainWindow(QMainWindow):
             'code_nacres': code_nacres,
             'consommable': consommable,
             'quantity': quantity,
+            'vintage': self.current_vintage,
         }
         # print("Debug - data_dict :", data_dict)
         # Appel unifié
@@ -1440,6 +1552,7 @@ class MainWindow(QMainWindow):
             'consommable': consommable,
             'unit': self.current_unit,
             'quantity': quantity,
+            'vintage': self.current_vintage,
         }
 
         self.create_or_update_history_item(new_data)
@@ -1447,6 +1560,7 @@ class MainWindow(QMainWindow):
         self.input_field.clear()
         self.data_changed.emit()
 
+    @instrumented()
     def modify_selected_calculation(self):
         """
         Modifie un calcul sélectionné dans l'historique.
@@ -1454,22 +1568,32 @@ class MainWindow(QMainWindow):
         Ouvre une boîte de dialogue pour permettre à l'utilisateur de modifier les données d'un calcul existant.
         Si la modification est acceptée, recalcule les émissions et met à jour l'historique ainsi que les totaux.
         """
-        selected_item = self.history_list.currentItem()
-        if not selected_item:
+        current = self.history_list.currentIndex()
+        if not current.isValid():
             QMessageBox.warning(self, 'Erreur', 'Veuillez sélectionner un calcul à modifier.')
             return
 
-        old_data = selected_item.data(Qt.UserRole)
+        old_data = self.history_model.record(current.row())
         if not old_data:
             QMessageBox.warning(self, 'Erreur', 'Aucune donnée disponible pour cet élément.')
             return
 
+        # Le calcul est modifié dans le millésime des facteurs avec lequel il a été fait
+        vintage = old_data.get('vintage') or self.current_vintage
+        try:
+            main_data = self.data_manager.get_main_data(vintage)
+        except KeyError as e:
+            QMessageBox.warning(self, 'Erreur', str(e))
+            return
+
         dialog = EditCalculationDialog(self, data=old_data, 
-                                    main_data=self.data, 
+                                    main_data=main_data, 
                                     data_masse=self.data_masse, 
-                                    data_materials=self.data_materials)
+                                    data_materials=self.data_materials,
+                                    hierarchy=self.data_manager.hierarchy(vintage))
         if dialog.exec() == QDialog.Accepted:
             modified_data = dialog.modified_data
+            modified_data['vintage'] = vintage
             # print("Debug - Nouveau self.modified_data :", modified_data)
 
             # On suppose que modified_data['value'] = val/jour
@@ -1486,11 +1610,12 @@ class MainWindow(QMainWindow):
             modified_data['emission_mass_error'] = em_err
             modified_data['total_mass'] = tm
 
-            self.history_list.takeItem(self.history_list.row(selected_item))
+            self.history_model.remove_rows([current.row()])
             self.create_or_update_history_item(modified_data)
             self.update_total_emissions()
             self.data_changed.emit()
 
+    @instrumented()
     def update_total_emissions(self):
         """
         Met à jour le total global des émissions en agrégeant les données de l'historique.
@@ -1515,23 +1640,18 @@ class MainWindow(QMainWindow):
         total_mass = 0.0
         total_mass_err_sq = 0.0
 
-        for i in range(self.history_list.count()):
-            item = self.history_list.item(i)
-            data = item.data(Qt.UserRole)
-            if not data:
-                continue
-
+        for data in self.history_records():
             # ----- Partie PRIX -----
-            e_price = float(data.get('emissions_price', 0.0) or 0.0)
-            e_price_err = float(data.get('emissions_price_error', 0.0) or 0.0)
+            e_price = data.emissions_price
+            e_price_err = data.emissions_price_error
 
             # Somme sur TOUS les items
             total_all_price += e_price
             total_all_price_err_sq += (e_price_err ** 2)
 
             # ----- Partie MASSE -----
-            e_mass = float(data.get('emission_mass', 0.0) or 0.0)
-            e_mass_err = float(data.get('emission_mass_error', 0.0) or 0.0)
+            e_mass = data.emission_mass
+            e_mass_err = data.emission_mass_error
 
             if e_mass > 0:
                 # Cet item a un calcul massique
@@ -1554,97 +1674,63 @@ class MainWindow(QMainWindow):
             f"3) Émissions massiques : {total_mass:.4f} ± {mass_err:.4f} kg CO₂e"
         )
 
-    def create_or_update_history_item(self, data, item=None):
+    def as_history_record(self, data):
         """
-        Crée ou met à jour un élément dans l'historique des calculs.
+        Ligne de l'historique (HistoryRecord) depuis un dictionnaire ou une autre ligne,
+        rattachée au millésime courant des facteurs si elle n'en a pas.
+        """
+        if not isinstance(data, HistoryRecord):
+            data = HistoryRecord.from_dict(data)
+        # Chaque calcul de l'historique est rattaché à un millésime des facteurs
+        if data.vintage is None:
+            data.vintage = self.current_vintage
+        return data
+
+    def create_or_update_history_item(self, data, row=None):
+        """
+        Crée ou met à jour une ligne de l'historique des calculs.
+
+        Le texte affiché n'est pas construit ici : le modèle de la liste le formate
+        lorsque la ligne est affichée (windows/history_list_model.py).
 
-        Formate le texte de l'élément en fonction de la catégorie du calcul et ajoute l'élément à la liste historique.
-        Si un élément existe déjà, le met à jour avec les nouvelles données.
-        
         Args:
-            data (dict): Le dictionnaire contenant les données du calcul à ajouter ou mettre à jour.
-            item (QListWidgetItem, optional): L'élément existant à mettre à jour. Par défaut, None.
-        
-        Returns:
-            QListWidgetItem: L'élément ajouté ou mis à jour dans l'historique.
-        """
-        category = data.get('category', '')
-        subcategory = data.get('subcategory', '')
-        subsubcategory = data.get('subsubcategory', '')
-        name = data.get('name', '')
-        value = data.get('value', 0.0)
-        unit = data.get('unit', '')
-        ep = data.get('emissions_price', 0.0)
-        ep_err = data.get('emissions_price_error', 0.0)
-        em = data.get('emission_mass', 0.0)
-        em_err = data.get('emission_mass_error', 0.0)
-        tm = data.get('total_mass', 0.0)
-        code_nacres = data.get('code_nacres', 'NA')
-        consommable = data.get('consommable', 'NA')
-
-        def fmt_err(val, err):
-            if err is not None and err > 0:
-                return f"{val:.4f} ± {err:.4f}"
-            else:
-                return f"{val:.4f}"
+            data (dict | HistoryRecord): Les données du calcul à ajouter ou mettre à jour
+                (un dictionnaire est converti en HistoryRecord).
+            row (int, optional): La ligne existante à mettre à jour. Par défaut, None (ajout en fin de liste).
 
-        if category == 'Machine':
-            item_text = (
-                f"Machine - {subcategory} - {data.get('electricity_type')} - {value:.2f} kWh : "
-                f"{fmt_err(ep, ep_err)} kg CO₂e"
-            )
-        elif category == 'Véhicules':
-            days = data.get('days', 1)
-            
-            try:
-                km_per_day = float(value) #/ days if days else float(total_km)
-                total_km = km_per_day * days
-            except (ValueError, ZeroDivisionError):
-                km_per_day = 0
-                total_km = km_per_day * days
-            
-            item_text = (
-                f"{category} - {subcategory} - {code_nacres} - {name} : "
-                f"{km_per_day:.2f} km/jour sur {days} jours, total {total_km} {unit} : "
-                f"{fmt_err(ep, ep_err)} kg CO₂e"
-            )
-        else:
-            # Achats / Autres
-            prix_str = fmt_err(ep, ep_err)
-            item_text = (
-                f"{category} - {subcategory[:12]} - {code_nacres} - {name} - "
-                f"Dépense: {value} {unit} : {prix_str} kg CO₂e"
-            )
-            if consommable != 'NA':
-                item_text += f" [Consommable: {consommable}]"
-            if em != 0.0 and tm != 0.0:
-                mass_str = fmt_err(em, em_err)
-                item_text += f" - Masse {tm:.4f} kg : {mass_str} kg CO₂e"
-
-        if item:
-            item.setText(item_text)
-            item.setData(Qt.UserRole, data)
-            return item
-        else:
-            from PySide6.QtWidgets import QListWidgetItem
-            new_item = QListWidgetItem(item_text)
-            new_item.setData(Qt.UserRole, data)
-            self.history_list.addItem(new_item)
-            return new_item
+        Returns:
+            int: Le numéro de la ligne ajoutée ou mise à jour.
+        """
+        data = self.as_history_record(data)
+        if row is not None:
+            self.history_model.set_record(row, data)
+            return row
+        self.history_model.append_records([data])
+        return self.history_model.rowCount() - 1
+
+    def selected_history_rows(self):
+        """Numéros des lignes sélectionnées dans l'historique, dans l'ordre de la liste."""
+        return sorted(index.row() for index in self.history_list.selectionModel().selectedRows())
+
+    def select_history_row(self, row):
+        """Sélectionne une seule ligne de l'historique (ligne courante)."""
+        self.history_list.selectionModel().setCurrentIndex(
+            self.history_model.index(row), QItemSelectionModel.ClearAndSelect
+        )
 
+    @instrumented()
     def delete_selected_calculation(self):
         """
         Supprime le calcul actuellement sélectionné dans l'historique.
 
         Retire l'élément sélectionné de la liste historique et met à jour le total des émissions.
         """
-        selected_items = self.history_list.selectedItems()
-        if not selected_items:
+        selected_rows = self.selected_history_rows()
+        if not selected_rows:
             QMessageBox.warning(self, "Erreur", "Veuillez sélectionner un ou plusieurs calculs à supprimer.")
             return
 
-        for item in selected_items:
-            self.history_list.takeItem(self.history_list.row(item))
+        self.history_model.remove_rows(selected_rows)
 
         self.update_total_emissions()
         self.data_changed.emit()
@@ -1657,7 +1743,6 @@ class MainWindow(QMainWindow):
         puis enregistre les données de l'historique dans le fichier sélectionné. Affiche un message de confirmation ou d'erreur.
         """
         from PySide6.QtWidgets import QFileDialog
-        import pandas as pd
         file_name, _ = QFileDialog.getSaveFileName(
             self, "Enregistrer l'historique", "",
             "Fichier CSV (*.csv);;Fichier Excel (*.xlsx);;Fichier HDF5 (*.h5);;Tous les fichiers (*)"
@@ -1665,34 +1750,22 @@ class MainWindow(QMainWindow):
         if not file_name:
             return
 
-        rows = []
-        for i in range(self.history_list.count()):
-            itm = self.history_list.item(i)
-            d = itm.data(Qt.UserRole)
-            if d:
-                rows.append(d)
-
-        if not rows:
+        records = self.history_records()
+        if not records:
             QMessageBox.information(self, "Export", "Aucun élément dans l'historique.")
             return
 
-        df = pd.DataFrame(rows)
-        _, ext = os.path.splitext(file_name)
-        ext = ext.lower()
-
         try:
-            if ext == '.csv':
-                df.to_csv(file_name, index=False, sep=';')
-            elif ext == '.xlsx':
-                df.to_excel(file_name, index=False)
-            elif ext == '.h5':
-                df.to_hdf(file_name, key='history', mode='w')
-            else:
-                df.to_csv(file_name, index=False, sep=';')
+            write_history(records_to_frame(records), file_name)
             QMessageBox.information(self, "Export", f"Exporté avec succès dans {file_name}")
         except Exception as e:
             QMessageBox.warning(self, "Erreur Export", f"{e}")
 
+    def history_records(self):
+        """Calculs de l'historique (HistoryRecord), dans l'ordre de la liste."""
+        return self.history_model.records()
+
+    @instrumented()
     def import_data(self):
         """
         Importe des données dans l'historique des calculs à partir d'un fichier.
@@ -1702,7 +1775,6 @@ class MainWindow(QMainWindow):
         Affiche un message de confirmation ou d'erreur.
         """
         from PySide6.QtWidgets import QFileDialog
-        import pandas as pd
         file_name, _ = QFileDialog.getOpenFileName(
             self, "Importer l'historique", "",
             "Tous les fichiers (*);;Fichier CSV (*.csv);;Fichier Excel (*.xlsx);;Fichier HDF5 (*.h5 *.hdf5)"
@@ -1710,39 +1782,31 @@ class MainWindow(QMainWindow):
         if not file_name:
             return
 
-        _, ext = os.path.splitext(file_name)
-        ext = ext.lower()
         try:
-            if ext == '.csv':
-                df = pd.read_csv(file_name, sep=';')
-            elif ext == '.xlsx':
-                df = pd.read_excel(file_name)
-            elif ext == '.h5':
-                df = pd.read_hdf(file_name, key='history')
-            else:
-                df = pd.read_csv(file_name, sep=';')
+            df = read_history(file_name)
         except Exception as e:
             QMessageBox.warning(self, "Erreur Import", f"Impossible de lire le fichier : {e}")
             return
 
-        # Convertir les colonnes attendues
-        for col in ["value", "quantity", "days", "emissions_price", "emission_mass", "total_mass"]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        for col in ["category", "subcategory", "subsubcategory", "name",
-                    "code_nacres", "consommable", "unit"]:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip()
-
-        count_imported = 0
-        for idx, row in df.iterrows():
-            new_data = row.to_dict()
-            self.create_or_update_history_item(new_data)
-            count_imported += 1
-
+        count_imported = self.load_history(df)
         QMessageBox.information(self, "Import", f"{count_imported} élément(s) importé(s) depuis {file_name}.")
+
+    def load_history(self, df):
+        """
+        Ajoute à l'historique les calculs d'un historique exporté (DataFrame),
+        puis met à jour le total et les graphiques.
+
+        :return: nombre d'éléments ajoutés
+        """
+        df = normalize_history(df, self.data_manager.vintages.base_name)
+        # Une seule insertion dans la liste ; aucun texte formaté avant affichage
+        records = [self.as_history_record(record) for record in records_from_frame(df)]
+        self.history_model.append_records(records)
+        count_imported = len(records)
+
         self.update_total_emissions()
         self.data_changed.emit()
+        return count_imported
 
     def add_machine(self):
         """
@@ -1779,6 +1843,7 @@ class MainWindow(QMainWindow):
                 'code_nacres': 'NA',  # Pas de NACRES pour les machines
                 'consommable': 'NA',  # Pas de consommable pour les machines
                 'quantity': 0,         # Pas de quantité pour les machines
+                'vintage': self.current_vintage,
             }
 
             ep, ep_err, em, em_err, tm, msg = self.carbon_calculator.compute_emission_data(data_dict)
@@ -1792,6 +1857,9 @@ class MainWindow(QMainWindow):
                 'subsubcategory': '',
                 'electricity_type': electricity_type,
                 'value': total_usage,  # kWh
+                'days': days,
+                'power': power,
+                'usage_time': usage_time,
                 'unit': 'kWh',
                 'emissions_price': ep,
                 'emissions_price_error': ep_err,
@@ -1801,6 +1869,7 @@ class MainWindow(QMainWindow):
                 'code_nacres': 'NA',
                 'consommable': 'NA',
                 'quantity': 0,
+                'vintage': self.current_vintage,
             }
 
             self.create_or_update_history_item(new_data)
@@ -1821,6 +1890,7 @@ class MainWindow(QMainWindow):
     # ------------------------------------------------------------------
     # Graphiques
     # ------------------------------------------------------------------
+    @instrumented()
     def generate_chart(self, chart_type):
         """
         Génère et affiche un graphique en fonction du type spécifié.
@@ -1842,22 +1912,15 @@ class MainWindow(QMainWindow):
         window = getattr(self, window_attr, None)
 
         if window is None:  # Si la fenêtre n'existe pas encore :
-            # Dictionnaire associant chaque type de graphique à sa classe correspondante.
-            window_class = {
-                'pie': PieChartWindow,
-                'bar': BarChartWindow,
-                'proportional_bar': ProportionalBarChartWindow,
-                'stacked_bar_consumables': StackedBarConsumablesWindow,
-                'nacres_bar': NacresBarChartWindow,
-                'proportional_bar_mass': ProportionalBarChartNacresWindow
-            }.get(chart_type)
-
-            # Vérifie si le type demandé est valide (i.e., présent dans le dictionnaire).
-            if window_class is None:
+            # Vérifie si le type demandé est valide (i.e., présent dans le registre).
+            if chart_type not in CHART_WINDOWS:
                 # Affiche un avertissement si le type de graphique est inconnu.
                 QMessageBox.warning(self, "Erreur", f"Type de graphique inconnu : {chart_type}")
                 return  # Sort de la fonction sans rien faire.
 
+            # Importe le module du graphique (première utilisation) et récupère sa classe.
+            window_class = self.chart_window_class(chart_type)
+
             # Crée une nouvelle instance de la fenêtre pour le type de graphique spécifié.
             window = window_class(self)
 
@@ -1877,6 +1940,35 @@ class MainWindow(QMainWindow):
         window.raise_()  # Amène la fenêtre au premier plan.
         window.activateWindow()  # Active la fenêtre pour qu'elle soit prête à recevoir des interactions.
 
+    @staticmethod
+    def chart_window_class(chart_type):
+        """Classe de la fenêtre d'un type de graphique (module importé à la première demande)."""
+        module_name, class_name = CHART_WINDOWS[chart_type]
+        return getattr(importlib.import_module(module_name), class_name)
+
+    def schedule_chart_prewarm(self):
+        """
+        Prévoit le préchargement des modules graphiques quand l'application est inactive,
+        pour que le premier graphique s'ouvre sans attendre l'import de matplotlib.
+        """
+        if os.environ.get("LABECO2_CHART_PREWARM", "1") == "0":
+            return
+        self._prewarm_queue = list(CHART_WINDOWS)
+        QTimer.singleShot(CHART_PREWARM_DELAY_MS, self._prewarm_next_chart)
+
+    def _prewarm_next_chart(self):
+        if not self._prewarm_queue:
+            return
+        chart_type = self._prewarm_queue.pop(0)
+        try:
+            self.chart_window_class(chart_type)
+        except Exception as e:
+            # Sans conséquence : l'import sera retenté (et l'erreur affichée) à l'ouverture du graphique
+            logger.info("Préchargement du graphique '%s' impossible : %s", chart_type, e)
+            return
+        # Un module par passage : la fenêtre reste réactive entre deux imports
+        QTimer.singleShot(0, self._prewarm_next_chart)
+
     def generate_pie_chart(self):
         self.generate_chart('pie')
 
@@ -1974,4 +2066,11 @@ class MainWindow(QMainWindow):
         layout.addWidget(close_button)
 
         dialog.setLayout(layout)
-        dialog.exec()
\ No newline at end of file
+        dialog.exec()
+
+    def closeEvent(self, event):
+        """
+        Ferme proprement les connexions à la base des manips type à la fermeture de la fenêtre.
+        """
+        self.manips_db.close()
+        super().closeEvent(event)